@@ -19,33 +19,43 @@ if sys.platform == 'win32':
     # Set environment variable for subprocess encoding
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
-from flask import Flask, request, send_file, jsonify, session
+from flask import Flask, request, send_file, jsonify, Response
 from flask_cors import CORS
 import os
 import tempfile
 from pathlib import Path
 import subprocess
 import shutil
+import tarfile
+import zipfile
 from werkzeug.utils import secure_filename
 import pandas as pd
 import camelot
 import base64
 import uuid
 import json
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont, UnidentifiedImageError
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 from reportlab.lib.colors import HexColor
 from datetime import datetime
 import requests
 import fitz  # PyMuPDF - moved to top for memory efficiency
+from pdf_document_context import PdfDocumentContext
+from converter_backends import BackendRegistry
+from signature_fonts import SignatureFonts
+from document_store import DocumentNotFound, DocumentStore
+from parallel_sheets import SheetSelectionError, parse_sheet_selection
+from pdf_incremental import (is_requested as is_incremental_requested, rotate_pages, update_bytes,
+                             update_file)
+from watermark_engine import stamp_pdf, watermark_from_options
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.drawing.image import Image as OpenpyxlImage
 from openpyxl.utils import get_column_letter
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)  # For session management
+app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
 
 # Configure CORS to allow frontend access
 ALLOWED_ORIGINS_STR = os.environ.get('ALLOWED_ORIGINS', '*')
@@ -612,16 +622,12 @@ def pdf_to_excel():
         # Create temp directory
         tmpdir = tempfile.mkdtemp()
         
-        # Save uploaded PDF
+        # Parse the uploaded PDF once - every stage below reads from this context
         filename = secure_filename(file.filename)
-        pdf_path = os.path.join(tmpdir, filename)
-        file.save(pdf_path)
+        doc = PdfDocumentContext.from_upload(file, filename)
         
         print(f"Converting PDF to Excel: {filename}")
         
-        # Use PyMuPDF to extract images, text, and tables
-        doc = fitz.open(pdf_path)
-        
         # Create Excel file
         excel_name = Path(filename).stem + '.xlsx'
         excel_path = os.path.join(tmpdir, excel_name)
@@ -633,10 +639,9 @@ def pdf_to_excel():
         current_row = 1
         
         # Process first page to extract logo and headers
-        page = doc[0]
         
         # Extract and add images (Bank logo)
-        image_list = page.get_images()
+        image_list = doc.images(0)
         if image_list:
             print(f"Found {len(image_list)} images (logos)")
             for img_index, img in enumerate(image_list):
@@ -665,27 +670,18 @@ def pdf_to_excel():
                 except Exception as e:
                     print(f"  Warning: Could not add image: {e}")
         
-        # Extract text for title and headers
-        text_dict = page.get_text("dict")
-        blocks = text_dict["blocks"]
-        
         # Find "Detailed Statement" title
-        for block in blocks:
-            if block["type"] == 0:  # Text block
-                for line in block["lines"]:
-                    line_text = ""
-                    for span in line["spans"]:
-                        line_text += span["text"]
-                    if "Detailed Statement" in line_text:
-                        # Add title (centered, bold, large)
-                        ws.merge_cells('A2:G2')
-                        title_cell = ws['A2']
-                        title_cell.value = "Detailed Statement"
-                        title_cell.font = Font(size=16, bold=True)
-                        title_cell.alignment = Alignment(horizontal='center', vertical='center')
-                        ws.row_dimensions[2].height = 25  # Make title row taller
-                        print("  Added 'Detailed Statement' title")
-                        break
+        for line_text in doc.text_lines(0):
+            if "Detailed Statement" in line_text:
+                # Add title (centered, bold, large)
+                ws.merge_cells('A2:G2')
+                title_cell = ws['A2']
+                title_cell.value = "Detailed Statement"
+                title_cell.font = Font(size=16, bold=True)
+                title_cell.alignment = Alignment(horizontal='center', vertical='center')
+                ws.row_dimensions[2].height = 25  # Make title row taller
+                print("  Added 'Detailed Statement' title")
+                break
         
         # Start table from row 4 (right after title)
         current_row = 4
@@ -694,12 +690,20 @@ def pdf_to_excel():
         print("\nExtracting tables...")
         all_tables = []
         
-        # Try lattice mode first
+        # Camelot only accepts a path; it is handed just the pages the
+        # context says can hold a table, so fruitless passes are skipped
+        pdf_path = doc.write_to(os.path.join(tmpdir, filename))
+        ruled_pages = doc.ruled_pages()
+        text_pages = doc.text_pages()
+        
+        # Try lattice mode first (only pages that draw ruling lines)
         try:
             print("Strategy 1: Lattice mode (bordered tables)...")
+            if not ruled_pages:
+                raise RuntimeError("no pages with ruling lines")
             tables = camelot.read_pdf(
                 str(pdf_path), 
-                pages='all', 
+                pages=','.join(str(n) for n in ruled_pages), 
                 flavor='lattice',
                 line_scale=40,
                 shift_text=['l', 't']
@@ -747,9 +751,11 @@ def pdf_to_excel():
         if not all_tables:
             try:
                 print("Strategy 2: Stream mode (borderless tables)...")
+                if not text_pages:
+                    raise RuntimeError("no pages with text")
                 tables = camelot.read_pdf(
                     str(pdf_path), 
-                    pages='all', 
+                    pages=','.join(str(n) for n in text_pages), 
                     flavor='stream',
                     edge_tol=50,
                     row_tol=10,
@@ -1142,269 +1148,24 @@ def pdf_to_excel_OLD_BACKUP():
             except:
                 pass
 
-def convert_excel_to_pdf_advanced(excel_path, output_dir):
+def convert_excel_to_pdf_advanced(excel_path, output_dir, sheets=None):
     """
     Advanced Excel to PDF conversion with perfect formatting preservation
     Matches iLovePDF quality - preserves images, logos, borders, fonts, colors
+    Streams each sheet once and paginates onto A4 pages (see excel_to_pdf_advanced.py);
+    all sheets (or the ``sheets`` selection) render in parallel, bookmarked by name
     """
     try:
-        from openpyxl import load_workbook
-        from openpyxl.drawing.image import Image as OpenpyxlImage
-        from reportlab.lib.pagesizes import A4, letter, landscape
-        from reportlab.lib.units import inch, mm
-        from reportlab.pdfgen import canvas
-        from reportlab.lib import colors
-        from reportlab.lib.utils import ImageReader
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        from PIL import Image as PILImage
-        import io
+        from excel_to_pdf_advanced import convert_excel_to_pdf_advanced as render_excel_advanced
         
         print(f"\n{'='*60}")
         print(f"ADVANCED EXCEL TO PDF - iLovePDF Quality")
         print(f"Input: {excel_path}")
         print(f"{'='*60}\n")
         
-        # Load workbook
-        wb = load_workbook(excel_path, data_only=True)
-        ws = wb.active
-        
-        # Get dimensions
-        max_row = ws.max_row
-        max_col = ws.max_column
-        
-        print(f"Sheet: {ws.title}")
-        print(f"Dimensions: {max_row} rows × {max_col} columns")
-        
-        # Calculate column widths and row heights
-        col_widths = {}
-        for col_idx in range(1, max_col + 1):
-            # Get column letter - handle merged cells
-            from openpyxl.utils import get_column_letter
-            col_letter = get_column_letter(col_idx)
-            col_dim = ws.column_dimensions[col_letter]
-            
-            # Calculate actual content width for better sizing
-            max_content_width = 0
-            for row_idx in range(1, min(max_row + 1, 100)):  # Check first 100 rows
-                cell = ws.cell(row_idx, col_idx)
-                # Skip merged cells for width calculation
-                if hasattr(cell, 'value') and cell.value:
-                    content_len = len(str(cell.value))
-                    font_size = 10
-                    if hasattr(cell, 'font') and cell.font and cell.font.size:
-                        font_size = cell.font.size
-                    # Estimate width: char_count * font_size * 0.6
-                    estimated_width = content_len * font_size * 0.6
-                    max_content_width = max(max_content_width, estimated_width)
-            
-            # Use the larger of: Excel width or content width
-            excel_width = (col_dim.width or 10) * 7
-            width_pts = max(excel_width, max_content_width + 10)  # Add padding
-            col_widths[col_idx] = width_pts
-        
-        row_heights = {}
-        for row_idx in range(1, max_row + 1):
-            row_dim = ws.row_dimensions[row_idx]
-            # Convert Excel height to points
-            height_pts = (row_dim.height or 15) * 0.75
-            row_heights[row_idx] = height_pts
-        
-        # Calculate total dimensions
-        total_width = sum(col_widths.values())
-        total_height = sum(row_heights.values())
-        
-        # Set page size with margins
-        margin = 20
-        page_width = total_width + (2 * margin)
-        page_height = total_height + (2 * margin)
-        
-        # Use A4 if dimensions fit, otherwise custom
-        if page_width <= 595 and page_height <= 842:  # A4 dimensions
-            pagesize = A4
-            if page_width > page_height:
-                pagesize = landscape(A4)
-        else:
-            pagesize = (page_width, page_height)
-        
-        print(f"Page size: {pagesize[0]:.1f} × {pagesize[1]:.1f} pts")
-        
-        # Create PDF
-        pdf_name = Path(excel_path).stem + '.pdf'
-        pdf_path = Path(output_dir) / pdf_name
-        c = canvas.Canvas(str(pdf_path), pagesize=pagesize)
-        
-        # Starting position
-        x_start = margin
-        y_start = pagesize[1] - margin
-        
-        # Extract and draw images/logos
-        images_drawn = 0
-        if hasattr(ws, '_images'):
-            for img in ws._images:
-                try:
-                    # Get image data
-                    img_data = img._data()
-                    pil_img = PILImage.open(io.BytesIO(img_data))
-                    
-                    # Get anchor position
-                    anchor = img.anchor
-                    if hasattr(anchor, '_from'):
-                        col_idx = anchor._from.col + 1
-                        row_idx = anchor._from.row + 1
-                        
-                        # Calculate position
-                        x_pos = x_start + sum(col_widths[i] for i in range(1, col_idx))
-                        y_pos = y_start - sum(row_heights[i] for i in range(1, row_idx))
-                        
-                        # Calculate image size
-                        img_width = img.width * 0.75 if hasattr(img, 'width') else pil_img.width * 0.75
-                        img_height = img.height * 0.75 if hasattr(img, 'height') else pil_img.height * 0.75
-                        
-                        # Draw image
-                        img_reader = ImageReader(io.BytesIO(img_data))
-                        c.drawImage(img_reader, x_pos, y_pos - img_height, 
-                                   width=img_width, height=img_height, 
-                                   preserveAspectRatio=True, mask='auto')
-                        images_drawn += 1
-                        print(f"  [OK] Image {images_drawn} drawn at row {row_idx}, col {col_idx}")
-                except Exception as e:
-                    print(f"  Warning: Could not draw image: {str(e)}")
-        
-        # Draw cells
-        y_pos = y_start
-        for row_idx in range(1, max_row + 1):
-            x_pos = x_start
-            row_height = row_heights[row_idx]
-            
-            for col_idx in range(1, max_col + 1):
-                cell = ws.cell(row_idx, col_idx)
-                col_width = col_widths[col_idx]
-                
-                # Skip merged cells (they'll be handled by the main cell)
-                from openpyxl.cell.cell import MergedCell
-                if isinstance(cell, MergedCell):
-                    x_pos += col_width
-                    continue
-                
-                # Draw cell border
-                if hasattr(cell, 'border') and cell.border and (cell.border.left.style or cell.border.right.style or 
-                                   cell.border.top.style or cell.border.bottom.style):
-                    c.setStrokeColor(colors.black)
-                    c.setLineWidth(0.5)
-                    
-                    if cell.border.left.style:
-                        c.line(x_pos, y_pos, x_pos, y_pos - row_height)
-                    if cell.border.right.style:
-                        c.line(x_pos + col_width, y_pos, x_pos + col_width, y_pos - row_height)
-                    if cell.border.top.style:
-                        c.line(x_pos, y_pos, x_pos + col_width, y_pos)
-                    if cell.border.bottom.style:
-                        c.line(x_pos, y_pos - row_height, x_pos + col_width, y_pos - row_height)
-                
-                # Draw cell background
-                if hasattr(cell, 'fill') and cell.fill and hasattr(cell.fill, 'start_color') and cell.fill.start_color and hasattr(cell.fill.start_color, 'rgb') and cell.fill.start_color.rgb:
-                    try:
-                        rgb = cell.fill.start_color.rgb
-                        if len(rgb) == 8:  # ARGB format
-                            rgb = rgb[2:]  # Remove alpha
-                        r, g, b = int(rgb[0:2], 16)/255, int(rgb[2:4], 16)/255, int(rgb[4:6], 16)/255
-                        c.setFillColor(colors.Color(r, g, b))
-                        c.rect(x_pos, y_pos - row_height, col_width, row_height, fill=1, stroke=0)
-                    except:
-                        pass
-                
-                # Draw cell text
-                if cell.value:
-                    text = str(cell.value)
-                    
-                    # Set font
-                    font_size = 9  # Slightly smaller for better fit
-                    if cell.font and cell.font.size:
-                        font_size = min(cell.font.size, 11)  # Cap at 11pt
-                    
-                    # Set text color
-                    text_color = colors.black
-                    if cell.font and cell.font.color and cell.font.color.rgb:
-                        try:
-                            rgb = cell.font.color.rgb
-                            if len(rgb) == 8:
-                                rgb = rgb[2:]
-                            r, g, b = int(rgb[0:2], 16)/255, int(rgb[2:4], 16)/255, int(rgb[4:6], 16)/255
-                            text_color = colors.Color(r, g, b)
-                        except:
-                            pass
-                    
-                    c.setFillColor(text_color)
-                    font_name = "Helvetica-Bold" if (cell.font and cell.font.bold) else "Helvetica"
-                    c.setFont(font_name, font_size)
-                    
-                    # Handle long text - wrap if needed
-                    text_width = c.stringWidth(text, font_name, font_size)
-                    available_width = col_width - 4  # Leave padding
-                    
-                    if text_width > available_width and len(text) > 15:
-                        # Wrap text for long content
-                        words = text.split()
-                        lines = []
-                        current_line = []
-                        
-                        for word in words:
-                            test_line = ' '.join(current_line + [word])
-                            if c.stringWidth(test_line, font_name, font_size) <= available_width:
-                                current_line.append(word)
-                            else:
-                                if current_line:
-                                    lines.append(' '.join(current_line))
-                                current_line = [word]
-                        if current_line:
-                            lines.append(' '.join(current_line))
-                        
-                        # Draw multiple lines
-                        line_height = font_size + 2
-                        start_y = y_pos - ((row_height - (len(lines) * line_height)) / 2)
-                        
-                        for i, line in enumerate(lines[:3]):  # Max 3 lines
-                            text_y = start_y - (i * line_height)
-                            text_x = x_pos + 2
-                            
-                            if cell.alignment:
-                                if cell.alignment.horizontal == 'center':
-                                    text_x = x_pos + (col_width / 2)
-                                    c.drawCentredString(text_x, text_y, line)
-                                elif cell.alignment.horizontal == 'right':
-                                    text_x = x_pos + col_width - 2
-                                    c.drawRightString(text_x, text_y, line)
-                                else:
-                                    c.drawString(text_x, text_y, line)
-                            else:
-                                c.drawString(text_x, text_y, line)
-                    else:
-                        # Single line text
-                        text_x = x_pos + 2
-                        text_y = y_pos - (row_height / 2) - (font_size / 3)  # Vertically center
-                        
-                        if cell.alignment:
-                            if cell.alignment.horizontal == 'center':
-                                text_x = x_pos + (col_width / 2)
-                                c.drawCentredString(text_x, text_y, text)
-                            elif cell.alignment.horizontal == 'right':
-                                text_x = x_pos + col_width - 2
-                                c.drawRightString(text_x, text_y, text)
-                            else:
-                                c.drawString(text_x, text_y, text)
-                        else:
-                            c.drawString(text_x, text_y, text)
-                
-                x_pos += col_width
-            
-            y_pos -= row_height
-        
-        # Save PDF
-        c.save()
+        pdf_path = render_excel_advanced(excel_path, output_dir, sheets)
         
         print(f"[OK] PDF created: {pdf_path}")
-        print(f"[OK] Images preserved: {images_drawn}")
         print(f"[OK] iLovePDF-quality conversion complete!")
         print(f"{'='*60}\n")
         
@@ -1412,13 +1173,11 @@ def convert_excel_to_pdf_advanced(excel_path, output_dir):
         
     except ImportError as e:
         print(f"Missing library: {str(e)}")
-        print("Falling back to LibreOffice conversion...")
         return None
     except Exception as e:
         print(f"Advanced conversion failed: {str(e)}")
         import traceback
         traceback.print_exc()
-        print("Falling back to LibreOffice conversion...")
         return None
 
 def convert_csv_to_excel_api(csv_path, output_dir):
@@ -1426,20 +1185,10 @@ def convert_csv_to_excel_api(csv_path, output_dir):
     try:
         import pandas as pd
         from openpyxl.styles import Border, Side, Font
+        from csv_ingest import read_csv
         
-        # Read CSV with multiple encoding attempts
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(csv_path, encoding=encoding)
-                break
-            except:
-                continue
-        
-        if df is None:
-            raise RuntimeError("Could not read CSV file")
+        # Detect encoding/delimiter from a byte sample, then parse once
+        df = read_csv(csv_path)
         
         # Create Excel file
         base_name = os.path.splitext(os.path.basename(csv_path))[0]
@@ -1485,6 +1234,15 @@ def convert_csv_to_excel_api(csv_path, output_dir):
         print(f"CSV conversion error: {str(e)}")
         return None
 
+def convert_csv_to_pdf_api(csv_path, output_dir):
+    """Render CSV straight to PDF for API - streams rows, no intermediate Excel file"""
+    try:
+        from excel_to_pdf_advanced import convert_csv_to_pdf
+        return str(convert_csv_to_pdf(csv_path, output_dir))
+    except Exception as e:
+        print(f"Direct CSV rendering error: {str(e)}")
+        return None
+
 def convert_excel_to_pdf_professional_api(excel_path, output_dir):
     """Professional Excel to PDF using COM automation"""
     try:
@@ -1539,6 +1297,101 @@ def convert_excel_to_pdf_professional_api(excel_path, output_dir):
     except:
         return None
 
+def find_soffice():
+    """Path of the LibreOffice executable, or None if it is not installed"""
+    if sys.platform == 'win32':
+        soffice_exe = r"C:\Program Files\LibreOffice\program\soffice.exe"
+        if os.path.exists(soffice_exe):
+            return soffice_exe
+    return shutil.which('soffice')
+
+def convert_excel_with_libreoffice(excel_path, output_dir):
+    """Excel to PDF with LibreOffice calc_pdf_Export (preserves images, logos and formatting)"""
+    soffice_exe = find_soffice() or 'soffice'
+    if sys.platform == 'win32':
+        # Kill existing LibreOffice processes (Windows only)
+        try:
+            subprocess.run(['taskkill', '/F', '/IM', 'soffice.exe', '/T'], 
+                          capture_output=True, timeout=5, encoding='utf-8', errors='replace')
+            subprocess.run(['taskkill', '/F', '/IM', 'soffice.bin', '/T'], 
+                          capture_output=True, timeout=5, encoding='utf-8', errors='replace')
+            import time
+            time.sleep(1)
+        except:
+            pass
+    
+    cmd = [
+        soffice_exe,
+        '--headless',
+        '--invisible',
+        '--nodefault',
+        '--nofirststartwizard',
+        '--nolockcheck',
+        '--nologo',
+        '--norestore',
+        '--convert-to', 'pdf:calc_pdf_Export',
+        '--outdir', str(output_dir),
+        str(excel_path)
+    ]
+    
+    print(f"Running: {' '.join(cmd)}")
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=120,
+                           encoding='utf-8', errors='replace')
+    
+    if result.returncode != 0:
+        print(f"LibreOffice error: {result.stderr}")
+        raise RuntimeError(f"LibreOffice conversion failed: {result.stderr}")
+    
+    base_name = os.path.splitext(os.path.basename(excel_path))[0]
+    pdf_path = os.path.join(output_dir, f"{base_name}.pdf")
+    if not os.path.exists(pdf_path):
+        raise RuntimeError("PDF file was not created")
+    return pdf_path
+
+def probe_excel_com():
+    """Excel COM automation is only usable on Windows with Excel installed"""
+    if sys.platform != 'win32':
+        return False
+    import win32com.client
+    import pythoncom
+    pythoncom.CoInitialize()
+    try:
+        win32com.client.Dispatch("Excel.Application").Quit()
+    finally:
+        pythoncom.CoUninitialize()
+    return True
+
+def probe_native_excel_renderer():
+    """The ReportLab renderer only needs its own module (openpyxl + reportlab)"""
+    import excel_to_pdf_advanced  # noqa: F401
+    return True
+
+# Excel -> PDF engines, probed at startup and routed by measured latency (statistics
+# are per worker process). COM and LibreOffice keep the workbook's own layout, images
+# and print settings; the native ReportLab renderer is faster but redraws cells
+# itself, so it only runs when listed in EXCEL_PDF_BACKENDS (e.g. "native,libreoffice").
+EXCEL_PDF_ENGINES = {
+    'excel-com': (convert_excel_to_pdf_professional_api, probe_excel_com, {'xlsx', 'xls'}),
+    'libreoffice': (convert_excel_with_libreoffice, find_soffice, {'xlsx', 'xls'}),
+    'native': (convert_excel_to_pdf_advanced, probe_native_excel_renderer, {'xlsx'}),
+}
+
+def build_excel_pdf_backends(order=None):
+    """Registry of the engines named in ``order`` (default: EXCEL_PDF_BACKENDS)"""
+    order = order or os.environ.get('EXCEL_PDF_BACKENDS') or 'excel-com,libreoffice'
+    registry = BackendRegistry('excel-to-pdf')
+    for name in order.split(','):
+        name = name.strip()
+        if name not in EXCEL_PDF_ENGINES:
+            print(f"Ignoring unknown Excel-to-PDF backend: {name!r}")
+            continue
+        convert, probe, extensions = EXCEL_PDF_ENGINES[name]
+        registry.register(name, convert, probe=probe, extensions=extensions)
+    return registry
+
+excel_pdf_backends = build_excel_pdf_backends()
+excel_pdf_backends.probe_in_background()
+
 @app.route('/api/convert/excel-to-pdf', methods=['POST', 'OPTIONS'])
 def excel_to_pdf():
     """Convert Excel/CSV to PDF - iLovePDF quality"""
@@ -1569,92 +1422,24 @@ def excel_to_pdf():
         print(f"Input: {filename}")
         print(f"{'='*60}\n")
         
-        # Handle CSV files - convert to Excel first
+        # Handle CSV files - render rows straight to PDF (no .xlsx round trip)
         excel_path = file_path
-        if filename.lower().endswith('.csv'):
-            print("Step 1: Converting CSV to Excel...")
-            excel_path = convert_csv_to_excel_api(file_path, tmpdir)
-            if not excel_path or not os.path.exists(excel_path):
-                raise RuntimeError("CSV to Excel conversion failed")
-            print(f"[OK] CSV converted to Excel: {os.path.basename(excel_path)}\n")
-        
-        # Try professional Excel COM conversion first (iLovePDF quality)
         pdf_path = None
-        print("Step 2: Converting to PDF with Microsoft Excel COM...")
-        pdf_path = convert_excel_to_pdf_professional_api(excel_path, tmpdir)
-        
-        # Fallback to LibreOffice if COM fails
-        if not pdf_path or not os.path.exists(pdf_path):
-            print(f"\n{'='*60}")
-            print(f"EXCEL TO PDF CONVERSION - LibreOffice (Fallback)")
-            print(f"Input: {excel_path}")
-            print(f"{'='*60}\n")
-            
-            # Detect LibreOffice executable based on platform
-            if sys.platform == 'win32':
-                soffice_exe = r"C:\Program Files\LibreOffice\program\soffice.exe"
-                # Kill existing LibreOffice processes (Windows only)
-                try:
-                    subprocess.run(['taskkill', '/F', '/IM', 'soffice.exe', '/T'], 
-                                  capture_output=True, timeout=5, encoding='utf-8', errors='replace')
-                    subprocess.run(['taskkill', '/F', '/IM', 'soffice.bin', '/T'], 
-                                  capture_output=True, timeout=5, encoding='utf-8', errors='replace')
-                    import time
-                    time.sleep(1)
-                except:
-                    pass
-            else:
-                # Linux/Unix - use system LibreOffice
-                soffice_exe = shutil.which('soffice') or 'soffice'
-            
-            # Convert with optimal settings - preserve images and formatting
-            # calc_pdf_Export preserves all images, logos, and formatting
-            cmd = [
-                soffice_exe,
-                '--headless',
-                '--invisible',
-                '--nodefault',
-                '--nofirststartwizard',
-                '--nolockcheck',
-                '--nologo',
-                '--norestore',
-                '--convert-to', 'pdf:calc_pdf_Export',
-                '--outdir', tmpdir,
-                excel_path
-            ]
-            
-            print(f"Running: {' '.join(cmd)}")
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=120,
-                encoding='utf-8',
-                errors='replace'
-            )
-            
-            if result.returncode != 0:
-                print(f"LibreOffice error: {result.stderr}")
-                raise RuntimeError(f"LibreOffice conversion failed: {result.stderr}")
-            
-            # Find the output PDF
-            base_name = os.path.splitext(os.path.basename(excel_path))[0]
-            pdf_path = os.path.join(tmpdir, f"{base_name}.pdf")
-            
-            if not os.path.exists(pdf_path):
-                possible_paths = [
-                    os.path.join(tmpdir, f"{base_name}.pdf"),
-                    os.path.join(tmpdir, f"{filename.rsplit('.', 1)[0]}.pdf")
-                ]
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        pdf_path = path
-                        break
-            
-            if not pdf_path or not os.path.exists(pdf_path):
-                raise RuntimeError("PDF file was not created")
-            
-            print(f"[OK] PDF file created: {pdf_path}")
+        if filename.lower().endswith('.csv'):
+            print("Step 1: Rendering CSV directly to PDF...")
+            pdf_path = convert_csv_to_pdf_api(file_path, tmpdir)
+            if not pdf_path:
+                print("Direct rendering failed, converting CSV to Excel...")
+                excel_path = convert_csv_to_excel_api(file_path, tmpdir)
+                if not excel_path or not os.path.exists(excel_path):
+                    raise RuntimeError("CSV to Excel conversion failed")
+                print(f"[OK] CSV converted to Excel: {os.path.basename(excel_path)}\n")
+        
+        # Route to the preferred available engine (COM, then LibreOffice)
+        if not pdf_path:
+            print("Step 2: Converting to PDF...")
+            pdf_path, backend = excel_pdf_backends.convert(excel_path, tmpdir)
+            print(f"[OK] PDF file created with {backend}: {pdf_path}")
             print(f"{'='*60}\n")
         
         # Send file
@@ -1734,68 +1519,24 @@ def excel_to_bank_statement():
         print(f"Logo: {logo_path if logo_path else 'None'}")
         print(f"{'='*60}\n")
         
-        # Handle CSV files - convert to Excel first
+        # Handle CSV files - render rows straight to PDF (no .xlsx round trip)
         excel_path = file_path
-        if filename.lower().endswith('.csv'):
-            print("Step 1: Converting CSV to Excel...")
-            excel_path = convert_csv_to_excel_api(file_path, tmpdir)
-            if not excel_path or not os.path.exists(excel_path):
-                raise RuntimeError("CSV to Excel conversion failed")
-            print(f"[OK] CSV converted to Excel: {os.path.basename(excel_path)}\n")
-        
-        # Use professional Excel COM conversion for perfect alignment
         pdf_path = None
-        print("Step 2: Converting to PDF with Microsoft Excel COM (Perfect Alignment)...")
-        pdf_path = convert_excel_to_pdf_professional_api(excel_path, tmpdir)
-        
-        # Fallback to LibreOffice if COM fails
-        if not pdf_path or not os.path.exists(pdf_path):
-            print(f"\n{'='*60}")
-            print(f"FALLBACK: Using LibreOffice for conversion")
-            print(f"{'='*60}\n")
-            
-            # Detect LibreOffice executable
-            if sys.platform == 'win32':
-                soffice_exe = r"C:\Program Files\LibreOffice\program\soffice.exe"
-                try:
-                    subprocess.run(['taskkill', '/F', '/IM', 'soffice.exe', '/T'], 
-                                  capture_output=True, timeout=5, encoding='utf-8', errors='replace')
-                    subprocess.run(['taskkill', '/F', '/IM', 'soffice.bin', '/T'], 
-                                  capture_output=True, timeout=5, encoding='utf-8', errors='replace')
-                    import time
-                    time.sleep(1)
-                except:
-                    pass
-            else:
-                soffice_exe = shutil.which('soffice') or 'soffice'
-            
-            cmd = [
-                soffice_exe,
-                '--headless',
-                '--invisible',
-                '--nodefault',
-                '--nofirststartwizard',
-                '--nolockcheck',
-                '--nologo',
-                '--norestore',
-                '--convert-to', 'pdf:calc_pdf_Export',
-                '--outdir', tmpdir,
-                excel_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120,
-                                   encoding='utf-8', errors='replace')
-            
-            if result.returncode != 0:
-                raise RuntimeError(f"LibreOffice conversion failed: {result.stderr}")
-            
-            base_name = os.path.splitext(os.path.basename(excel_path))[0]
-            pdf_path = os.path.join(tmpdir, f"{base_name}.pdf")
-            
-            if not pdf_path or not os.path.exists(pdf_path):
-                raise RuntimeError("PDF file was not created")
-            
-            print(f"[OK] PDF created with LibreOffice")
+        if filename.lower().endswith('.csv'):
+            print("Step 1: Rendering CSV directly to PDF...")
+            pdf_path = convert_csv_to_pdf_api(file_path, tmpdir)
+            if not pdf_path:
+                print("Direct rendering failed, converting CSV to Excel...")
+                excel_path = convert_csv_to_excel_api(file_path, tmpdir)
+                if not excel_path or not os.path.exists(excel_path):
+                    raise RuntimeError("CSV to Excel conversion failed")
+                print(f"[OK] CSV converted to Excel: {os.path.basename(excel_path)}\n")
+        
+        # Route to the preferred available engine (COM for perfect alignment when present)
+        if not pdf_path:
+            print("Step 2: Converting to PDF...")
+            pdf_path, backend = excel_pdf_backends.convert(excel_path, tmpdir)
+            print(f"[OK] PDF created with {backend}")
         
         # Send file
         pdf_name = Path(filename).stem + '_statement.pdf'
@@ -1861,15 +1602,20 @@ def excel_to_pdf_custom():
         file.save(file_path)
         print(f"File saved: {filename}")
         
-        # Check for logo file
-        logo_path = None
+        # Logo / font are kept in memory - the renderer caches them by content hash
+        logo = None
         if 'logo' in request.files:
             logo_file = request.files['logo']
             if logo_file and logo_file.filename:
-                logo_filename = secure_filename(logo_file.filename)
-                logo_path = os.path.join(tmpdir, logo_filename)
-                logo_file.save(logo_path)
-                print(f"Logo saved: {logo_filename}")
+                logo = logo_file.read()
+                print(f"Logo received: {logo_file.filename} ({len(logo)} bytes)")
+        
+        font = None
+        if 'font' in request.files:
+            font_file = request.files['font']
+            if font_file and font_file.filename:
+                font = font_file.read()
+                print(f"Font received: {font_file.filename}")
         
         # Get customer info from form data (if provided)
         account_info = None
@@ -1888,27 +1634,25 @@ def excel_to_pdf_custom():
             else:
                 print(f"Customer info provided: {account_info}")
         
-        # Convert CSV to Excel if needed
-        excel_path = file_path
-        if filename.lower().endswith('.csv'):
-            print("Converting CSV to Excel...")
-            df = pd.read_csv(file_path)
-            excel_path = os.path.join(tmpdir, filename.replace('.csv', '.xlsx'))
-            df.to_excel(excel_path, index=False)
-            print(f"CSV converted to Excel: {os.path.basename(excel_path)}")
+        # Optional sheet selection: "Summary, 3" (names or 1-based positions), default all
+        sheets = parse_sheet_selection(request.form.get('sheets'))
+        if sheets:
+            print(f"Sheets selected: {sheets}")
         
-        # Use the enhanced Excel to PDF converter
+        # Use the enhanced Excel to PDF converter (reads CSV natively, no .xlsx round trip)
         from excel_to_pdf_table import convert_to_pdf_table
         
         pdf_path = os.path.join(tmpdir, Path(filename).stem + '_statement.pdf')
         
         print("Converting to PDF with custom formatting...")
         result = convert_to_pdf_table(
-            input_path=excel_path,
+            input_path=file_path,
             output_path=pdf_path,
             account_info=account_info,
-            logo_path=logo_path,
-            use_ilovepdf_api=False  # Use custom ReportLab formatting
+            logo_path=logo,  # Path or bytes
+            use_ilovepdf_api=False,  # Use custom ReportLab formatting
+            sheets=sheets,
+            font_path=font
         )
         
         if not result or not os.path.exists(result):
@@ -1926,6 +1670,9 @@ def excel_to_pdf_custom():
             mimetype='application/pdf'
         )
     
+    except SheetSelectionError as e:
+        # Unknown sheet name / position in the selection
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         error_msg = str(e)
         print(f"\n{'='*60}")
@@ -1945,6 +1692,159 @@ def excel_to_pdf_custom():
             except:
                 pass
 
+# Root directory that batch jobs may write into when output=directory (unset disables it)
+STATEMENT_OUTPUT_ROOT = os.environ.get('STATEMENT_OUTPUT_ROOT')
+
+def save_batch_uploads(uploads, input_dir, suffix):
+    """Save uploaded PDFs as (arcname, input_path) with unique "<stem>_<suffix>.pdf" names"""
+    from batch_runner import unique_name
+    inputs = []
+    used_names = set()
+    for index, upload in enumerate(uploads):
+        stem = Path(secure_filename(upload.filename)).stem or f"document_{index + 1}"
+        input_path = os.path.join(input_dir, f"{index:05d}.pdf")
+        upload.save(input_path)
+        inputs.append((unique_name(f"{stem}_{suffix}.pdf", used_names), input_path))
+    return inputs
+
+def batch_zip_response(results, job_dir, zip_name):
+    """
+    Stream batch results (arcname, output_path, error) as a ZIP download
+    Failed files are listed in errors.txt inside the ZIP. The first result is
+    taken here, so a batch that cannot start raises in the request (and becomes
+    a JSON error) instead of sending a truncated ZIP. From then on the stream
+    owns ``job_dir`` and removes it when done.
+    """
+    from itertools import chain
+    from zip_stream import iter_zip
+    first = next(results)
+    
+    def generate():
+        errors = []
+        
+        def entries():
+            for arcname, output_path, error in chain([first], results):
+                if error:
+                    print(f"  [FAIL] {arcname}: {error}")
+                    errors.append(f"{arcname}: {error}")
+                    continue
+                yield arcname, output_path
+            if errors:
+                yield 'errors.txt', ('\n'.join(errors) + '\n').encode('utf-8')
+        
+        try:
+            for chunk in iter_zip(entries()):
+                yield chunk
+        finally:
+            results.close()
+            shutil.rmtree(job_dir, ignore_errors=True)
+    
+    return Response(generate(), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{zip_name}"'})
+
+@app.route('/api/convert/excel-to-bank-statement/batch', methods=['POST', 'OPTIONS'])
+def excel_to_bank_statement_batch():
+    """
+    Render one bank statement PDF per account from a master workbook / CSV
+    Form fields: file, group_by (column), optional logo, font, template (JSON),
+    sheet, output=zip|directory and output_dir (relative to STATEMENT_OUTPUT_ROOT)
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    tmpdir = None
+    try:
+        print(f"\n{'='*60}")
+        print(f"BATCH BANK STATEMENTS")
+        print(f"{'='*60}\n")
+        
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        if not allowed_file(file.filename, {'xlsx', 'xls', 'csv'}):
+            return jsonify({'error': 'Only Excel (.xlsx, .xls) or CSV (.csv) files are allowed'}), 400
+        
+        group_by = request.form.get('group_by', '').strip()
+        if not group_by:
+            return jsonify({'error': 'group_by column is required'}), 400
+        
+        output_mode = request.form.get('output', 'zip')
+        if output_mode not in ('zip', 'directory'):
+            return jsonify({'error': 'output must be zip or directory'}), 400
+        
+        output_dir = None
+        if output_mode == 'directory':
+            if not STATEMENT_OUTPUT_ROOT:
+                return jsonify({'error': 'Directory output is disabled (STATEMENT_OUTPUT_ROOT not set)'}), 400
+            root = os.path.realpath(STATEMENT_OUTPUT_ROOT)
+            output_dir = os.path.realpath(os.path.join(root, request.form.get('output_dir', '')))
+            if os.path.commonpath([root, output_dir]) != root:
+                return jsonify({'error': 'output_dir must stay inside the output root'}), 400
+        
+        # Shared branding, kept in memory and prepared once per worker process
+        from statement_batch import BatchTemplate, iter_account_statements, load_statement_table
+        
+        logo = None
+        if 'logo' in request.files and request.files['logo'].filename:
+            logo = request.files['logo'].read()
+        font = None
+        if 'font' in request.files and request.files['font'].filename:
+            font = request.files['font'].read()
+        
+        template_json = request.form.get('template')
+        if 'template' in request.files and request.files['template'].filename:
+            template_json = request.files['template'].read().decode('utf-8')
+        try:
+            template = BatchTemplate.from_dict(json.loads(template_json) if template_json else None)
+        except json.JSONDecodeError as e:
+            return jsonify({'error': f'Invalid template JSON: {e}'}), 400
+        
+        tmpdir = tempfile.mkdtemp()
+        filename = secure_filename(file.filename)
+        file_path = os.path.join(tmpdir, filename)
+        file.save(file_path)
+        
+        sheet = (request.form.get('sheet') or '').strip() or None  # Name or 1-based position
+        df = load_statement_table(file_path, sheet)
+        print(f"Input: {filename} ({len(df)} rows), grouped by {group_by!r}")
+        
+        if output_mode == 'directory':
+            os.makedirs(output_dir, exist_ok=True)
+            files, errors = [], []
+            for name, pdf_path, error in iter_account_statements(df, group_by, output_dir, template,
+                                                                 logo, font):
+                if error:
+                    errors.append(f"{name}: {error}")
+                else:
+                    files.append(name)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            tmpdir = None
+            print(f"[OK] {len(files)} statements written to {output_dir}")
+            return jsonify({'success': True, 'count': len(files),
+                            'output_dir': output_dir, 'files': files, 'errors': errors})
+        
+        # ZIP: validate the grouping up front, then stream each PDF as it is rendered
+        statements = iter_account_statements(df, group_by, tmpdir, template, logo, font)
+        response = batch_zip_response(statements, tmpdir, Path(filename).stem + '_statements.zip')
+        tmpdir = None
+        return response
+    
+    except ValueError as e:
+        # Unknown sheet, grouping / template column, empty input
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Batch statement error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if tmpdir and os.path.exists(tmpdir):
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
 @app.route('/api/convert/pdf-to-jpg', methods=['POST', 'OPTIONS'])
 def pdf_to_jpg():
     """Convert PDF to JPG images - Optimized for speed"""
@@ -2078,17 +1978,24 @@ def pdf_to_jpg():
 
 @app.route('/api/convert/jpg-to-pdf', methods=['POST', 'OPTIONS'])
 def jpg_to_pdf():
-    """Convert JPG/JPEG images to PDF with options - iLovePDF style"""
+    """
+    Convert JPG/JPEG images to PDF with options - iLovePDF style
+    Images come as 'files' parts, or as one ZIP / TAR in 'archive' (natural filename order)
+    """
     if request.method == 'OPTIONS':
         return '', 204
     tmpdir = None
     try:
-        if 'files' not in request.files:
+        archive = request.files.get('archive')
+        if archive and archive.filename:
+            files = []
+        elif 'files' not in request.files:
             return jsonify({'error': 'No files provided'}), 400
-        
-        files = request.files.getlist('files')
-        if not files:
-            return jsonify({'error': 'No files selected'}), 400
+        else:
+            archive = None
+            files = request.files.getlist('files')
+            if not files:
+                return jsonify({'error': 'No files selected'}), 400
         
         # Get options from form data
         orientation = request.form.get('orientation', 'portrait')  # 'portrait' or 'landscape'
@@ -2096,91 +2003,57 @@ def jpg_to_pdf():
         margin = request.form.get('margin', 'no')  # 'no', 'small', 'big'
         merge_all = request.form.get('mergeAll', 'false').lower() == 'true'
         
-        # Margin settings in points (1 inch = 72 points)
-        margin_map = {
-            'no': 0,
-            'small': 36,  # 0.5 inch
-            'big': 72     # 1 inch
-        }
-        margin_size = margin_map.get(margin, 0)
+        # Optional normalization: downsample to a DPI for the page size, recompress at a quality
+        target_dpi = request.form.get('targetDpi', type=int)
+        quality = request.form.get('quality', type=int)
+        if quality is not None:
+            quality = max(1, min(quality, 95))
         
-        # Page size settings (width, height in points)
-        page_sizes = {
-            'A4': (595, 842),
-            'Letter': (612, 792),
-            'Legal': (612, 1008)
-        }
+        from images_to_pdf import (ImagePdfWriter, ImageOptions, normalize_images, archive_images,
+                                   is_archive, MARGINS)
+        options = ImageOptions(page_size, orientation, MARGINS.get(margin, 0), target_dpi, quality)
         
         # Create temp directory
         tmpdir = tempfile.mkdtemp()
         
-        print(f"Converting {len(files)} images to PDF (orientation: {orientation}, merge: {merge_all})")
+        if archive:
+            # ZIP members are read one at a time from the upload; TAR members are spooled to disk
+            if not is_archive(archive.filename):
+                return jsonify({'error': 'Archive must be .zip, .tar, .tar.gz, .tgz, .tar.bz2 or .tar.xz'}), 400
+            images = [(secure_filename(name) or 'image', read)
+                      for name, read in archive_images(archive.stream, archive.filename, tmpdir)]
+            if not images:
+                return jsonify({'error': 'No JPG or PNG images found in archive'}), 400
+        else:
+            images = [(secure_filename(file.filename), file.read) for file in files]
+            images = [(filename, read) for filename, read in images
+                      if allowed_file(filename, {'jpg', 'jpeg', 'png'})]
+            if not images:
+                return jsonify({'error': 'No JPG or PNG images provided'}), 400
+        
+        print(f"Converting {len(images)} images to PDF (orientation: {orientation}, merge: {merge_all}, "
+              f"dpi: {target_dpi or 'original'}, quality: {quality or 'original'})")
         
-        from PIL import Image
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import A4, letter, legal, landscape, portrait
-        from reportlab.lib.utils import ImageReader
+        # EXIF orientation / downsampling / recompression run in a thread pool, results in order
+        # (JPEGs with no options set are embedded as-is, no decode / re-encode)
+        pages = normalize_images([read for _, read in images], options)
         
         if merge_all:
-            # Merge all images into one PDF
+            # Merge all images into one PDF, pages streamed to disk as they are added
             pdf_filename = "merged_images.pdf"
             pdf_path = os.path.join(tmpdir, pdf_filename)
-            c = canvas.Canvas(pdf_path)
             
-            for idx, file in enumerate(files):
-                filename = secure_filename(file.filename)
-                if not allowed_file(filename, {'jpg', 'jpeg', 'png'}):
-                    continue
-                
-                img_path = os.path.join(tmpdir, filename)
-                file.save(img_path)
-                
-                img = Image.open(img_path)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                img_width, img_height = img.size
-                
-                # Determine page size
-                if page_size == 'fit':
-                    if orientation == 'landscape':
-                        page_w, page_h = max(img_width, img_height), min(img_width, img_height)
-                    else:
-                        page_w, page_h = min(img_width, img_height), max(img_width, img_height)
-                else:
-                    base_size = page_sizes.get(page_size, (595, 842))
-                    if orientation == 'landscape':
-                        page_w, page_h = max(base_size), min(base_size)
-                    else:
-                        page_w, page_h = min(base_size), max(base_size)
-                
-                c.setPageSize((page_w, page_h))
-                
-                # Calculate image position with margin
-                available_w = page_w - (2 * margin_size)
-                available_h = page_h - (2 * margin_size)
-                
-                # Scale image to fit
-                scale = min(available_w / img_width, available_h / img_height)
-                new_w = img_width * scale
-                new_h = img_height * scale
-                
-                # Center image
-                x = (page_w - new_w) / 2
-                y = (page_h - new_h) / 2
-                
-                c.drawImage(img_path, x, y, new_w, new_h)
-                c.showPage()
-                
-                print(f"[OK] Added page {idx+1}/{len(files)}: {filename}")
-            
-            c.save()
+            with open(pdf_path, 'wb') as out, ImagePdfWriter(out) as writer:
+                for idx, ((filename, _), page) in enumerate(zip(images, pages)):
+                    writer.add_page(*page)
+                    print(f"[OK] Added page {idx+1}/{len(images)}: {filename}")
+                page_count = len(writer)
             
             # Read and encode
             with open(pdf_path, 'rb') as f:
                 pdf_base64 = base64.b64encode(f.read()).decode('utf-8')
             
-            print(f"[OK] Created merged PDF with {len(files)} pages")
+            print(f"[OK] Created merged PDF with {page_count} pages")
             print(f"{'='*60}\n")
             
             return jsonify({
@@ -2195,62 +2068,18 @@ def jpg_to_pdf():
             # Create separate PDFs
             pdf_data_list = []
             
-            for idx, file in enumerate(files):
-                filename = secure_filename(file.filename)
-                if not allowed_file(filename, {'jpg', 'jpeg', 'png'}):
-                    continue
-                
-                img_path = os.path.join(tmpdir, filename)
-                file.save(img_path)
-                
-                img = Image.open(img_path)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                img_width, img_height = img.size
-                
-                # Determine page size
-                if page_size == 'fit':
-                    if orientation == 'landscape':
-                        page_w, page_h = max(img_width, img_height), min(img_width, img_height)
-                    else:
-                        page_w, page_h = min(img_width, img_height), max(img_width, img_height)
-                else:
-                    base_size = page_sizes.get(page_size, (595, 842))
-                    if orientation == 'landscape':
-                        page_w, page_h = max(base_size), min(base_size)
-                    else:
-                        page_w, page_h = min(base_size), max(base_size)
-                
+            for idx, ((filename, _), page) in enumerate(zip(images, pages)):
                 pdf_filename = f"{Path(filename).stem}.pdf"
-                pdf_path = os.path.join(tmpdir, pdf_filename)
-                c = canvas.Canvas(pdf_path, pagesize=(page_w, page_h))
+                out = io.BytesIO()
+                with ImagePdfWriter(out) as writer:
+                    writer.add_page(*page)
                 
-                # Calculate image position with margin
-                available_w = page_w - (2 * margin_size)
-                available_h = page_h - (2 * margin_size)
-                
-                # Scale image to fit
-                scale = min(available_w / img_width, available_h / img_height)
-                new_w = img_width * scale
-                new_h = img_height * scale
-                
-                # Center image
-                x = (page_w - new_w) / 2
-                y = (page_h - new_h) / 2
-                
-                c.drawImage(img_path, x, y, new_w, new_h)
-                c.save()
-                
-                # Read and encode
-                with open(pdf_path, 'rb') as f:
-                    pdf_base64 = base64.b64encode(f.read()).decode('utf-8')
-                    pdf_data_list.append({
-                        'filename': pdf_filename,
-                        'data': pdf_base64
-                    })
+                pdf_data_list.append({
+                    'filename': pdf_filename,
+                    'data': base64.b64encode(out.getvalue()).decode('utf-8')
+                })
                 
-                print(f"[OK] Converted {idx+1}/{len(files)}: {filename} -> {pdf_filename}")
+                print(f"[OK] Converted {idx+1}/{len(images)}: {filename} -> {pdf_filename}")
             
             print(f"[OK] Generated {len(pdf_data_list)} PDFs")
             print(f"{'='*60}\n")
@@ -2261,6 +2090,11 @@ def jpg_to_pdf():
                 'pdfs': pdf_data_list
             })
     
+    except UnidentifiedImageError as e:
+        return jsonify({'error': f'Not a readable JPG or PNG image: {e}'}), 400
+    except (ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+        # Oversized member, unreadable archive or no pages
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         # Ensure error message is properly encoded
         error_msg = str(e)
@@ -2320,81 +2154,47 @@ def sign_pdf():
         print(f"Signatures: {len(signatures)}")
         print(f"{'='*60}\n")
         
-        from PyPDF2 import PdfReader, PdfWriter
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import letter
-        from PIL import Image as PILImage
-        import io as iomodule
+        from pypdf import PdfReader, PdfWriter
+        from signature_assets import (SignatureAssets, apply_signature_placements,
+                                      group_placements, insert_signature_images)
+        
+        # Each distinct signature image is decoded and embedded once
+        assets = SignatureAssets()
+        signatures_by_page = group_placements(signatures, {}, assets, default_position=100)
+        
+        output_filename = f"signed_{filename}"
+        output_path = os.path.join(tmpdir, output_filename)
+        
+        if is_incremental_requested(request.form.get('incremental')):
+            # Append the signed pages to the saved upload; original bytes stay as they are
+            update_file(input_pdf_path, lambda doc: insert_signature_images(doc, signatures_by_page, assets))
+            os.replace(input_pdf_path, output_path)
+            print(f"[OK] Created signed PDF (incremental update): {output_filename}")
+            return send_file(
+                output_path,
+                as_attachment=True,
+                download_name=output_filename,
+                mimetype='application/pdf'
+            )
         
         # Read the original PDF
         reader = PdfReader(input_pdf_path)
         writer = PdfWriter()
         
         # Process each page
-        for page_num in range(len(reader.pages)):
-            page = reader.pages[page_num]
-            page_width = float(page.mediabox.width)
-            page_height = float(page.mediabox.height)
-            
-            # Get signatures for this page
-            page_signatures = [sig for sig in signatures if sig.get('page') == page_num]
-            
-            if page_signatures:
-                # Create overlay with signatures
-                packet = iomodule.BytesIO()
-                can = canvas.Canvas(packet, pagesize=(page_width, page_height))
-                
-                for sig in page_signatures:
-                    try:
-                        # Decode base64 signature image
-                        sig_data = sig.get('data', '')
-                        if sig_data.startswith('data:image'):
-                            sig_data = sig_data.split(',')[1]
-                        
-                        sig_bytes = base64.b64decode(sig_data)
-                        sig_image = PILImage.open(iomodule.BytesIO(sig_bytes))
-                        
-                        # Save signature as temp image
-                        sig_path = os.path.join(tmpdir, f'sig_{page_num}_{signatures.index(sig)}.png')
-                        sig_image.save(sig_path, 'PNG')
-                        
-                        # Get position and size
-                        x = float(sig.get('x', 100))
-                        y = float(sig.get('y', 100))
-                        width = float(sig.get('width', 150))
-                        height = float(sig.get('height', 50))
-                        
-                        # Convert coordinates (PDF uses bottom-left origin)
-                        y_converted = page_height - y - height
-                        
-                        # Draw signature on canvas
-                        can.drawImage(sig_path, x, y_converted, width, height, mask='auto')
-                        
-                        print(f"[OK] Added signature to page {page_num + 1} at ({x}, {y})")
-                        
-                    except Exception as e:
-                        print(f"Warning: Could not add signature: {str(e)}")
-                        continue
-                
-                can.save()
-                
-                # Move to the beginning of the BytesIO buffer
-                packet.seek(0)
-                
-                # Read the overlay PDF
-                overlay_pdf = PdfReader(packet)
-                overlay_page = overlay_pdf.pages[0]
-                
-                # Merge overlay with original page
-                page.merge_page(overlay_page)
-            
-            # Add page to writer
-            writer.add_page(page)
+        targets = []
+        for page_num, page in enumerate(reader.pages):
+            new_page = writer.add_page(page)
+            if page_num in signatures_by_page:
+                targets.append((new_page, signatures_by_page[page_num]))
+                for _, x, y, _, _ in signatures_by_page[page_num]:
+                    print(f"[OK] Added signature to page {page_num + 1} at ({x}, {y})")
         
-        # Save signed PDF
-        output_filename = f"signed_{filename}"
-        output_path = os.path.join(tmpdir, output_filename)
+        if targets:
+            # Convert coordinates (PDF uses bottom-left origin) via one shared overlay
+            apply_signature_placements(writer, targets, assets, upright=False)
         
+        # Save signed PDF
         with open(output_path, 'wb') as output_file:
             writer.write(output_file)
         
@@ -2409,6 +2209,9 @@ def sign_pdf():
             mimetype='application/pdf'
         )
     
+    except ValueError as e:
+        # Malformed signatures JSON or placement
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error: {str(e)}")
         import traceback
@@ -2440,7 +2243,8 @@ def api_health_check():
         if result.returncode == 0:
             return jsonify({
                 'status': 'healthy',
-                'libreoffice': result.stdout.strip()
+                'libreoffice': result.stdout.strip(),
+                'excel_backends': excel_pdf_backends.snapshot()
             })
         else:
             return jsonify({
@@ -2458,9 +2262,64 @@ def edit_pdf_page():
     """Render the PDF editor page"""
     return render_template('edit_pdf.html')
 
+# Uploaded documents, shared by every worker through the disk; calls pass
+# document ids around instead of the PDF itself
+DOCUMENT_STORE = DocumentStore()
+
+def stored_pdf(document_id):
+    """Bytes of a stored document; ValueError for unknown or expired ids"""
+    try:
+        return DOCUMENT_STORE.get(document_id)
+    except DocumentNotFound:
+        raise ValueError("Unknown or expired document id")
+
+def pdf_from_request(base64_field='pdf_data', json_fields=()):
+    """
+    PDF bytes and options for endpoints that take a document plus a small payload
+    The PDF arrives as a binary multipart part (``file``), as the id of a stored
+    document (``document_id``), or base64 in a JSON body for older clients.
+    In multipart requests the fields in ``json_fields`` hold JSON.
+    Returns (pdf_bytes, options, source) with source 'multipart', 'document'
+    or 'json'; raises ValueError for bad input
+    """
+    is_multipart = bool(request.files) or request.mimetype == 'multipart/form-data'
+    if is_multipart:
+        options = request.form.to_dict()
+        for field in json_fields:
+            if field in options:
+                try:
+                    options[field] = json.loads(options[field])
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Invalid JSON in {field}: {e}")
+        upload = request.files.get('file')
+        pdf_bytes = upload.read() if upload else None
+        if upload and upload.filename:
+            options.setdefault('filename', secure_filename(upload.filename))
+    else:
+        # cache=False: the raw body is not kept next to the parsed JSON
+        options = request.get_json(silent=True, cache=False) or {}
+        encoded = options.pop(base64_field, None)
+        pdf_bytes = None
+        if encoded:
+            if ',' in encoded:  # data: URL
+                encoded = encoded.split(',', 1)[1]
+            pdf_bytes = base64.b64decode(encoded)
+    
+    document_id = options.get('document_id') or options.get('session_id')
+    if pdf_bytes is None and document_id:
+        pdf_bytes = stored_pdf(document_id)
+        options.setdefault('filename', DOCUMENT_STORE.filename(document_id))
+        return pdf_bytes, options, 'document'
+    return pdf_bytes, options, 'multipart' if is_multipart else 'json'
+
+@app.route('/api/documents', methods=['POST', 'OPTIONS'])
 @app.route('/api/upload-pdf-for-edit', methods=['POST', 'OPTIONS'])
 def upload_pdf_for_edit():
-    """Upload PDF and return base64 encoded data for editor"""
+    """
+    Upload a PDF to the document store
+    Returns its document_id; render, sign, watermark and save calls take that
+    id instead of the PDF, and GET /api/documents/<id> downloads it
+    """
     if request.method == 'OPTIONS':
         return '', 204
     try:
@@ -2474,58 +2333,98 @@ def upload_pdf_for_edit():
         if not allowed_file(file.filename, {'pdf'}):
             return jsonify({'error': 'Only PDF files are allowed'}), 400
         
-        # Read PDF and encode to base64
         pdf_data = file.read()
-        base64_pdf = base64.b64encode(pdf_data).decode('utf-8')
-        
-        # Store in session for later download
-        session_id = str(uuid.uuid4())
-        session[session_id] = {
-            'filename': secure_filename(file.filename),
-            'original_data': base64_pdf
-        }
+        try:
+            with fitz.open(stream=pdf_data, filetype='pdf') as doc:
+                page_count = len(doc)
+        except Exception as e:
+            return jsonify({'error': f'Invalid PDF file: {e}'}), 400
+        document_id = DOCUMENT_STORE.put(pdf_data, secure_filename(file.filename))
         
         return jsonify({
             'success': True,
-            'pdf_data': base64_pdf,
-            'session_id': session_id,
-            'filename': file.filename
+            'document_id': document_id,
+            'session_id': document_id,  # Older clients
+            'filename': file.filename,
+            'size': len(pdf_data),
+            'page_count': page_count
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/documents/<document_id>', methods=['GET'])
+def download_document(document_id):
+    """Download a stored document"""
+    try:
+        path = DOCUMENT_STORE.path(document_id)
+    except DocumentNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    filename = DOCUMENT_STORE.filename(document_id) or 'document.pdf'
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:  # Swept by another worker in between
+        return jsonify({'error': f"Unknown or expired document id: {document_id}"}), 404
+    return send_file(f, mimetype='application/pdf', as_attachment=True, download_name=filename)
+
+@app.route('/api/documents/<document_id>/pages/<int:page_number>', methods=['GET'])
+def render_document_page(document_id, page_number):
+    """PNG of one page (1-based) of a stored document; ?dpi= (default 72, max 300)"""
+    try:
+        path = DOCUMENT_STORE.path(document_id)
+    except DocumentNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    dpi = min(max(request.args.get('dpi', 72, type=int), 18), 300)
+    try:
+        doc = fitz.open(path)
+    except Exception:
+        if os.path.exists(path):
+            raise
+        # Swept by another worker between path() and open()
+        return jsonify({'error': f"Unknown or expired document id: {document_id}"}), 404
+    with doc:
+        if not 1 <= page_number <= len(doc):
+            return jsonify({'error': f"Page {page_number} is out of range (1-{len(doc)})"}), 404
+        png = doc[page_number - 1].get_pixmap(dpi=dpi).tobytes('png')
+    response = send_file(io.BytesIO(png), mimetype='image/png')
+    # Ids name immutable content: a page at a given dpi never changes
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+def stored_result(pdf_bytes, filename, **extra):
+    """JSON answer for calls that took a document id: the result is stored too"""
+    document_id = DOCUMENT_STORE.put(pdf_bytes, filename)
+    return jsonify({'success': True, 'document_id': document_id, 'filename': filename,
+                    'size': len(pdf_bytes), **extra})
+
 @app.route('/api/save-edited-pdf', methods=['POST', 'OPTIONS'])
 def save_edited_pdf():
-    """Save edited PDF from base64 data"""
+    """
+    Save an edited PDF
+    Takes the PDF as a binary multipart ``file`` part, a ``document_id`` or,
+    for older clients, base64 ``pdf_data`` in a JSON body; ``filename`` is
+    optional.
+    """
     if request.method == 'OPTIONS':
         return '', 204
     try:
-        data = request.get_json()
+        pdf_bytes, options, _ = pdf_from_request()
         
-        if not data or 'pdf_data' not in data:
+        if not pdf_bytes:
             return jsonify({'error': 'No PDF data provided'}), 400
         
-        # Decode base64 PDF
-        pdf_base64 = data['pdf_data'].split(',')[1] if ',' in data['pdf_data'] else data['pdf_data']
-        pdf_bytes = base64.b64decode(pdf_base64)
-        
-        # Create temp file
-        tmpdir = tempfile.mkdtemp()
-        filename = data.get('filename', 'edited-document.pdf')
-        pdf_path = os.path.join(tmpdir, filename)
-        
-        with open(pdf_path, 'wb') as f:
-            f.write(pdf_bytes)
+        filename = secure_filename(options.get('filename') or '') or 'edited-document.pdf'
         
         # Send file
         return send_file(
-            pdf_path,
+            io.BytesIO(pdf_bytes),
             as_attachment=True,
             download_name=filename,
             mimetype='application/pdf'
         )
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2571,16 +2470,18 @@ def api_info():
             'docx-to-pdf': '/api/convert/docx-to-pdf (POST)',
             'pdf-to-excel': '/api/convert/pdf-to-excel (POST)',
             'excel-to-pdf': '/api/convert/excel-to-pdf (POST) - Supports .xlsx, .xls, .csv',
+            'excel-to-bank-statement-batch': '/api/convert/excel-to-bank-statement/batch (POST) - One statement per account, ZIP or directory',
             'edit-pdf': '/edit-pdf (GET) - Interactive PDF Editor',
             'health': '/api/health (GET)'
         },
         'features': {
-            'excel_to_pdf': 'Microsoft Excel COM automation for pixel-perfect conversion',
-            'csv_support': 'Auto-converts CSV to formatted Excel then PDF',
+            'excel_to_pdf': 'Routed to the first available engine: Excel COM, then LibreOffice (native renderer opt-in)',
+            'csv_support': 'Renders CSV rows directly to PDF (no intermediate Excel file)',
             'bank_statements': 'Optimized for bank statements with logos and wide tables',
             'landscape_auto': 'Automatically uses landscape for tables with 6+ columns',
             'pdf_editor': 'Full-featured PDF editor with text, images, shapes, and annotations'
-        }
+        },
+        'excel_backends': excel_pdf_backends.snapshot()
     })
 
 # ============================================
@@ -2596,40 +2497,45 @@ def test_sign_api():
         'timestamp': str(pd.Timestamp.now())
     })
 
+# Signature fonts, found and read once at startup; per-size fonts and rendered
+# previews are cached in each worker process
+SIGNATURE_FONTS = SignatureFonts()
+
 @app.route('/api/sign/create-text-signature', methods=['POST', 'OPTIONS'])
 def create_text_signature():
-    """Create signature from text"""
+    """
+    Create signature from text
+    JSON: text, style (script / casual / print), fontSize, color and format
+    (png for a tightly cropped image, pdf for a vector one-page form)
+    """
     if request.method == 'OPTIONS':
         return '', 204
     try:
-        print("=== CREATE TEXT SIGNATURE API CALLED ===")
-        data = request.json
-        print(f"Request data: {data}")
+        data = request.json or {}
         text = data.get('text', 'Signature')
-        print(f"Text to create: {text}")
+        style = data.get('style')
+        size = min(max(int(data.get('fontSize', 40)), 8), 200)
+        color = data.get('color', '#000000')
+        output_format = data.get('format', 'png').lower()
+        if output_format not in ('png', 'pdf'):
+            return jsonify({'error': 'Invalid format (use png or pdf)'}), 400
+        print(f"Create text signature: {text!r} ({style or 'default'} {size}px, {output_format})")
+        
+        # Fonts were found and loaded at startup; repeated previews come from the cache
+        if output_format == 'pdf':
+            signature = SIGNATURE_FONTS.render_pdf(text, style, size, color)
+        else:
+            signature = SIGNATURE_FONTS.render_png(text, style, size, color)
         
-        # Create signature image from text
-        img = Image.new('RGBA', (400, 100), (255, 255, 255, 0))
-        draw = ImageDraw.Draw(img)
-        try:
-            font = ImageFont.truetype("arial.ttf", 40)
-        except Exception as font_error:
-            print(f"Arial font not found, using default: {font_error}")
-            font = ImageFont.load_default()
-        draw.text((20, 20), text, fill=(0, 0, 0, 255), font=font)
-        
-        # Convert to base64
-        buffered = io.BytesIO()
-        img.save(buffered, format="PNG")
-        sig_b64 = base64.b64encode(buffered.getvalue()).decode()
-        
-        print("Signature created successfully")
         return jsonify({
             'success': True,
-            'signature': sig_b64,
+            'signature': base64.b64encode(signature).decode(),
+            'format': output_format,
             'message': 'Signature created successfully'
         })
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"ERROR in create_text_signature: {str(e)}")
         import traceback
@@ -2639,7 +2545,13 @@ def create_text_signature():
 
 @app.route('/api/sign/apply-signatures', methods=['POST', 'OPTIONS'])
 def apply_signatures_to_pdf():
-    """Apply signatures and stamps to PDF - Using sign_pdf_streamlit.py logic"""
+    """
+    Apply signatures and stamps to PDF - Using sign_pdf_streamlit.py logic
+    JSON body with base64 pdf_data (answered with base64 JSON), multipart with
+    the PDF as a binary ``file`` part and a ``placements`` JSON field (answered
+    with the PDF itself), or a stored ``document_id`` (the signed PDF is stored
+    and its id returned)
+    """
     
     # Handle CORS preflight
     if request.method == 'OPTIONS':
@@ -2647,28 +2559,22 @@ def apply_signatures_to_pdf():
     
     try:
         from pypdf import PdfReader, PdfWriter
-        from reportlab.pdfgen import canvas as rcanvas
-        from reportlab.lib.utils import ImageReader
         
         print("\n" + "="*50)
         print("=== APPLY SIGNATURES API CALLED ===")
         print("="*50)
         
-        # Get request data
-        data = request.json
-        if not data:
-            print("ERROR: No JSON data received")
-            return jsonify({'success': False, 'error': 'No data received'}), 400
-        
-        pdf_data = data.get('pdf_data')  # base64
-        placements = data.get('placements', [])  # list of placement objects
+        # The PDF as a binary multipart part, a document id or base64 JSON
+        pdf_bytes, data, source = pdf_from_request(json_fields=('placements',))
+        placements = data.get('placements') or []  # list of placement objects
+        # Multipart requests may send images as parts, named by a placement's dataFile
+        images = {name: upload.read() for name, upload in request.files.items() if name != 'file'}
         
-        print(f"PDF data present: {bool(pdf_data)}")
-        print(f"PDF data length: {len(pdf_data) if pdf_data else 0}")
+        print(f"PDF data present: {bool(pdf_bytes)}")
+        print(f"PDF size: {len(pdf_bytes) if pdf_bytes else 0} bytes")
         print(f"Number of placements: {len(placements)}")
-        print(f"Placements: {placements}")
         
-        if not pdf_data:
+        if not pdf_bytes:
             print("ERROR: No PDF data provided")
             return jsonify({'success': False, 'error': 'No PDF data provided'}), 400
             
@@ -2676,120 +2582,59 @@ def apply_signatures_to_pdf():
             print("ERROR: No placements provided")
             return jsonify({'success': False, 'error': 'No placements provided'}), 400
         
-        # Decode PDF
-        pdf_bytes = base64.b64decode(pdf_data)
-        pdf_reader = PdfReader(io.BytesIO(pdf_bytes))
-        pdf_writer = PdfWriter()
-        
-        # Group placements by page
-        placements_by_page = {}
-        for p in placements:
-            page_idx = p['page']
-            if page_idx not in placements_by_page:
-                placements_by_page[page_idx] = []
-            placements_by_page[page_idx].append(p)
-        
-        # Process each page
-        for i, page in enumerate(pdf_reader.pages):
-            page_w = float(page.mediabox.width)
-            page_h = float(page.mediabox.height)
-            
-            if i in placements_by_page:
-                # Create overlay
-                overlay_stream = io.BytesIO()
-                c = rcanvas.Canvas(overlay_stream, pagesize=(page_w, page_h))
-                
-                for placement in placements_by_page[i]:
-                    # Get image data
-                    image_data = placement.get('data')
-                    is_stamp = placement.get('type') == 'stamp'
-                    
-                    if not image_data:
-                        continue
-                    
-                    # Remove data:image/png;base64, prefix if present
-                    if 'base64,' in image_data:
-                        image_data = image_data.split('base64,')[1]
-                    
-                    print(f"  - Image data length: {len(image_data)}")
-                    
-                    # Decode image
-                    try:
-                        img_bytes = base64.b64decode(image_data)
-                        print(f"  - Decoded image bytes: {len(img_bytes)}")
-                        img = Image.open(io.BytesIO(img_bytes))
-                        print(f"  - Image opened successfully: {img.size}")
-                    except Exception as img_error:
-                        print(f"  - ERROR decoding image: {img_error}")
-                        continue
-                    
-                    # Save to temp file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp:
-                        img.save(tmp.name, 'PNG')
-                        tmp_path = tmp.name
-                    
-                    try:
-                        sig_img = Image.open(tmp_path)
-                        sig_w, sig_h = sig_img.size
-                        
-                        # Get target dimensions
-                        target_w = placement.get('width', 150)
-                        target_h = placement.get('height', 50)
-                        
-                        # Get position (from React - top-left origin, pixels)
-                        react_x = placement.get('x', 0)
-                        react_y = placement.get('y', 0)
-                        
-                        # Convert from React coordinates (top-left, pixels) to PDF coordinates (bottom-left, points)
-                        # React Y=0 is top, PDF Y=0 is bottom
-                        abs_x = react_x
-                        abs_y = page_h - react_y - target_h
-                        
-                        item_type = "STAMP" if is_stamp else "SIGNATURE"
-                        print(f"\nDEBUG: Page {i+1} - {item_type}")
-                        print(f"  - React position: x={react_x:.1f}, y={react_y:.1f}")
-                        print(f"  - Page size: w={page_w:.1f}, h={page_h:.1f}")
-                        print(f"  - Image size: w={target_w:.1f}, h={target_h:.1f}")
-                        print(f"  - PDF position: x={abs_x:.1f}, y={abs_y:.1f}")
-                        print(f"  - Drawing image from: {tmp_path}")
-                        
-                        # Draw image
-                        try:
-                            c.drawImage(
-                                ImageReader(tmp_path),
-                                abs_x,
-                                abs_y,
-                                width=target_w,
-                                height=target_h,
-                                mask='auto'
-                            )
-                            print(f"  [OK] Image drawn successfully!")
-                        except Exception as draw_error:
-                            print(f"  [ERROR] ERROR drawing image: {draw_error}")
-                            import traceback
-                            traceback.print_exc()
-                    finally:
-                        try:
-                            os.unlink(tmp_path)
-                        except:
-                            pass
-                
-                c.save()
-                overlay_stream.seek(0)
-                
-                # Merge overlay
-                overlay_pdf = PdfReader(overlay_stream)
-                page.merge_page(overlay_pdf.pages[0])
-            
-            pdf_writer.add_page(page)
-        
-        # Generate output
-        output_stream = io.BytesIO()
-        pdf_writer.write(output_stream)
-        output_stream.seek(0)
+        # Deduplicated image table: each distinct signature / stamp is decoded
+        # once and embedded once, however many placements use it
+        from signature_assets import (SignatureAssets, apply_signature_placements,
+                                      group_placements, insert_signature_images)
+        assets = SignatureAssets()
+        
+        # Validate every placement up front (400 on a malformed one), grouped by page
+        placements_by_page = group_placements(placements, images, assets)
+        for page_index, items in sorted(placements_by_page.items()):
+            print(f"  - Page {page_index + 1}: {len(items)} placement(s)")
+        print(f"  - Distinct images: {len(assets)} for {len(placements)} placements")
+        
+        if is_incremental_requested(data.get('incremental')):
+            # Only the signed pages and images are appended after the original bytes
+            signed_pdf = update_bytes(
+                pdf_bytes, lambda doc: insert_signature_images(doc, placements_by_page, assets))
+        else:
+            pdf_reader = PdfReader(io.BytesIO(pdf_bytes))
+            pdf_writer = PdfWriter()
+            
+            # Copy every page once; signed pages get the overlay as a shared form
+            targets = []
+            for i, page in enumerate(pdf_reader.pages):
+                new_page = pdf_writer.add_page(page)
+                if i in placements_by_page:
+                    targets.append((new_page, placements_by_page[i]))
+            
+            if targets:
+                # React coordinates: top-left origin on the unrotated page
+                apply_signature_placements(pdf_writer, targets, assets, upright=False)
+            
+            # Generate output
+            output_stream = io.BytesIO()
+            pdf_writer.write(output_stream)
+            signed_pdf = output_stream.getvalue()
+        
+        filename = secure_filename(data.get('filename') or '') or 'document.pdf'
+        if source == 'document':
+            # Document id in, document id out: the PDF stays on the server
+            print(f"PDF SIGNED SUCCESSFULLY! Output PDF size: {len(signed_pdf)} bytes (stored)")
+            return stored_result(signed_pdf, f"signed_{filename}", placements_applied=len(placements))
+        if source == 'multipart':
+            # Multipart in, PDF out: no base64 copy of the result either
+            print(f"PDF SIGNED SUCCESSFULLY! Output PDF size: {len(signed_pdf)} bytes")
+            return send_file(
+                io.BytesIO(signed_pdf),
+                mimetype='application/pdf',
+                as_attachment=True,
+                download_name=f"signed_{filename}"
+            )
         
         # Return as base64
-        signed_pdf_b64 = base64.b64encode(output_stream.getvalue()).decode()
+        signed_pdf_b64 = base64.b64encode(signed_pdf).decode()
         
         print("="*50)
         print("PDF SIGNED SUCCESSFULLY!")
@@ -2803,6 +2648,9 @@ def apply_signatures_to_pdf():
             'placements_applied': len(placements)
         })
     
+    except ValueError as e:
+        print(f"ERROR: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         print("\n" + "="*50)
         print(f"ERROR in apply_signatures_to_pdf: {str(e)}")
@@ -2813,301 +2661,73 @@ def apply_signatures_to_pdf():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-def hex_to_rgb(hex_color):
-    """Convert hex color to RGB tuple"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) / 255.0 for i in (0, 2, 4))
-
-def add_text_watermark(pdf_bytes, text, font_size, color, opacity, rotation, position, 
-                       font_family='Arial', is_bold=True, is_italic=False, is_underline=False, layer='over'):
-    """Add text watermark to PDF with formatting options"""
-    from pypdf import PdfReader, PdfWriter
-    
-    reader = PdfReader(io.BytesIO(pdf_bytes))
-    writer = PdfWriter()
-    
-    # Position mapping - adjusted for proper placement
-    pos_map = {
-        "center": (0, 0),
-        "top-left": (-250, 250),
-        "top-center": (0, 250),
-        "top-right": (250, 250),
-        "middle-left": (-250, 0),
-        "middle-right": (250, 0),
-        "bottom-left": (-250, -250),
-        "bottom-center": (0, -250),
-        "bottom-right": (250, -250),
-        "tile": None
-    }
-    
-    is_tile = position == "tile"
-    is_mosaic = position == "mosaic"
-    is_diagonal = position == "diagonal"
-    
-    # Map font families to ReportLab fonts
-    font_map = {
-        'Arial': 'Helvetica',
-        'Times New Roman': 'Times-Roman',
-        'Courier New': 'Courier',
-        'Georgia': 'Times-Roman',
-        'Verdana': 'Helvetica',
-        'Comic Sans MS': 'Helvetica',
-        'Impact': 'Helvetica-Bold',
-        'Trebuchet MS': 'Helvetica',
-    }
-    
-    base_font = font_map.get(font_family, 'Helvetica')
-    
-    # Apply bold and italic
-    if is_bold and is_italic:
-        if base_font == 'Times-Roman':
-            font_name = 'Times-BoldItalic'
-        elif base_font in ['Helvetica', 'Courier']:
-            font_name = f"{base_font}-BoldOblique"
-        else:
-            font_name = f"{base_font}-Bold"
-    elif is_bold:
-        if base_font == 'Times-Roman':
-            font_name = 'Times-Bold'
-        else:
-            font_name = f"{base_font}-Bold"
-    elif is_italic:
-        if base_font == 'Times-Roman':
-            font_name = 'Times-Italic'
-        elif base_font in ['Helvetica', 'Courier']:
-            font_name = f"{base_font}-Oblique"
-        else:
-            font_name = f"{base_font}-Italic"
-    else:
-        font_name = base_font
+@app.route('/api/sign/batch', methods=['POST', 'OPTIONS'])
+def sign_pdf_batch():
+    """
+    Sign many PDFs with one placement template
+    Form fields: files (several PDFs), template (JSON, see signature_batch)
+    and one image upload per asset id the template names.
+    Returns a ZIP that streams each document as soon as it is signed;
+    documents that fail are listed in errors.txt inside the ZIP.
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
     
-    for page in reader.pages:
-        packet = io.BytesIO()
-        can = canvas.Canvas(packet, pagesize=(float(page.mediabox.width), float(page.mediabox.height)))
-        w, h = float(page.mediabox.width), float(page.mediabox.height)
-        
-        # Set color and opacity
-        r, g, b = hex_to_rgb(color)
-        can.setFillColorRGB(r, g, b, alpha=opacity)
+    tmpdir = None
+    try:
+        pdf_files = [f for f in request.files.getlist('files') if f.filename]
+        if not pdf_files:
+            return jsonify({"error": "No PDF files provided"}), 400
         
         try:
-            can.setFont(font_name, font_size)
-        except:
-            can.setFont("Helvetica-Bold", font_size)
-        
-        # Calculate text width for better positioning
-        text_width = can.stringWidth(text, font_name, font_size)
-        text_height = font_size
-        
-        # Calculate position offsets based on page size (like iLovePDF)
-        margin_x = text_width / 2 + 20  # Dynamic margin based on text width
-        margin_y = text_height / 2 + 20  # Dynamic margin based on text height
-        
-        pos_map = {
-            "center": (w/2, h/2),
-            "top-left": (margin_x, h - margin_y),
-            "top-center": (w/2, h - margin_y),
-            "top-right": (w - margin_x, h - margin_y),
-            "middle-left": (margin_x, h/2),
-            "middle-right": (w - margin_x, h/2),
-            "bottom-left": (margin_x, margin_y),
-            "bottom-center": (w/2, margin_y),
-            "bottom-right": (w - margin_x, margin_y),
-        }
+            template_options = json.loads(request.form.get('template', '{}'))
+        except json.JSONDecodeError as e:
+            return jsonify({"error": f"Invalid template JSON: {e}"}), 400
         
-        if is_tile:
-            spacing_x = 250
-            spacing_y = 150
-            for x in range(-int(w), int(w*2), spacing_x):
-                for y in range(-int(h), int(h*2), spacing_y):
-                    can.saveState()
-                    can.translate(w/2 + x, h/2 + y)
-                    can.rotate(rotation)
-                    can.drawCentredString(0, 0, text)
-                    if is_underline:
-                        text_width = can.stringWidth(text, font_name, font_size)
-                        can.line(-text_width/2, -font_size*0.1, text_width/2, -font_size*0.1)
-                    can.restoreState()
-        elif is_mosaic:
-            # Mosaic pattern - 3x3 grid aligned from top to bottom
-            margin_top = font_size / 2 + 10  # Small margin at top
-            margin_bottom = font_size / 2 + 10  # Small margin at bottom
-            usable_height = h - margin_top - margin_bottom
-            
-            for row in range(3):
-                for col in range(3):
-                    x_pos = (col + 0.5) * w / 3
-                    # Align from top to bottom with minimal margins
-                    y_pos = h - margin_top - (row * usable_height / 2)
-                    can.saveState()
-                    can.translate(x_pos, y_pos)
-                    can.rotate(rotation)
-                    can.drawCentredString(0, 0, text)
-                    if is_underline:
-                        text_width = can.stringWidth(text, font_name, font_size)
-                        can.line(-text_width/2, -font_size*0.1, text_width/2, -font_size*0.1)
-                    can.restoreState()
-        elif is_diagonal:
-            # Diagonal watermark from bottom-left to top-right
-            import math
-            diagonal_length = math.sqrt(w**2 + h**2)
-            angle = math.degrees(math.atan2(h, w))
-            
-            can.saveState()
-            can.translate(w/2, h/2)
-            can.rotate(angle + rotation)
-            can.drawCentredString(0, 0, text)
-            if is_underline:
-                text_width = can.stringWidth(text, font_name, font_size)
-                can.line(-text_width/2, -font_size*0.1, text_width/2, -font_size*0.1)
-            can.restoreState()
-        else:
-            # Get position coordinates
-            x_pos, y_pos = pos_map.get(position, (w/2, h/2))
-            can.saveState()
-            can.translate(x_pos, y_pos)
-            can.rotate(rotation)
-            can.drawCentredString(0, 0, text)
-            if is_underline:
-                text_width = can.stringWidth(text, font_name, font_size)
-                can.line(-text_width/2, -font_size*0.1, text_width/2, -font_size*0.1)
-            can.restoreState()
-        
-        can.showPage()
-        can.save()
-        packet.seek(0)
-        
-        watermark = PdfReader(packet).pages[0]
-        if layer == 'below':
-            # Watermark below content - merge page onto watermark
-            new_page = writer.add_page(watermark)
-            new_page.merge_page(page)
-        else:
-            # Watermark over content (default) - merge watermark onto page
-            new_page = writer.add_page(page)
-            new_page.merge_page(watermark)
-    
-    output = io.BytesIO()
-    writer.write(output)
-    return output.getvalue()
-
-def add_image_watermark(pdf_bytes, image_bytes, opacity, rotation, position, layer='over'):
-    """Add image watermark to PDF"""
-    from pypdf import PdfReader, PdfWriter
-    
-    reader = PdfReader(io.BytesIO(pdf_bytes))
-    writer = PdfWriter()
-    
-    # Load and process image
-    img = Image.open(io.BytesIO(image_bytes))
-    
-    if img.mode != 'RGBA':
-        img = img.convert('RGBA')
-    
-    alpha = img.split()[3]
-    alpha = alpha.point(lambda p: int(p * opacity))
-    img.putalpha(alpha)
-    
-    is_tile = position == "tile"
-    is_mosaic = position == "mosaic"
-    is_diagonal = position == "diagonal"
-    
-    max_size = 200
-    img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-    img_width, img_height = img.size
-    
-    for page in reader.pages:
-        packet = io.BytesIO()
-        can = canvas.Canvas(packet, pagesize=(float(page.mediabox.width), float(page.mediabox.height)))
-        w, h = float(page.mediabox.width), float(page.mediabox.height)
-        
-        # Calculate position offsets based on image size (like iLovePDF)
-        margin_x = img_width / 2 + 20  # Dynamic margin based on image width
-        margin_y = img_height / 2 + 20  # Dynamic margin based on image height
-        
-        pos_map = {
-            "center": (w/2, h/2),
-            "top-left": (margin_x, h - margin_y),
-            "top-center": (w/2, h - margin_y),
-            "top-right": (w - margin_x, h - margin_y),
-            "middle-left": (margin_x, h/2),
-            "middle-right": (w - margin_x, h/2),
-            "bottom-left": (margin_x, margin_y),
-            "bottom-center": (w/2, margin_y),
-            "bottom-right": (w - margin_x, margin_y),
-        }
+        from signature_assets import SignatureAssets
+        from signature_batch import iter_signed, template_from_options
         
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        img_reader = ImageReader(img_buffer)
-        
-        if is_tile:
-            spacing_x = 300
-            spacing_y = 250
-            for x in range(-int(w), int(w*2), spacing_x):
-                for y in range(-int(h), int(h*2), spacing_y):
-                    can.saveState()
-                    can.translate(w/2 + x, h/2 + y)
-                    can.rotate(rotation)
-                    can.drawImage(img_reader, -img_width/2, -img_height/2, 
-                                width=img_width, height=img_height, mask='auto')
-                    can.restoreState()
-        elif is_mosaic:
-            # Mosaic pattern - 3x3 grid aligned from top to bottom
-            margin_top = img_height / 2 + 10  # Small margin at top
-            margin_bottom = img_height / 2 + 10  # Small margin at bottom
-            usable_height = h - margin_top - margin_bottom
-            
-            for row in range(3):
-                for col in range(3):
-                    x_pos = (col + 0.5) * w / 3
-                    # Align from top to bottom with minimal margins
-                    y_pos = h - margin_top - (row * usable_height / 2)
-                    can.saveState()
-                    can.translate(x_pos, y_pos)
-                    can.rotate(rotation)
-                    can.drawImage(img_reader, -img_width/2, -img_height/2,
-                                width=img_width, height=img_height, mask='auto')
-                    can.restoreState()
-        elif is_diagonal:
-            # Diagonal watermark from bottom-left to top-right
-            import math
-            angle = math.degrees(math.atan2(h, w))
-            
-            can.saveState()
-            can.translate(w/2, h/2)
-            can.rotate(angle + rotation)
-            can.drawImage(img_reader, -img_width/2, -img_height/2,
-                        width=img_width, height=img_height, mask='auto')
-            can.restoreState()
-        else:
-            # Get position coordinates
-            x_pos, y_pos = pos_map.get(position, (w/2, h/2))
-            can.saveState()
-            can.translate(x_pos, y_pos)
-            can.rotate(rotation)
-            can.drawImage(img_reader, -img_width/2, -img_height/2,
-                        width=img_width, height=img_height, mask='auto')
-            can.restoreState()
-        
-        can.showPage()
-        can.save()
-        packet.seek(0)
-        
-        watermark = PdfReader(packet).pages[0]
-        if layer == 'below':
-            # Watermark below content - merge page onto watermark
-            new_page = writer.add_page(watermark)
-            new_page.merge_page(page)
-        else:
-            # Watermark over content (default) - merge watermark onto page
-            new_page = writer.add_page(page)
-            new_page.merge_page(watermark)
+        # Every image is decoded here once and shipped to the workers once
+        images = {name: upload.read() for name, upload in request.files.items() if name != 'files'}
+        assets = SignatureAssets()
+        template = template_from_options(template_options, images, assets)
+        
+        tmpdir = tempfile.mkdtemp()
+        input_dir = os.path.join(tmpdir, 'input')
+        output_dir = os.path.join(tmpdir, 'output')
+        os.makedirs(input_dir)
+        os.makedirs(output_dir)
+        inputs = save_batch_uploads(pdf_files, input_dir, 'signed')
+        
+        print(f"Batch sign: {len(inputs)} PDFs, {len(template.placements)} placements, "
+              f"{len(assets)} distinct images")
+        results = iter_signed(inputs, output_dir, template, assets)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        response = batch_zip_response(results, tmpdir, f"signed_{timestamp}.zip")
+        tmpdir = None
+        return response
     
-    output = io.BytesIO()
-    writer.write(output)
-    return output.getvalue()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Batch sign error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if tmpdir and os.path.exists(tmpdir):
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def watermark_from_request():
+    """
+    Prepared watermark and stamping options from the watermark form fields
+    Returns (watermark, layer, engine, pages); raises ValueError for bad input
+    """
+    image_bytes = None
+    if 'watermarkImage' in request.files:
+        image_bytes = request.files['watermarkImage'].read()
+    return watermark_from_options(request.form, image_bytes)
 
 @app.route('/api/watermark/add', methods=['POST', 'OPTIONS'])
 def add_watermark():
@@ -3115,56 +2735,38 @@ def add_watermark():
     if request.method == 'OPTIONS':
         return '', 204
     try:
-        if 'file' not in request.files:
+        document_id = request.form.get('document_id')
+        if 'file' in request.files:
+            pdf_file = request.files['file']
+            pdf_bytes = pdf_file.read()
+            source_name = pdf_file.filename
+        elif document_id:
+            # Stored document: the result is stored as well and its id returned
+            pdf_bytes = stored_pdf(document_id)
+            source_name = DOCUMENT_STORE.filename(document_id) or 'document.pdf'
+        else:
             return jsonify({"error": "No PDF file provided"}), 400
         
-        pdf_file = request.files['file']
-        pdf_bytes = pdf_file.read()
-        
-        watermark_type = request.form.get('watermarkType', 'text')
-        opacity = float(request.form.get('opacity', 0.5))
-        rotation = int(request.form.get('rotation', 0))
-        position = request.form.get('position', 'center')
-        layer = request.form.get('layer', 'over')
-        
-        print(f"Adding {watermark_type} watermark to PDF: {pdf_file.filename}")
-        
-        result_bytes = None
-        
-        if watermark_type == 'text':
-            text = request.form.get('text', 'CONFIDENTIAL')
-            font_size = int(request.form.get('fontSize', 40))
-            color = request.form.get('color', '#000000')
-            font_family = request.form.get('fontFamily', 'Arial')
-            is_bold = request.form.get('isBold', 'true').lower() == 'true'
-            is_italic = request.form.get('isItalic', 'false').lower() == 'true'
-            is_underline = request.form.get('isUnderline', 'false').lower() == 'true'
-            
-            result_bytes = add_text_watermark(
-                pdf_bytes, text, font_size, color, opacity, rotation, position,
-                font_family, is_bold, is_italic, is_underline, layer
-            )
+        watermark, layer, engine, pages = watermark_from_request()
+        incremental = is_incremental_requested(request.form.get('incremental'))
+        if incremental and request.form.get('engine') and engine != 'pymupdf':
+            return jsonify({"error": "Incremental saving always stamps with PyMuPDF: "
+                                     "set engine to pymupdf or leave it out"}), 400
         
-        elif watermark_type == 'image':
-            if 'watermarkImage' not in request.files:
-                return jsonify({"error": "No watermark image provided"}), 400
-            
-            image_file = request.files['watermarkImage']
-            image_bytes = image_file.read()
-            
-            result_bytes = add_image_watermark(
-                pdf_bytes, image_bytes, opacity, rotation, position, layer
-            )
+        print(f"Adding {request.form.get('watermarkType', 'text')} watermark to PDF: {source_name} "
+              f"({'incremental' if incremental else engine})")
         
-        else:
-            return jsonify({"error": "Invalid watermark type"}), 400
+        result_bytes = stamp_pdf(pdf_bytes, watermark, layer, engine, pages, incremental)
         
         print(f"Watermark added successfully")
         
-        original_name = pdf_file.filename.replace('.pdf', '')
+        original_name = source_name.replace('.pdf', '')
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_filename = f"{original_name}_watermarked_{timestamp}.pdf"
         
+        if 'file' not in request.files:
+            return stored_result(result_bytes, secure_filename(output_filename))
+        
         return send_file(
             io.BytesIO(result_bytes),
             mimetype='application/pdf',
@@ -3172,12 +2774,60 @@ def add_watermark():
             download_name=output_filename
         )
     
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Watermark Error: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/watermark/batch', methods=['POST', 'OPTIONS'])
+def add_watermark_batch():
+    """
+    Watermark many PDFs with one prepared watermark
+    Form fields: files (several PDFs) plus the /api/watermark/add options.
+    Returns a ZIP that streams each document as soon as it is stamped;
+    documents that fail are listed in errors.txt inside the ZIP.
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    tmpdir = None
+    try:
+        pdf_files = [f for f in request.files.getlist('files') if f.filename]
+        if not pdf_files:
+            return jsonify({"error": "No PDF files provided"}), 400
+        
+        watermark, layer, engine, pages = watermark_from_request()
+        
+        from watermark_batch import iter_watermarked
+        
+        tmpdir = tempfile.mkdtemp()
+        input_dir = os.path.join(tmpdir, 'input')
+        output_dir = os.path.join(tmpdir, 'output')
+        os.makedirs(input_dir)
+        os.makedirs(output_dir)
+        inputs = save_batch_uploads(pdf_files, input_dir, 'watermarked')
+        
+        print(f"Batch watermark: {len(inputs)} PDFs ({engine})")
+        results = iter_watermarked(inputs, output_dir, watermark, layer, engine, pages)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        response = batch_zip_response(results, tmpdir, f"watermarked_{timestamp}.zip")
+        tmpdir = None
+        return response
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Batch watermark error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if tmpdir and os.path.exists(tmpdir):
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
 @app.route('/api/html-to-pdf', methods=['POST', 'OPTIONS'])
 def html_to_pdf():
     """Convert HTML to PDF - Optimized for speed"""
@@ -3457,6 +3107,20 @@ def rotate_pdf():
         if direction == 'left':
             rotation_angle = 360 - rotation_angle
         
+        original_name = pdf_file.filename.replace('.pdf', '')
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_filename = f"{original_name}_rotated_{timestamp}.pdf"
+        
+        if is_incremental_requested(request.form.get('incremental')):
+            # Only the page dictionaries change: append them as an update section
+            result_bytes = update_bytes(pdf_bytes, lambda doc: rotate_pages(doc, rotation_angle % 360))
+            return send_file(
+                io.BytesIO(result_bytes),
+                mimetype='application/pdf',
+                as_attachment=True,
+                download_name=output_filename
+            )
+        
         from pypdf import PdfReader, PdfWriter
         
         reader = PdfReader(io.BytesIO(pdf_bytes))
@@ -3474,10 +3138,6 @@ def rotate_pdf():
         
         print(f"PDF rotated successfully: {len(reader.pages)} pages")
         
-        original_name = pdf_file.filename.replace('.pdf', '')
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_filename = f"{original_name}_rotated_{timestamp}.pdf"
-        
         return send_file(
             output,
             mimetype='application/pdf',
@@ -3656,6 +3316,58 @@ def protect_pdf():
         traceback.print_exc()
         return jsonify({"error": f"Failed to protect PDF: {str(e)}"}), 500
 
+@app.route('/api/pdf/pipeline', methods=['POST', 'OPTIONS'])
+def pdf_pipeline():
+    """
+    Apply several operations (unlock, select, rotate, watermark, sign, protect)
+    in one request: the PDF is parsed once and written once
+    Form fields: file, operations (JSON list, see pdf_pipeline.py) and any
+    watermark images referenced by name from the operations
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No PDF file provided"}), 400
+        
+        pdf_file = request.files['file']
+        if not pdf_file.filename:
+            return jsonify({"error": "No file selected"}), 400
+        
+        pdf_bytes = pdf_file.read()
+        if len(pdf_bytes) == 0:
+            return jsonify({"error": "Empty file provided"}), 400
+        
+        try:
+            operations = json.loads(request.form.get('operations', '[]'))
+        except json.JSONDecodeError as e:
+            return jsonify({"error": f"Invalid operations JSON: {e}"}), 400
+        
+        from pdf_pipeline import run_pipeline
+        
+        assets = {name: f.read() for name, f in request.files.items() if name != 'file'}
+        
+        result_bytes = run_pipeline(pdf_bytes, operations, assets)
+        
+        original_name = pdf_file.filename.replace('.pdf', '')
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_filename = f"{original_name}_processed_{timestamp}.pdf"
+        
+        return send_file(
+            io.BytesIO(result_bytes),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=output_filename
+        )
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Pipeline Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Failed to process PDF: {str(e)}"}), 500
+
 if __name__ == '__main__':
     # Get port from environment variable (for Render deployment) or use 5000 for local
     port = int(os.environ.get('PORT', 5000))
@@ -3667,10 +3379,12 @@ if __name__ == '__main__':
     print("\nAvailable Endpoints:")
     print("  - PowerPoint to PDF: /api/convert/pptx-to-pdf")
     print("  - Sign PDF: /api/sign/apply-signatures")
+    print("  - Batch Sign PDF: /api/sign/batch")
     print("  - Watermark PDF: /api/watermark/add")
     print("  - Rotate PDF: /api/pdf/rotate")
     print("  - Unlock PDF: /api/pdf/unlock")
     print("  - Protect PDF: /api/pdf/protect")
+    print("  - PDF Pipeline: /api/pdf/pipeline")
     
     # Disable debug mode in production
     debug_mode = os.environ.get('FLASK_ENV') != 'production'
@@ -0,0 +1,74 @@
+"""
+Batch runner
+Runs one prepared job (a watermark, a signing template, statement branding)
+over many files on the shared worker pool. The job is pickled once into a
+temporary file and every task carries only its path: a worker
+loads the job on its first task of the batch and keeps it for the rest, so
+large jobs (images, fonts) cross the process boundary once per worker. With
+a single worker the batch runs in the calling process and the job is passed
+straight through, so no module state of the web process is ever touched.
+"""
+
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+from worker_pool import WORKER_PROCESSES, iter_completed
+
+JOB_CACHE_SIZE = 4  # Jobs a worker keeps loaded (one per batch it is serving)
+
+_worker_jobs = OrderedDict()  # Job file -> job; only filled inside pool worker processes
+
+
+def unique_name(name, used):
+    """``name``, or name_2, name_3 ... the first one not in ``used``; records it there"""
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{stem}_{n}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def _load_job(job_path):
+    job = _worker_jobs.get(job_path)
+    if job is None:
+        with open(job_path, 'rb') as f:
+            job = pickle.load(f)
+        _worker_jobs[job_path] = job
+        while len(_worker_jobs) > JOB_CACHE_SIZE:
+            _worker_jobs.popitem(last=False)
+    else:
+        _worker_jobs.move_to_end(job_path)
+    return job
+
+
+def _run_task(func, job_path, task):
+    return func(_load_job(job_path), task)
+
+
+def iter_batch(func, job, tasks, max_workers=None, label='Processing'):
+    """
+    Run ``func(job, task)`` for every task and yield the results as they finish
+    ``func`` must be a module-level function returning (arcname, output_path,
+    error) and catching its own per-file errors, so one bad file does not end
+    the batch. At most ``max_workers`` tasks of this batch are queued at once.
+    """
+    workers = min(len(tasks), max_workers or WORKER_PROCESSES)
+    print(f"{label} {len(tasks)} files, {workers} at a time")
+    if workers <= 1:
+        for task in tasks:
+            yield func(job, task)
+        return
+
+    fd, job_path = tempfile.mkstemp(suffix='.job')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(job, f, protocol=pickle.HIGHEST_PROTOCOL)
+        calls = ((index, _run_task, (func, job_path, task)) for index, task in enumerate(tasks))
+        for _, result in iter_completed(calls, workers):
+            yield result
+    finally:
+        os.remove(job_path)
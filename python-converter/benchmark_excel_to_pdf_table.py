@@ -0,0 +1,68 @@
+"""
+Benchmark for bank statement PDF generation with large transaction counts
+Renders synthetic statements of 1k / 10k / 100k rows and reports time and page count
+
+Usage: python benchmark_excel_to_pdf_table.py [row_count ...]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+from pypdf import PdfReader
+
+from excel_to_pdf_table import render_statement_pdf
+
+DEFAULT_ROW_COUNTS = (1000, 10000, 100000)
+
+
+def make_transactions(row_count):
+    """Build a Bank of India style transaction DataFrame"""
+    rng = np.random.default_rng(42)
+    amounts = rng.uniform(10, 50000, row_count).round(2)
+    is_debit = rng.random(row_count) < 0.5
+    dates = pd.Timestamp('2025-03-01') + pd.to_timedelta(np.arange(row_count) // 50, unit='D')
+    return pd.DataFrame({
+        'Sr No': np.arange(1, row_count + 1),
+        'Date': dates.strftime('%d-%m-%Y'),
+        'Remarks': [f"UPI/{100816391148 + i}/CR/MERCHANT{i % 97}/Payment" for i in range(row_count)],
+        'Debit': np.where(is_debit, amounts, np.nan),
+        'Credit': np.where(is_debit, np.nan, amounts),
+        'Balance': (81338.54 + np.cumsum(np.where(is_debit, -amounts, amounts))).round(2),
+    })
+
+
+def run_benchmark(row_counts=DEFAULT_ROW_COUNTS):
+    account_info = {
+        "customer_id": "192136847",
+        "account_holder_name": "BENCHMARK TRADERS",
+        "account_number": "826820110000461",
+    }
+
+    print("\n" + "=" * 60)
+    print("BANK STATEMENT PDF - BENCHMARK")
+    print("=" * 60 + "\n")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for row_count in row_counts:
+            df = make_transactions(row_count)
+            output_path = os.path.join(tmpdir, f"statement_{row_count}.pdf")
+
+            start = time.perf_counter()
+            render_statement_pdf(df, output_path, account_info=account_info)
+            elapsed = time.perf_counter() - start
+
+            pages = len(PdfReader(output_path).pages)
+            size_mb = os.path.getsize(output_path) / (1024 * 1024)
+            print(f"  {row_count:>7} rows: {elapsed:7.2f}s, {pages} pages, "
+                  f"{size_mb:.1f} MB, {row_count / elapsed:,.0f} rows/s")
+
+    print("\n" + "=" * 60 + "\n")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_ROW_COUNTS
+    run_benchmark(counts)
@@ -0,0 +1,71 @@
+"""
+Benchmark for the watermark engines (pypdf vs PyMuPDF)
+Stamps synthetic 10 / 100 / 1000 page documents with a text and an image
+watermark and reports time and output size per engine
+
+Usage: python benchmark_watermark.py [page_count ...]
+"""
+
+import io
+import sys
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from watermark_engine import ENGINES, ImageWatermark, TextWatermark, stamp_pdf
+
+DEFAULT_PAGE_COUNTS = (10, 100, 1000)
+
+
+def make_document(page_count):
+    """A4 pages with a paragraph of text each, every tenth page landscape"""
+    doc = fitz.open()
+    for i in range(page_count):
+        width, height = (842, 595) if i % 10 == 9 else (595, 842)
+        page = doc.new_page(width=width, height=height)
+        page.insert_textbox(fitz.Rect(72, 72, width - 72, height - 72),
+                            f"Page {i + 1}\n" + "Lorem ipsum dolor sit amet. " * 40, fontsize=11)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def make_logo():
+    img = Image.new('RGBA', (600, 300), (0, 0, 0, 0))
+    img.paste((30, 90, 200, 255), (50, 50, 550, 250))
+    out = io.BytesIO()
+    img.save(out, format='PNG')
+    return out.getvalue()
+
+
+def run_benchmark(page_counts=DEFAULT_PAGE_COUNTS):
+    logo = make_logo()
+    watermarks = {
+        'text center': lambda: TextWatermark('CONFIDENTIAL', 60, '#ff0000', 0.3, 45, 'center'),
+        'text tile': lambda: TextWatermark('CONFIDENTIAL', 24, '#ff0000', 0.3, 45, 'tile'),
+        'image center': lambda: ImageWatermark(logo, 0.3, 0, 'center'),
+    }
+
+    print("\n" + "=" * 60)
+    print("WATERMARK ENGINES - BENCHMARK")
+    print("=" * 60 + "\n")
+
+    for page_count in page_counts:
+        pdf_bytes = make_document(page_count)
+        print(f"{page_count} pages ({len(pdf_bytes) / 1024:.0f} KB input)")
+        for label, build in watermarks.items():
+            for engine in ENGINES:
+                start = time.perf_counter()
+                result = stamp_pdf(pdf_bytes, build(), 'over', engine)
+                elapsed = time.perf_counter() - start
+                print(f"  {label:<13} {engine:<8} {elapsed:7.2f}s, "
+                      f"{len(result) / 1024:8.0f} KB, {page_count / elapsed:,.0f} pages/s")
+        print()
+
+    print("=" * 60 + "\n")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_PAGE_COUNTS
+    run_benchmark(counts)
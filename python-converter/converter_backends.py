@@ -0,0 +1,147 @@
+"""
+Converter backend registry
+Probes once (at startup, in the background) which conversion engines exist on
+this host, instead of discovering on every request that e.g. Excel COM is
+missing on Linux. Each request goes to the available backend with the lowest
+recorded latency per MB; a backend that has not run yet is tried first once so
+it gets measured, and one that keeps failing drops behind the others.
+"""
+
+import os
+import threading
+import time
+
+EWMA_ALPHA = 0.3          # Weight of the newest latency sample
+MIN_SIZE_MB = 0.1         # Floor so tiny files do not dominate the per-MB estimate
+MAX_CONSECUTIVE_FAILURES = 3
+
+
+class ConverterBackend:
+    """One conversion engine plus its probe result and latency statistics"""
+
+    def __init__(self, name, convert, probe=None, extensions=None):
+        self.name = name
+        self.convert = convert
+        self.probe = probe
+        self.extensions = set(extensions) if extensions else None
+        self.available = None  # Unknown until probed
+        self.probe_error = None
+        self.latency = None  # EWMA seconds per MB of input, once measured
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+    def supports(self, path):
+        if self.extensions is None:
+            return True
+        return os.path.splitext(str(path))[1].lower().lstrip('.') in self.extensions
+
+    def record(self, seconds, size_mb, ok):
+        self.calls += 1
+        if ok:
+            self.consecutive_failures = 0
+            per_mb = seconds / max(size_mb, MIN_SIZE_MB)
+            if self.latency is None:
+                self.latency = per_mb
+            else:
+                self.latency = EWMA_ALPHA * per_mb + (1 - EWMA_ALPHA) * self.latency
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    def snapshot(self):
+        return {
+            'available': self.available,
+            'probe_error': self.probe_error,
+            'latency_s_per_mb': None if self.latency is None else round(self.latency, 3),
+            'calls': self.calls,
+            'failures': self.failures,
+        }
+
+
+class BackendRegistry:
+    """
+    Set of backends for one conversion (e.g. Excel -> PDF)
+    Backends are tried fastest first by recorded latency; registration order
+    only breaks ties, so register only engines whose output is acceptable.
+    ``convert_fn(input_path, output_dir)`` returns the output path, or None /
+    raises on failure; the registry falls through to the next backend.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._backends = []
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()  # Probes may be slow (COM dispatch); run them once
+
+    def register(self, name, convert, probe=None, extensions=None):
+        """Add a backend; it ranks after the ones already registered on equal latency"""
+        self._backends.append(ConverterBackend(name, convert, probe, extensions))
+
+    def probe(self):
+        """Run the probes that have not run yet and log which engines are usable"""
+        with self._probe_lock:
+            pending = [b for b in self._backends if b.available is None]
+            for backend in pending:
+                try:
+                    backend.available = bool(backend.probe()) if backend.probe else True
+                except Exception as e:
+                    backend.available = False
+                    backend.probe_error = str(e)
+            usable = [b.name for b in self._backends if b.available]
+            if pending:
+                print(f"[{self.name}] Available backends: {', '.join(usable) or 'none'}")
+            return usable
+
+    def probe_in_background(self):
+        """Start the probes on a daemon thread so startup does not wait for a COM dispatch"""
+        thread = threading.Thread(target=self.probe, name=f'{self.name}-probe', daemon=True)
+        thread.start()
+        return thread
+
+    def candidates(self, input_path):
+        """Available backends for this input, fastest first; repeatedly failing ones last"""
+        if any(b.available is None for b in self._backends):
+            self.probe()
+        with self._lock:
+            backends = [b for b in self._backends if b.available and b.supports(input_path)]
+
+            def rank(indexed):
+                index, b = indexed
+                return (b.consecutive_failures >= MAX_CONSECUTIVE_FAILURES,
+                        b.calls > 0,  # Never run: try once to measure it
+                        b.latency if b.latency is not None else float('inf'),
+                        index)
+            return [b for _, b in sorted(enumerate(backends), key=rank)]
+
+    def convert(self, input_path, output_dir):
+        """
+        Convert with the fastest available backend, falling through on failure
+        Returns (output_path, backend_name); raises RuntimeError if all fail
+        """
+        size_mb = os.path.getsize(input_path) / (1024 * 1024)
+        errors = []
+        for backend in self.candidates(input_path):
+            print(f"[{self.name}] Trying backend: {backend.name}")
+            start = time.perf_counter()
+            try:
+                result = backend.convert(input_path, output_dir)
+                error = None if result and os.path.exists(result) else 'no output produced'
+            except Exception as e:
+                result, error = None, str(e)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                backend.record(elapsed, size_mb, error is None)
+            if error is None:
+                print(f"[{self.name}] {backend.name} finished in {elapsed:.2f}s")
+                return str(result), backend.name
+            print(f"[{self.name}] {backend.name} failed after {elapsed:.2f}s: {error}")
+            errors.append(f"{backend.name}: {error}")
+        if not errors:
+            raise RuntimeError(f"No {self.name} backend available for {os.path.basename(input_path)}")
+        raise RuntimeError(f"{self.name} conversion failed ({'; '.join(errors)})")
+
+    def snapshot(self):
+        """Probe results and latency statistics, for /api/health and /api/info"""
+        with self._lock:
+            return {b.name: b.snapshot() for b in self._backends}
@@ -0,0 +1,173 @@
+"""
+CSV ingestion
+Detects encoding, BOM, delimiter and quoting from the first few KB of a CSV,
+then parses the file once (pyarrow engine when available, otherwise the C
+engine in chunks); a non-UTF-8 byte past the sampled head triggers one
+re-read with an 8-bit encoding
+"""
+
+import codecs
+import csv
+from collections import namedtuple
+
+import pandas as pd
+
+SAMPLE_SIZE = 64 * 1024
+CHUNK_SIZE = 50000
+CANDIDATE_DELIMITERS = ',;\t|'
+
+CsvFormat = namedtuple('CsvFormat', 'encoding bom delimiter quotechar')
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def _detect_encoding(sample):
+    """Return (encoding, has_bom) for a byte sample"""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding, True
+    # Incremental decode so a multi-byte char cut at the sample edge is not an error
+    for encoding in ('utf-8', 'cp1252'):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding, False
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1', False  # Decodes any byte sequence
+
+
+def _detect_dialect(text):
+    """Return (delimiter, quotechar) sniffed from decoded sample text"""
+    # Drop the (probably truncated) last line so the sniffer sees whole records
+    if '\n' in text:
+        text = text[:text.rfind('\n')]
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=CANDIDATE_DELIMITERS)
+        return dialect.delimiter, dialect.quotechar or '"'
+    except csv.Error:
+        return ',', '"'
+
+
+def detect_csv_format(csv_path, sample_size=SAMPLE_SIZE):
+    """Detect encoding, BOM, delimiter and quote character from the file head"""
+    with open(csv_path, 'rb') as f:
+        sample = f.read(sample_size)
+    encoding, bom = _detect_encoding(sample)
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=False)
+    delimiter, quotechar = _detect_dialect(text)
+    return CsvFormat(encoding, bom, delimiter, quotechar)
+
+
+def open_csv_reader(csv_path, fmt=None, errors='replace'):
+    """
+    Open a csv.reader over the file with the detected format
+    Returns (file_handle, reader); the caller closes the handle
+    """
+    fmt = fmt or detect_csv_format(csv_path)
+    f = open(csv_path, newline='', encoding=fmt.encoding, errors=errors)
+    return f, csv.reader(f, delimiter=fmt.delimiter, quotechar=fmt.quotechar)
+
+
+def iter_csv_chunks(csv_path, fmt=None, chunksize=CHUNK_SIZE, encoding_errors='replace'):
+    """Yield DataFrame chunks from a single pass over the file"""
+    fmt = fmt or detect_csv_format(csv_path)
+    reader = pd.read_csv(csv_path, encoding=fmt.encoding, sep=fmt.delimiter,
+                         quotechar=fmt.quotechar, encoding_errors=encoding_errors,
+                         chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _has_undecoded_bytes(df):
+    """pyarrow hands back raw bytes for string columns it could not decode"""
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object and values.map(lambda v: isinstance(v, bytes)).any():
+            return True
+    return False
+
+
+def _encoding_attempts(fmt):
+    """The detected format, then the 8-bit fallbacks for bytes past the sample"""
+    yield fmt
+    if fmt.encoding == 'utf-8':
+        yield fmt._replace(encoding='cp1252')
+        yield fmt._replace(encoding='latin-1')  # Decodes any byte sequence
+
+
+def _parse_csv(csv_path, fmt, strict):
+    """
+    One parse with one encoding; None if the file does not decode as ``fmt``
+    With ``strict`` a decode error anywhere in the file means None, otherwise
+    undecodable bytes are replaced
+    """
+    if HAS_PYARROW:
+        try:
+            df = pd.read_csv(csv_path, encoding=fmt.encoding, sep=fmt.delimiter,
+                             quotechar=fmt.quotechar, engine='pyarrow')
+            if not _has_undecoded_bytes(df):
+                return df
+            print(f"  pyarrow could not decode every value as {fmt.encoding}")
+            if strict:
+                return None
+        except Exception as e:
+            # pyarrow is strict about ragged rows and stray quotes
+            print(f"  pyarrow engine failed ({e}), using C engine")
+    try:
+        chunks = list(iter_csv_chunks(csv_path, fmt,
+                                      encoding_errors='strict' if strict else 'replace'))
+    except UnicodeDecodeError as e:
+        print(f"  CSV is not {fmt.encoding} throughout ({e})")
+        return None
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def read_csv(csv_path, fmt=None):
+    """
+    Parse a CSV into one DataFrame, reading the file once in the common case
+    pyarrow parses in parallel blocks; without it the C engine reads in chunks.
+    The encoding is guessed from the file head, so a UTF-8 guess that fails
+    further down is retried as cp1252, then latin-1.
+    """
+    fmt = fmt or detect_csv_format(csv_path)
+    print(f"  CSV format: encoding={fmt.encoding}, delimiter={fmt.delimiter!r}, "
+          f"engine={'pyarrow' if HAS_PYARROW else 'c'}")
+    attempts = list(_encoding_attempts(fmt))
+    for index, attempt in enumerate(attempts):
+        df = _parse_csv(csv_path, attempt, strict=index < len(attempts) - 1)
+        if df is not None:
+            if attempt is not fmt:
+                print(f"  CSV re-read as {attempt.encoding}")
+            return df
+
+
+def consume_csv_rows(csv_path, consume, fmt=None):
+    """
+    Call ``consume(reader)`` over the file's rows, decoding the way read_csv does
+    The reader decodes strictly, so a UTF-8 guess that fails past the sampled
+    head makes ``consume`` start over as cp1252, then latin-1. Returns
+    (consume's result, the format that decoded the file).
+    """
+    fmt = fmt or detect_csv_format(csv_path)
+    attempts = list(_encoding_attempts(fmt))
+    for index, attempt in enumerate(attempts):
+        strict = index < len(attempts) - 1
+        f, reader = open_csv_reader(csv_path, attempt, errors='strict' if strict else 'replace')
+        try:
+            with f:
+                return consume(reader), attempt
+        except UnicodeDecodeError as e:
+            print(f"  CSV is not {attempt.encoding} throughout ({e}), re-reading")
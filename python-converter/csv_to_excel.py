@@ -5,6 +5,7 @@ Converts CSV files to Excel format for PDF conversion
 
 import pandas as pd
 import os
+from csv_ingest import detect_csv_format, read_csv
 from pathlib import Path
 
 def convert_csv_to_excel(csv_path, output_dir=None):
@@ -24,20 +25,10 @@ def convert_csv_to_excel(csv_path, output_dir=None):
         # Read CSV with pandas
         print("Reading CSV file...")
         
-        # Try different encodings
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(csv_path, encoding=encoding)
-                print(f"  ✓ Successfully read with {encoding} encoding")
-                break
-            except:
-                continue
-        
-        if df is None:
-            raise RuntimeError("Could not read CSV file with any encoding")
+        # Detect encoding/delimiter from the file head, then parse once
+        fmt = detect_csv_format(csv_path)
+        df = read_csv(csv_path, fmt)
+        print(f"  ✓ Successfully read with {fmt.encoding} encoding")
         
         print(f"  Rows: {len(df)}, Columns: {len(df.columns)}")
         print(f"  Columns: {', '.join(df.columns.tolist()[:5])}{'...' if len(df.columns) > 5 else ''}")
@@ -0,0 +1,145 @@
+"""
+Document store
+Disk-backed, content-addressed store for PDFs handed between API calls.
+The bytes are stored under their SHA-256, so storing the same file twice
+costs nothing, and every process sharing the directory (all gunicorn
+workers of a container) sees the same documents. Every upload gets its
+own id, "<sha256>-<token>", backed by an upload record: two users uploading
+the same bytes share the PDF but not each other's file name, and knowing a
+file's hash is not enough to fetch it. Entries expire ``ttl`` seconds after
+their last use; expired files are swept on writes.
+
+Layout: <root>/<sha[:2]>/<sha>.pdf plus one <sha>-<token>.json per upload.
+"""
+
+import hashlib
+import json
+import os
+import re
+import secrets
+import tempfile
+import time
+
+DEFAULT_TTL = 3600     # Seconds since last use
+SWEEP_INTERVAL = 60    # Seconds between sweeps in one process
+_ID_PATTERN = re.compile(r'^([0-9a-f]{64})-[0-9a-f]{32}$')
+
+
+class DocumentNotFound(LookupError):
+    """Unknown, malformed or expired document id"""
+
+
+def _write_atomic(path, data):
+    """Write through a temp file in the same directory, so readers never see half a file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DocumentStore:
+    """Content-addressed PDFs on disk with a sliding expiry"""
+
+    def __init__(self, root=None, ttl=None):
+        self.root = (root or os.environ.get('DOCUMENT_STORE_DIR')
+                     or os.path.join(tempfile.gettempdir(), 'pdftools-documents'))
+        self.ttl = int(ttl if ttl is not None else os.environ.get('DOCUMENT_STORE_TTL', DEFAULT_TTL))
+        os.makedirs(self.root, exist_ok=True)
+        self._last_sweep = 0.0
+
+    def _paths(self, doc_id):
+        """(PDF path shared by every upload of the bytes, this upload's record path)"""
+        match = _ID_PATTERN.match(doc_id) if isinstance(doc_id, str) else None
+        if not match:
+            raise DocumentNotFound(f"Invalid document id: {doc_id!r}")
+        directory = os.path.join(self.root, doc_id[:2])
+        return os.path.join(directory, match.group(1) + '.pdf'), os.path.join(directory, doc_id + '.json')
+
+    def put(self, data, filename=None):
+        """Store PDF bytes and return the id of this upload"""
+        doc_id = f"{hashlib.sha256(data).hexdigest()}-{secrets.token_hex(16)}"
+        path, record = self._paths(doc_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.utime(path)  # Already stored (by any worker): just refresh its expiry
+        except FileNotFoundError:
+            _write_atomic(path, data)
+        _write_atomic(record, json.dumps({'filename': filename or None}).encode('utf-8'))
+        self._maybe_sweep()
+        return doc_id
+
+    def _touch_live(self, path, doc_id):
+        """Refresh the expiry of a file that must exist and be live"""
+        try:
+            expired = time.time() - os.stat(path).st_mtime > self.ttl
+            if not expired:
+                os.utime(path)
+        except FileNotFoundError:
+            raise DocumentNotFound(f"Unknown or expired document id: {doc_id}")
+        if expired:
+            self._remove(path)
+            raise DocumentNotFound(f"Unknown or expired document id: {doc_id}")
+
+    def path(self, doc_id):
+        """File path of a live document, refreshing its expiry"""
+        path, record = self._paths(doc_id)
+        self._touch_live(record, doc_id)  # Ids without their upload record resolve to nothing
+        self._touch_live(path, doc_id)
+        return path
+
+    def get(self, doc_id):
+        """Bytes of a live document"""
+        path = self.path(doc_id)
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:  # Swept by another worker in between
+            raise DocumentNotFound(f"Unknown or expired document id: {doc_id}")
+
+    def filename(self, doc_id):
+        """File name stored with a document, if any"""
+        try:
+            with open(self._paths(doc_id)[1], 'rb') as f:
+                return json.loads(f.read()).get('filename')
+        except (OSError, ValueError, DocumentNotFound):
+            return None
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Another worker got there first
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep >= SWEEP_INTERVAL:
+            self._last_sweep = now
+            self.sweep()
+
+    def sweep(self):
+        """Remove expired documents, upload names and stale temp files; returns how many went"""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(('.pdf', '.json', '.tmp')):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime >= cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                self._remove(path)
+                removed += 1
+        if removed:
+            print(f"Document store: removed {removed} expired files")
+        return removed
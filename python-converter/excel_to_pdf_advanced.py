@@ -0,0 +1,470 @@
+"""
+Advanced Excel to PDF renderer - iLovePDF quality
+-------------------------------------------------
+• Streams each worksheet once through openpyxl read-only mode
+• Paints cells, borders, fills, fonts, merged cells and images with ReportLab
+• Paginates into A4 / landscape A4 pages as rows stream in, so large sheets
+  render in linear time with bounded memory
+• Renders every sheet (or a selection) in parallel worker processes and
+  joins them into one PDF with a bookmark per sheet
+• Renders CSV rows straight from the csv reader (no intermediate .xlsx)
+"""
+
+import io
+import zipfile
+from collections import namedtuple
+from itertools import accumulate, chain, islice
+from pathlib import Path
+from xml.etree.ElementTree import iterparse
+
+from openpyxl import load_workbook
+from openpyxl.drawing.spreadsheet_drawing import SpreadsheetDrawing
+from openpyxl.packaging.relationship import get_dependents, get_rels_path
+from openpyxl.reader.drawings import find_images
+from openpyxl.utils import range_boundaries
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from csv_ingest import consume_csv_rows
+from parallel_sheets import render_sheets_parallel, resolve_sheet_names
+
+
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+MARGIN = 20
+WIDTH_SAMPLE_ROWS = 100  # Rows inspected to size columns from their content
+DEFAULT_COL_WIDTH = 10   # Excel character units
+DEFAULT_ROW_HEIGHT = 15  # Excel points before the 0.75 scaling used below
+MAX_WRAPPED_LINES = 3
+
+CellStyle = namedtuple('CellStyle', 'font_name font_size text_color fill_color borders halign')
+SheetLayout = namedtuple('SheetLayout', 'col_widths row_heights merges')
+
+_DEFAULT_STYLE = CellStyle('Helvetica', 9, colors.black, None, (False, False, False, False), None)
+# CSV tables mirror the old CSV -> .xlsx styling: bold header, thin borders everywhere
+_CSV_HEADER_STYLE = CellStyle('Helvetica-Bold', 9, colors.black, None, (True, True, True, True), None)
+_CSV_BODY_STYLE = CellStyle('Helvetica', 9, colors.black, None, (True, True, True, True), None)
+
+
+def _argb_to_color(rgb):
+    """Convert an openpyxl ARGB/RGB string to a ReportLab colour (None if not a plain RGB)"""
+    if not isinstance(rgb, str) or len(rgb) not in (6, 8):
+        return None
+    if len(rgb) == 8:  # ARGB format
+        rgb = rgb[2:]
+    try:
+        r, g, b = int(rgb[0:2], 16) / 255, int(rgb[2:4], 16) / 255, int(rgb[4:6], 16) / 255
+    except ValueError:
+        return None
+    return colors.Color(r, g, b)
+
+
+class StyleCache:
+    """
+    Resolves openpyxl cell styles to drawing decisions once per distinct style
+    Cells sharing a style (the common case) skip font/fill/border inspection
+    """
+
+    def __init__(self):
+        self._styles = {}
+
+    def resolve(self, cell):
+        key = getattr(cell, 'style_array', None)
+        if key is None:
+            key = getattr(cell, '_style', None)
+        if key is None:  # EmptyCell in read-only mode
+            return _DEFAULT_STYLE
+        key = tuple(key)
+        style = self._styles.get(key)
+        if style is None:
+            style = self._styles[key] = self._build(cell)
+        return style
+
+    @staticmethod
+    def _build(cell):
+        font = cell.font
+        font_size = 9  # Slightly smaller for better fit
+        if font and font.size:
+            font_size = min(font.size, 11)  # Cap at 11pt
+
+        text_color = colors.black
+        if font and font.color is not None:
+            text_color = _argb_to_color(font.color.rgb) or colors.black
+
+        font_name = "Helvetica-Bold" if (font and font.bold) else "Helvetica"
+
+        fill_color = None
+        fill = cell.fill
+        if fill is not None and getattr(fill, 'fill_type', None) == 'solid':
+            fill_color = _argb_to_color(fill.start_color.rgb)
+
+        border = cell.border
+        borders = (False, False, False, False)
+        if border is not None:
+            borders = (bool(border.left.style), bool(border.right.style),
+                       bool(border.top.style), bool(border.bottom.style))
+
+        halign = cell.alignment.horizontal if cell.alignment else None
+        return CellStyle(font_name, font_size, text_color, fill_color, borders, halign)
+
+
+def read_sheet_layout(archive, sheet_path):
+    """
+    Scan a worksheet's XML for column widths, custom row heights and merged
+    ranges without materialising any cells (elements are cleared as we go)
+    """
+    col_widths = {}
+    row_heights = {}
+    merges = []
+    with archive.open(sheet_path) as src:
+        for _event, elem in iterparse(src):
+            tag = elem.tag
+            if tag == SHEET_NS + 'col':
+                width = elem.get('width')
+                if width:
+                    for col_idx in range(int(elem.get('min')), int(elem.get('max')) + 1):
+                        col_widths[col_idx] = float(width)
+            elif tag == SHEET_NS + 'row':
+                height = elem.get('ht')
+                if height and elem.get('r'):
+                    row_heights[int(elem.get('r'))] = float(height)
+                elem.clear()
+            elif tag == SHEET_NS + 'mergeCell':
+                merges.append(range_boundaries(elem.get('ref')))
+    return SheetLayout(col_widths, row_heights, merges)
+
+
+def read_sheet_images(archive, sheet_path):
+    """Images anchored on a worksheet as (row, col, width_pts, height_pts, data)"""
+    rels_path = get_rels_path(sheet_path)
+    if rels_path not in archive.namelist():
+        return []
+    images = []
+    for rel in get_dependents(archive, rels_path).find(SpreadsheetDrawing._rel_type):
+        _charts, drawing_images = find_images(archive, rel.target)
+        for img in drawing_images:
+            anchor = img.anchor
+            if not hasattr(anchor, '_from'):
+                continue
+            images.append((anchor._from.row + 1, anchor._from.col + 1,
+                           img.width * 0.75, img.height * 0.75, img._data()))
+    images.sort(key=lambda item: item[0])
+    return images
+
+
+def _wrap_text(text, font_name, font_size, available_width):
+    words = text.split()
+    lines = []
+    current_line = []
+    for word in words:
+        test_line = ' '.join(current_line + [word])
+        if stringWidth(test_line, font_name, font_size) <= available_width:
+            current_line.append(word)
+        else:
+            if current_line:
+                lines.append(' '.join(current_line))
+            current_line = [word]
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
+
+
+def _draw_aligned(c, halign, x_pos, width, y, text):
+    if halign == 'center':
+        c.drawCentredString(x_pos + (width / 2), y, text)
+    elif halign == 'right':
+        c.drawRightString(x_pos + width - 2, y, text)
+    else:
+        c.drawString(x_pos + 2, y, text)
+
+
+def _draw_cell(c, style, value, x_pos, y_pos, width, height):
+    left, right, top, bottom = style.borders
+
+    # Draw cell background
+    if style.fill_color is not None:
+        c.setFillColor(style.fill_color)
+        c.rect(x_pos, y_pos - height, width, height, fill=1, stroke=0)
+
+    # Draw cell border
+    if left or right or top or bottom:
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(0.5)
+        if left:
+            c.line(x_pos, y_pos, x_pos, y_pos - height)
+        if right:
+            c.line(x_pos + width, y_pos, x_pos + width, y_pos - height)
+        if top:
+            c.line(x_pos, y_pos, x_pos + width, y_pos)
+        if bottom:
+            c.line(x_pos, y_pos - height, x_pos + width, y_pos - height)
+
+    # Draw cell text
+    if value is None or value == '':
+        return
+    text = str(value)
+    font_name, font_size = style.font_name, style.font_size
+    c.setFillColor(style.text_color)
+    c.setFont(font_name, font_size)
+
+    available_width = width - 4  # Leave padding
+    if len(text) > 15 and stringWidth(text, font_name, font_size) > available_width:
+        # Wrap long content, max 3 lines
+        lines = _wrap_text(text, font_name, font_size, available_width)
+        line_height = font_size + 2
+        start_y = y_pos - ((height - (len(lines) * line_height)) / 2)
+        for i, line in enumerate(lines[:MAX_WRAPPED_LINES]):
+            _draw_aligned(c, style.halign, x_pos, width, start_y - (i * line_height), line)
+    else:
+        text_y = y_pos - (height / 2) - (font_size / 3)  # Vertically center
+        _draw_aligned(c, style.halign, x_pos, width, text_y, text)
+
+
+def _column_widths(sample_rows, max_col, layout, styles):
+    """Larger of the Excel column width and the content width of the sampled rows"""
+    content_widths = [0] * (max_col + 1)
+    for row in sample_rows:
+        for col_idx, cell in enumerate(row[:max_col], start=1):
+            value = cell.value
+            if value is None or value == '':
+                continue
+            estimated = len(str(value)) * styles.resolve(cell).font_size * 0.6
+            if estimated > content_widths[col_idx]:
+                content_widths[col_idx] = estimated
+    widths = []
+    for col_idx in range(1, max_col + 1):
+        excel_width = layout.col_widths.get(col_idx, DEFAULT_COL_WIDTH) * 7
+        widths.append(max(excel_width, content_widths[col_idx] + 10))
+    return widths
+
+
+def _choose_pagesize(total_width):
+    """A4 portrait if the sheet fits, otherwise landscape (scaled down if still too wide)"""
+    if total_width <= A4[0] - 2 * MARGIN:
+        return A4, 1.0
+    pagesize = landscape(A4)
+    usable = pagesize[0] - 2 * MARGIN
+    return pagesize, min(1.0, usable / total_width)
+
+
+def render_worksheet(c, ws, layout, images=()):
+    """
+    Render one worksheet onto canvas ``c`` in a single iter_rows pass
+    Column offsets are prefix sums computed up front; rows are laid out as
+    they stream and a new page starts whenever the next row does not fit.
+    Returns the number of pages emitted.
+    """
+    styles = StyleCache()
+    max_col = ws.max_column
+    if max_col is None:
+        ws.calculate_dimension(force=True)
+        max_col = ws.max_column or 1
+
+    rows = ws.iter_rows(min_row=1, min_col=1, max_col=max_col)
+    sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+    col_widths = _column_widths(sample, max_col, layout, styles)
+    col_offsets = [0.0] + list(accumulate(col_widths))  # col_offsets[i] = x of column i+1
+
+    def image_x(img_col):
+        if img_col <= max_col:
+            return col_offsets[img_col - 1]
+        # Anchored right of the data (e.g. a logo in column H)
+        return col_offsets[-1] + (img_col - 1 - max_col) * DEFAULT_COL_WIDTH * 7
+
+    content_width = max([col_offsets[-1]] + [image_x(img[1]) + img[2] for img in images])
+    pagesize, scale = _choose_pagesize(content_width)
+    usable_height = (pagesize[1] - 2 * MARGIN) / scale
+
+    def row_height(row_idx):
+        return layout.row_heights.get(row_idx, DEFAULT_ROW_HEIGHT) * 0.75
+
+    # Merged ranges: anchor cell spans the whole range, covered cells are skipped
+    spans = {}
+    covered = {}
+    for min_col, min_row, max_col_m, max_row in layout.merges:
+        span_h = sum(row_height(r) for r in range(min_row, max_row + 1))
+        spans[(min_row, min_col)] = (col_offsets[max_col_m] - col_offsets[min_col - 1], span_h)
+        for r in range(min_row, max_row + 1):
+            covered.setdefault(r, []).append((min_col, max_col_m, r == min_row))
+
+    def start_page():
+        c.setPageSize(pagesize)
+        c.saveState()
+        c.translate(MARGIN, pagesize[1] - MARGIN)
+        c.scale(scale, scale)
+
+    pages = 1
+    start_page()
+
+    image_iter = iter(images)
+    next_image = next(image_iter, None)
+    y_pos = 0.0
+
+    for row_idx, row in enumerate(chain(sample, rows), start=1):
+        height = row_height(row_idx)
+        if y_pos < 0 and -y_pos + height > usable_height:
+            c.restoreState()
+            c.showPage()
+            start_page()
+            pages += 1
+            y_pos = 0.0
+
+        # Draw images anchored on this row before its cells
+        while next_image is not None and next_image[0] <= row_idx:
+            _, img_col, img_w, img_h, data = next_image
+            try:
+                c.drawImage(ImageReader(io.BytesIO(data)), image_x(img_col),
+                            y_pos - img_h, width=img_w, height=img_h,
+                            preserveAspectRatio=True, mask='auto')
+            except Exception as e:
+                print(f"  Warning: Could not draw image: {str(e)}")
+            next_image = next(image_iter, None)
+
+        row_covered = covered.get(row_idx)
+        for col_idx, cell in enumerate(row[:max_col], start=1):
+            width = col_widths[col_idx - 1]
+            cell_height = height
+            if row_covered:
+                skip = False
+                for min_c, max_c, is_anchor_row in row_covered:
+                    if min_c <= col_idx <= max_c and not (is_anchor_row and col_idx == min_c):
+                        skip = True
+                        break
+                if skip:
+                    continue
+                span = spans.get((row_idx, col_idx))
+                if span:
+                    width, cell_height = span
+
+            style = styles.resolve(cell)
+            value = cell.value
+            if style is _DEFAULT_STYLE and (value is None or value == ''):
+                continue
+            _draw_cell(c, style, value, col_offsets[col_idx - 1], y_pos, width, cell_height)
+
+        y_pos -= height
+
+    c.restoreState()
+    c.showPage()
+    return pages
+
+
+def render_sheet_to_pdf(excel_path, sheet_name, pdf_path):
+    """
+    Render one worksheet of an .xlsx file to its own PDF
+    Opens the workbook itself so it can run in a worker process.
+    Returns (pages, images)
+    """
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.active
+        print(f"Sheet: {ws.title}")
+        print(f"Dimensions: {ws.max_row} rows × {ws.max_column} columns")
+
+        with zipfile.ZipFile(excel_path) as archive:
+            layout = read_sheet_layout(archive, ws._worksheet_path)
+            images = read_sheet_images(archive, ws._worksheet_path)
+
+        c = canvas.Canvas(str(pdf_path), pagesize=A4)
+        pages = render_worksheet(c, ws, layout, images)
+        c.save()
+    finally:
+        wb.close()
+    return pages, len(images)
+
+
+def convert_excel_to_pdf_advanced(excel_path, output_dir, sheets=None, max_workers=None):
+    """
+    Render the worksheets of an .xlsx file to one PDF
+    ``sheets`` selects names and/or 1-based positions (default: every sheet).
+    Sheets render in parallel worker processes and are concatenated with a
+    bookmark per sheet. Returns the path of the generated PDF
+    """
+    pdf_path = Path(output_dir) / (Path(excel_path).stem + '.pdf')
+    sheet_names = resolve_sheet_names(excel_path, sheets)
+
+    results = render_sheets_parallel(render_sheet_to_pdf, excel_path, sheet_names,
+                                     pdf_path, max_workers)
+
+    print(f"[OK] Sheets: {len(sheet_names)}")
+    print(f"[OK] Pages: {sum(pages for pages, _ in results)}")
+    print(f"[OK] Images preserved: {sum(images for _, images in results)}")
+    return pdf_path
+
+
+def render_table_rows(c, rows, header=None):
+    """
+    Render plain-value rows (e.g. a csv.reader) as a bordered grid in one pass
+    Column widths come from the first rows; the header repeats on every page.
+    Returns the number of pages emitted.
+    """
+    rows = iter(rows)
+    sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+    header = list(header) if header else []
+    num_cols = max([len(header)] + [len(row) for row in sample]) or 1
+
+    max_lengths = [0] * num_cols
+    for row in chain([header], sample):
+        for col_idx, value in enumerate(row[:num_cols]):
+            max_lengths[col_idx] = max(max_lengths[col_idx], len(str(value)))
+    col_widths = [min(length + 2, 50) * 7 for length in max_lengths]
+    col_offsets = [0.0] + list(accumulate(col_widths))
+
+    pagesize, scale = _choose_pagesize(col_offsets[-1])
+    usable_height = (pagesize[1] - 2 * MARGIN) / scale
+    row_height = DEFAULT_ROW_HEIGHT * 0.75
+
+    def draw_row(row, style, y_pos):
+        for col_idx in range(min(len(row), num_cols)):
+            _draw_cell(c, style, row[col_idx], col_offsets[col_idx], y_pos,
+                       col_widths[col_idx], row_height)
+        for col_idx in range(len(row), num_cols):  # Short rows still get their grid
+            _draw_cell(c, style, None, col_offsets[col_idx], y_pos,
+                       col_widths[col_idx], row_height)
+
+    def start_page():
+        c.setPageSize(pagesize)
+        c.saveState()
+        c.translate(MARGIN, pagesize[1] - MARGIN)
+        c.scale(scale, scale)
+        if header:
+            draw_row(header, _CSV_HEADER_STYLE, 0.0)
+            return -row_height
+        return 0.0
+
+    pages = 1
+    y_pos = start_page()
+    for row in chain(sample, rows):
+        if -y_pos + row_height > usable_height:
+            c.restoreState()
+            c.showPage()
+            pages += 1
+            y_pos = start_page()
+        draw_row(row, _CSV_BODY_STYLE, y_pos)
+        y_pos -= row_height
+
+    c.restoreState()
+    c.showPage()
+    return pages
+
+
+def convert_csv_to_pdf(csv_path, output_dir):
+    """
+    Render a CSV file straight to PDF, streaming rows from the csv reader
+    The first row is treated as the header. Returns the path of the generated PDF
+    """
+    pdf_path = Path(output_dir) / (Path(csv_path).stem + '.pdf')
+
+    def render(reader):
+        # A fresh canvas per attempt: nothing reaches the file before save()
+        c = canvas.Canvas(str(pdf_path), pagesize=A4)
+        pages = render_table_rows(c, reader, next(reader, None))
+        c.save()
+        return pages
+
+    pages, fmt = consume_csv_rows(csv_path, render)
+
+    print(f"[OK] CSV rendered directly ({fmt.encoding}, {fmt.delimiter!r}): {pages} pages")
+    return pdf_path
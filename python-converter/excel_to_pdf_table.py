@@ -1,7 +1,7 @@
 """
 Excel to PDF Converter – Hybrid (Custom + iLovePDF)
 ---------------------------------------------------
-• Generates professional bank-statement PDFs (ReportLab)
+• Generates professional bank-statement PDFs (ReportLab), one section per sheet
 • OR uses the official iLovePDF API for direct Excel→PDF conversion
 • Works on Render.com (no LibreOffice needed)
 """
@@ -10,14 +10,19 @@ import os
 import io
 import json
 import requests
+from functools import partial
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer, Flowable
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+from parallel_sheets import render_sheets_parallel, resolve_sheet_names
+from statement_resources import (LOGO_SIZE, load_logo, statement_font, statement_styles,
+                                 transaction_table_style)
 
 
 # ──────────────────────────────────────────────────────────────
@@ -88,15 +93,94 @@ def convert_excel_to_pdf_via_ilovepdf(excel_path, output_path):
 # ──────────────────────────────────────────────────────────────
 
 
-def convert_excel_to_pdf_table(excel_path, output_path, account_info=None, logo_path=None):
+# Fixed transaction row height: 9pt text * 1.2 leading + 6pt top/bottom padding
+TABLE_ROW_HEIGHT = 9 * 1.2 + 12
+
+
+class _StatementRows(Flowable):
+    """
+    Transaction rows from ``start`` on, laid out one page at a time
+    Wherever the page ends the frame splits this flowable: the split builds a
+    LongTable (header repeated) for just the rows that fit and a new
+    _StatementRows for the rest, so only the table being drawn is in memory
+    and ReportLab never has to split one huge table.
+    """
+
+    def __init__(self, df, col_widths, table_style, start=0):
+        super().__init__()
+        self.df = df
+        self.col_widths = col_widths
+        self.table_style = table_style
+        self.start = start
+        self.hAlign = 'CENTER'  # Like the Table it stands for
+
+    def _table(self, stop):
+        header = [str(col_name) for col_name in self.df.columns]
+        chunk = self.df.iloc[self.start:stop]
+        body = chunk.fillna('').astype(str).replace('\n', ' ', regex=True).values.tolist()
+        table = LongTable([header] + body, colWidths=self.col_widths,
+                          rowHeights=TABLE_ROW_HEIGHT, repeatRows=1)
+        table.setStyle(self.table_style)
+        return table
+
+    def wrap(self, availWidth, availHeight):
+        self.width = sum(self.col_widths)
+        self.height = (len(self.df) - self.start + 1) * TABLE_ROW_HEIGHT  # Rows plus header
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        rows = int(availHeight // TABLE_ROW_HEIGHT) - 2  # Header row plus a row of slack
+        if rows < 1:
+            return []  # Nothing fits here: the frame moves on to the next page
+        stop = min(self.start + rows, len(self.df))
+        parts = [self._table(stop)]
+        if stop < len(self.df):
+            parts.append(_StatementRows(self.df, self.col_widths, self.table_style, stop))
+        return parts
+
+    def draw(self):
+        # The remaining rows fit in the frame: draw them as one table
+        table = self._table(len(self.df))
+        table.wrapOn(self.canv, self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
+
+
+def convert_excel_to_pdf_table(excel_path, output_path, account_info=None, logo_path=None,
+                               sheets=None, max_workers=None, font_path=None):
     """
     Convert Excel to PDF with professional bank statement formatting
     Includes: Header with logo, customer details, and formatted transaction table
+    Every sheet (or the ``sheets`` selection) becomes its own statement section;
+    sheets render in parallel processes and are bookmarked by sheet name
+    """
+    sheet_names = resolve_sheet_names(excel_path, sheets)
+    render_sheet = partial(render_statement_sheet, account_info=account_info, logo_path=logo_path,
+                           font_path=font_path)
+    render_sheets_parallel(render_sheet, excel_path, sheet_names, output_path, max_workers)
+    return output_path
+
+
+def render_statement_sheet(excel_path, sheet_name, output_path, account_info=None, logo_path=None,
+                           font_path=None):
+    """Load one worksheet and render it as a statement (runs in a worker process)"""
+    df = pd.read_excel(excel_path, sheet_name=sheet_name)
+    return render_statement_pdf(df, output_path, account_info, logo_path, font_path)
+
+
+def render_statement_pdf(df, output_path, account_info=None, logo_path=None, font_path=None):
+    """
+    Render a transactions DataFrame as a bank statement PDF
+    Shared by the Excel and CSV inputs so CSV never goes through an .xlsx file
+    ``logo_path`` / ``font_path`` may be file paths or the uploaded bytes
     """
+    # The uploaded font stays registered under its name until the build is done
+    with statement_font(font_path) as font_name:
+        return _render_statement(df, output_path, account_info, logo_path, font_name)
+
+
+def _render_statement(df, output_path, account_info, logo_path, font_name):
     print(f"\n[ Custom Layout ] Generating {os.path.basename(output_path)} ...")
 
-    # Load Excel
-    df = pd.read_excel(excel_path)
     num_cols = len(df.columns)
 
     # Determine page orientation based on number of columns
@@ -117,19 +201,21 @@ def convert_excel_to_pdf_table(excel_path, output_path, account_info=None, logo_
         bottomMargin=15 * mm,
     )
 
-    styles = getSampleStyleSheet()
+    # Styles, fonts and the scaled logo come from the process-wide resource cache
+    styles = statement_styles()
     elements = []
 
     # ============ HEADER SECTION ============
     from reportlab.platypus import Image as RLImage
-    from reportlab.lib.utils import ImageReader
     
     # Bank of India logo and header (right-aligned like in screenshot)
-    if logo_path and os.path.exists(logo_path):
+    if logo_path:
         try:
-            logo = RLImage(logo_path, width=50*mm, height=18*mm)
-            logo.hAlign = 'RIGHT'
-            elements.append(logo)
+            logo_png = load_logo(logo_path)
+            if logo_png:
+                logo = RLImage(io.BytesIO(logo_png), width=LOGO_SIZE[0], height=LOGO_SIZE[1])
+                logo.hAlign = 'RIGHT'
+                elements.append(logo)
         except Exception as e:
             print(f"Warning: Could not load logo: {e}")
     
@@ -138,7 +224,7 @@ def convert_excel_to_pdf_table(excel_path, output_path, account_info=None, logo_
     # "Detailed Statement" title (centered, bold)
     elements.append(
         Paragraph("<b><font size=18>Detailed Statement</font></b>",
-                  ParagraphStyle("Title", alignment=TA_CENTER, fontSize=18, spaceAfter=10))
+                  styles.title)
     )
     
     elements.append(Spacer(1, 5 * mm))
@@ -146,8 +232,7 @@ def convert_excel_to_pdf_table(excel_path, output_path, account_info=None, logo_
     # ============ CUSTOMER DETAILS SECTION ============
     # Add date in top right corner
     current_date = datetime.now().strftime("%d/%m/%Y")
-    date_para = Paragraph(f"<b>Date: {current_date}</b>", 
-                         ParagraphStyle("DateStyle", alignment=TA_RIGHT, fontSize=10))
+    date_para = Paragraph(f"<b>Date: {current_date}</b>", styles.date)
     elements.append(date_para)
     elements.append(Spacer(1, 3 * mm))
     
@@ -163,7 +248,7 @@ def convert_excel_to_pdf_table(excel_path, output_path, account_info=None, logo_
         }
 
     # Create customer details box (matching Bank of India format)
-    detail_style = ParagraphStyle("DetailStyle", fontSize=9, leading=12)
+    detail_style = styles.detail
     
     # Create 2x2 grid for customer details
     customer_box_data = [
@@ -188,23 +273,14 @@ def convert_excel_to_pdf_table(excel_path, output_path, account_info=None, logo_
     ]
     
     customer_table = Table(customer_box_data, colWidths=[45*mm, 65*mm, 50*mm, 90*mm])
-    customer_table.setStyle(TableStyle([
-        ('BOX', (0, 0), (-1, -1), 1.5, colors.black),
-        ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('SPAN', (3, 0), (3, 2)),  # Span address field across rows
-    ]))
+    customer_table.setStyle(styles.customer_box)
     
     elements.append(customer_table)
     elements.append(Spacer(1, 5 * mm))
     
     # ============ TRANSACTION FILTERS SECTION ============
     # Add transaction date, amount, cheque filters (like in screenshot)
-    filter_style = ParagraphStyle("FilterStyle", fontSize=9, leading=14)
+    filter_style = styles.filter
     filter_data = [
         [Paragraph("<b>Transaction Date</b>", filter_style), 
          Paragraph(f"from: {account_info.get('transaction_date_from', '02-03-2025')}", filter_style),
@@ -219,80 +295,43 @@ def convert_excel_to_pdf_table(excel_path, output_path, account_info=None, logo_
     ]
     
     filter_table = Table(filter_data, colWidths=[50*mm, 50*mm, 50*mm])
-    filter_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-    ]))
+    filter_table.setStyle(styles.filter_box)
     
     elements.append(filter_table)
     elements.append(Spacer(1, 5 * mm))
 
-    # Prepare table data
-    table_data = [df.columns.tolist()] + df.astype(str).values.tolist()
+    if df.columns.empty:
+        # Empty worksheet (e.g. an unused "Sheet3"): keep its section, no table
+        print(f"  - No data in {os.path.basename(output_path)}, rendering a placeholder")
+        elements.append(Paragraph("No transactions on this sheet", styles.filter))
+        doc.build(elements)
+        return output_path
 
     # Calculate column widths based on content and available space
     page_width = pagesize[0] - (30 * mm)  # Account for margins
-    
-    # Smart column width calculation
-    col_widths = []
-    for col_idx, col_name in enumerate(df.columns):
-        # Get max length in column
-        max_len = len(str(col_name))
-        for val in df.iloc[:, col_idx].astype(str):
-            max_len = max(max_len, len(val))
-        
-        # Calculate width (with min and max constraints)
-        width = min(max(max_len * 2.5, 20), 100)
-        col_widths.append(width)
-    
-    # Normalize widths to fit page
-    total_width = sum(col_widths)
-    col_widths = [w * page_width / total_width for w in col_widths]
 
-    # Create table with enhanced styling
-    table = Table(table_data, colWidths=col_widths, repeatRows=1)
-    
-    # Apply Bank of India table styling (matching screenshot)
-    table_style = TableStyle([
-        # Header row styling - white background with black border
-        ('BACKGROUND', (0, 0), (-1, 0), colors.white),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 9),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        
-        # Data rows styling
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        
-        # All rows white background (no alternating colors in Bank of India format)
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        
-        # Grid and borders - black lines
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BOX', (0, 0), (-1, -1), 1.5, colors.black),
-        
-        # Padding
-        ('LEFTPADDING', (0, 0), (-1, -1), 4),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        
-        # Vertical alignment
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ])
-    
-    # Special alignment for numeric columns (Debit, Credit, Balance)
-    for col_idx, col_name in enumerate(df.columns):
-        col_name_lower = str(col_name).lower()
-        if any(keyword in col_name_lower for keyword in ['debit', 'credit', 'balance', 'amount', 'sr', 'no']):
-            table_style.add('ALIGN', (col_idx, 1), (col_idx, -1), 'RIGHT')
-    
-    table.setStyle(table_style)
-    elements.append(table)
+    # Smart column width calculation - vectorized max string length per column
+    cell_text = df.fillna('').astype(str)
+    header_lens = np.array([len(str(col_name)) for col_name in df.columns])
+    if len(df):
+        max_lens = np.maximum(cell_text.apply(lambda col: col.str.len().max()).to_numpy(dtype=float),
+                              header_lens)
+    else:
+        max_lens = header_lens.astype(float)
+    del cell_text
+
+    # Calculate width (with min and max constraints), then normalize to fit page
+    col_widths = np.clip(max_lens * 2.5, 20, 100)
+    col_widths = (col_widths * page_width / col_widths.sum()).tolist()
+
+    # Apply Bank of India table styling (matching screenshot), shared per column layout
+    if font_name:
+        table_style = transaction_table_style(df.columns, font_name, font_name)
+    else:
+        table_style = transaction_table_style(df.columns)
 
-    # Build PDF
+    # Page-sized LongTable chunks, built as the layout reaches each page
+    elements.append(_StatementRows(df, col_widths, table_style))
     doc.build(elements)
 
     print(f"✓ Custom PDF Created: {output_path}")
@@ -307,7 +346,8 @@ def convert_excel_to_pdf_table(excel_path, output_path, account_info=None, logo_
 # ──────────────────────────────────────────────────────────────
 
 
-def convert_to_pdf_table(input_path, output_path, account_info=None, logo_path=None, use_ilovepdf_api=False):
+def convert_to_pdf_table(input_path, output_path, account_info=None, logo_path=None, use_ilovepdf_api=False,
+                         sheets=None, font_path=None):
     """
     Automatically handles Excel/CSV and chooses between:
     - iLovePDF API (if use_ilovepdf_api=True)
@@ -317,11 +357,17 @@ def convert_to_pdf_table(input_path, output_path, account_info=None, logo_path=N
     - input_path: Path to Excel or CSV file
     - output_path: Path for output PDF
     - account_info: Dictionary with customer details (optional)
-    - logo_path: Path to bank logo image (optional)
+    - logo_path: Path to bank logo image, or its raw bytes (optional)
     - use_ilovepdf_api: Use iLovePDF API instead of ReportLab (default: False)
+    - sheets: Sheet names / 1-based positions to render (default: all sheets)
+    - font_path: TTF font (path or bytes) for the transaction table (optional)
     """
     if input_path.lower().endswith('.csv'):
-        df = pd.read_csv(input_path)
+        from csv_ingest import read_csv
+        df = read_csv(input_path)
+        if not use_ilovepdf_api:
+            # Render straight from the parsed CSV - no .xlsx round trip
+            return render_statement_pdf(df, output_path, account_info, logo_path, font_path)
         tmp_excel = input_path.replace(".csv", ".xlsx")
         df.to_excel(tmp_excel, index=False)
         input_path = tmp_excel
@@ -333,7 +379,8 @@ def convert_to_pdf_table(input_path, output_path, account_info=None, logo_path=N
         else:
             print("⚠️ Falling back to local ReportLab rendering...")
 
-    return convert_excel_to_pdf_table(input_path, output_path, account_info, logo_path)
+    return convert_excel_to_pdf_table(input_path, output_path, account_info, logo_path, sheets,
+                                      font_path=font_path)
 
 
 # ──────────────────────────────────────────────────────────────
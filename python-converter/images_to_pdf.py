@@ -0,0 +1,411 @@
+"""
+Images to PDF
+-------------
+• Streaming PDF writer in the style of img2pdf: every page is written to the
+  output file as soon as it is added, nothing is held back until save
+• JPEG uploads are embedded as-is (DCTDecode): only the header is read for
+  size and colour space, no decode / re-encode, output size ≈ input size
+• Other formats (PNG, ...) are decoded once and stored losslessly (FlateDecode)
+• EXIF orientation is applied with the page transform (lossless); optional
+  downsampling to a target DPI and JPEG recompression run in a thread pool
+• Images can come from a ZIP / TAR archive, taken one member at a time in
+  natural filename order
+"""
+
+import io
+import os
+import re
+import shutil
+import tarfile
+import threading
+import zipfile
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+# Page size settings (width, height in points)
+PAGE_SIZES = {
+    'A4': (595, 842),
+    'Letter': (612, 792),
+    'Legal': (612, 1008)
+}
+
+# Margin settings in points (1 inch = 72 points)
+MARGINS = {
+    'no': 0,
+    'small': 36,  # 0.5 inch
+    'big': 72     # 1 inch
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+MAX_MEMBER_SIZE = 100 * 1024 * 1024   # Largest single image accepted from an archive
+MAX_ARCHIVE_TOTAL = 1024 * 1024 * 1024  # Largest total of image members in one archive
+
+EXIF_ORIENTATION = 0x0112
+DOWNSAMPLE_THRESHOLD = 1.05  # Leave images alone unless they are >5% above the target DPI
+DEFAULT_QUALITY = 85         # JPEG quality when an image has to be re-encoded anyway
+
+# ``orientation`` is the EXIF value (1-8); width / height are the stored pixel size
+EmbeddedImage = namedtuple('EmbeddedImage', 'width height color_space filter decode data orientation',
+                           defaults=(1,))
+
+# Per-request image options shared by every page
+ImageOptions = namedtuple('ImageOptions', 'page_size orientation margin_size target_dpi quality',
+                          defaults=('fit', 'portrait', 0, None, None))
+
+_JPEG_COLOR_SPACES = {'RGB': '/DeviceRGB', 'L': '/DeviceGray', 'CMYK': '/DeviceCMYK'}
+
+
+def _jpeg_image(data, img, orientation=1):
+    """Wrap original JPEG bytes without decoding them (None if PDF can't show them as-is)"""
+    color_space = _JPEG_COLOR_SPACES.get(img.mode)
+    if color_space is None:
+        return None
+    decode = None
+    if img.mode == 'CMYK' and 'adobe' in img.info:
+        # Adobe (Photoshop) CMYK JPEGs store inverted values
+        decode = '[1 0 1 0 1 0 1 0]'
+    return EmbeddedImage(img.width, img.height, color_space, '/DCTDecode', decode, data, orientation)
+
+
+def _exif_orientation(img):
+    """EXIF orientation tag (1 if missing / invalid); read from the header only"""
+    try:
+        orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+    except Exception:
+        return 1
+    return orientation if orientation in range(1, 9) else 1
+
+
+def display_size(image):
+    """Width and height of the image as it should appear (after EXIF orientation)"""
+    if image.orientation >= 5:
+        return image.height, image.width
+    return image.width, image.height
+
+
+def _flate_image(img):
+    """Decode and store pixels losslessly; transparency is flattened onto white"""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        img = Image.new('RGB', rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel('A'))
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    color_space = '/DeviceGray' if img.mode == 'L' else '/DeviceRGB'
+    return EmbeddedImage(img.width, img.height, color_space, '/FlateDecode', None,
+                         zlib.compress(img.tobytes(), 6))
+
+
+def load_image(data):
+    """
+    Prepare uploaded image bytes for embedding
+    JPEGs pass through untouched; anything else is decoded and Flate-compressed.
+    EXIF orientation is kept as metadata and applied by the page transform.
+    """
+    img = Image.open(io.BytesIO(data))  # Lazy: only the header is parsed here
+    orientation = _exif_orientation(img)
+    if img.format == 'JPEG':
+        embedded = _jpeg_image(data, img, orientation)
+        if embedded is not None:
+            return embedded
+    img.load()
+    return _flate_image(img)._replace(orientation=orientation)
+
+
+def _encode_jpeg(img, quality):
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        return None  # Keep transparency handling in the lossless path
+    if img.mode not in ('RGB', 'L', 'CMYK'):
+        img = img.convert('RGB')
+    out = io.BytesIO()
+    img.save(out, format='JPEG', quality=quality, optimize=True)
+    data = out.getvalue()
+    return _jpeg_image(data, Image.open(io.BytesIO(data)))
+
+
+def _target_pixels(width, height, options):
+    """Pixel size needed for ``target_dpi`` at the drawn size (None if no downsampling)"""
+    if not options.target_dpi or options.page_size == 'fit':
+        # 'fit' pages are sized from the pixels (1px = 1pt), there is no physical size to hit
+        return None
+    _, (_, _, draw_w, draw_h) = page_layout(width, height, options.page_size,
+                                            options.orientation, options.margin_size)
+    target_w = max(1, round(draw_w / 72 * options.target_dpi))
+    target_h = max(1, round(draw_h / 72 * options.target_dpi))
+    if width <= target_w * DOWNSAMPLE_THRESHOLD and height <= target_h * DOWNSAMPLE_THRESHOLD:
+        return None
+    return target_w, target_h
+
+
+def normalize_image(data, options=ImageOptions()):
+    """
+    Prepare one upload for its page: EXIF orientation, optional downsampling to
+    ``options.target_dpi`` and JPEG recompression at ``options.quality``
+    Without either option the lossless passthrough of ``load_image`` is used.
+    Returns (image, page_size, placement)
+    """
+    img = Image.open(io.BytesIO(data))  # Header only
+    orientation = _exif_orientation(img)
+    width, height = (img.height, img.width) if orientation >= 5 else img.size
+    target = _target_pixels(width, height, options)
+
+    if target is None and not options.quality:
+        image = load_image(data)
+    else:
+        if target is not None and img.format == 'JPEG':
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when that still covers the target
+            img.draft(img.mode, target if orientation < 5 else target[::-1])
+        img = ImageOps.exif_transpose(img)
+        if target is not None:
+            img.thumbnail(target, Image.LANCZOS)
+        image = _encode_jpeg(img, options.quality or DEFAULT_QUALITY) or _flate_image(img)
+        if target is None:
+            # Recompressing at full size can make a file bigger - keep the original then
+            original = load_image(data)
+            if len(original.data) <= len(image.data):
+                image = original
+
+    width, height = display_size(image)
+    page, placement = page_layout(width, height, options.page_size,
+                                  options.orientation, options.margin_size)
+    return image, page, placement
+
+
+def normalize_images(sources, options=ImageOptions(), max_workers=None):
+    """
+    Run ``normalize_image`` over ``sources`` (bytes, or callables returning bytes)
+    in a thread pool and yield the results in input order
+    At most two images per worker are in flight, so memory stays bounded
+    however many images there are. Pillow releases the GIL while decoding
+    and encoding, so threads scale across cores.
+    """
+    workers = max_workers or min(8, os.cpu_count() or 1)
+
+    def work(source):
+        return normalize_image(source() if callable(source) else source, options)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for source in sources:
+            pending.append(pool.submit(work, source))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def page_layout(img_width, img_height, page_size='fit', orientation='portrait', margin_size=0):
+    """
+    Page size and image placement for one image, iLovePDF style
+    Returns ((page_w, page_h), (x, y, draw_w, draw_h)), image centred and scaled to fit
+    """
+    # Determine page size
+    if page_size == 'fit':
+        if orientation == 'landscape':
+            page_w, page_h = max(img_width, img_height), min(img_width, img_height)
+        else:
+            page_w, page_h = min(img_width, img_height), max(img_width, img_height)
+    else:
+        base_size = PAGE_SIZES.get(page_size, (595, 842))
+        if orientation == 'landscape':
+            page_w, page_h = max(base_size), min(base_size)
+        else:
+            page_w, page_h = min(base_size), max(base_size)
+
+    # Scale image to fit inside the margins
+    available_w = page_w - (2 * margin_size)
+    available_h = page_h - (2 * margin_size)
+    scale = min(available_w / img_width, available_h / img_height)
+    new_w = img_width * scale
+    new_h = img_height * scale
+
+    # Center image
+    x = (page_w - new_w) / 2
+    y = (page_h - new_h) / 2
+    return (page_w, page_h), (x, y, new_w, new_h)
+
+
+def _num(value):
+    return f"{value:.4f}".rstrip('0').rstrip('.')
+
+
+def _orientation_matrix(orientation, x, y, w, h):
+    """
+    Image-space (unit square) to page matrix that shows the stored pixels in the
+    box (x, y, w, h) as EXIF ``orientation`` says they should be displayed
+    """
+    return {
+        1: (w, 0, 0, h, x, y),
+        2: (-w, 0, 0, h, x + w, y),           # Mirrored horizontally
+        3: (-w, 0, 0, -h, x + w, y + h),      # Rotated 180
+        4: (w, 0, 0, -h, x, y + h),           # Mirrored vertically
+        5: (0, -h, -w, 0, x + w, y + h),      # Transposed
+        6: (0, -h, w, 0, x, y + h),           # Rotated 90 CW
+        7: (0, h, w, 0, x, y),                # Transversed
+        8: (0, h, -w, 0, x + w, y),           # Rotated 90 CCW
+    }.get(orientation, (w, 0, 0, h, x, y))
+
+
+class ImagePdfWriter:
+    """
+    Minimal PDF writer for one-image-per-page documents
+    Pages are appended to ``fileobj`` immediately; the page tree, catalog and
+    xref table are written by ``close()``.
+    """
+
+    def __init__(self, fileobj):
+        self._out = fileobj
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3  # 1 = catalog, 2 = page tree (written at close)
+        self._pos = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def __len__(self):
+        return len(self._page_ids)
+
+    def _write(self, data):
+        self._out.write(data)
+        self._pos += len(data)
+
+    def _new_id(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._pos
+        self._write(f"{obj_id} 0 obj\n".encode())
+        self._write(body.encode())
+        if stream is not None:
+            self._write(b"\nstream\n")
+            self._write(stream)
+            self._write(b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_page(self, image, page_size, placement):
+        """Add a page of ``page_size`` showing ``image`` at (x, y, width, height)"""
+        page_w, page_h = page_size
+        x, y, draw_w, draw_h = placement
+        image_id, content_id, page_id = self._new_id(), self._new_id(), self._new_id()
+
+        decode = f" /Decode {image.decode}" if image.decode else ""
+        self._write_object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {image.width} /Height {image.height}"
+            f" /ColorSpace {image.color_space} /BitsPerComponent 8 /Filter {image.filter}"
+            f"{decode} /Length {len(image.data)} >>"), image.data)
+
+        matrix = ' '.join(_num(v) for v in _orientation_matrix(image.orientation, x, y, draw_w, draw_h))
+        content = f"q {matrix} cm /Im0 Do Q".encode()
+        self._write_object(content_id, f"<< /Length {len(content)} >>", content)
+
+        self._write_object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(page_w)} {_num(page_h)}]"
+            f" /Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"))
+        self._page_ids.append(page_id)
+
+    def close(self):
+        if not self._page_ids:
+            raise ValueError("No images to write: a PDF needs at least one page")
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        self._write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_pos = self._pos
+        size = self._next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            lines.append(f"{self._offsets[obj_id]:010d} 00000 n \n")
+        self._write(''.join(lines).encode())
+        self._write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_pos}\n%%EOF\n".encode())
+
+
+def natural_key(name):
+    """Natural sort key, so page2.jpg comes before page10.jpg"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name.lower())]
+
+
+def is_archive(filename):
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _is_image_member(name):
+    base = name.rsplit('/', 1)[-1]
+    return (base.lower().endswith(IMAGE_EXTENSIONS) and not base.startswith('.')
+            and not name.startswith('__MACOSX/'))
+
+
+def _check_sizes(members):
+    total = 0
+    for name, size in members:
+        if size > MAX_MEMBER_SIZE:
+            raise ValueError(f"Archive member too large: {name}")
+        total += size
+        if total > MAX_ARCHIVE_TOTAL:
+            raise ValueError(f"Archive images exceed {MAX_ARCHIVE_TOTAL // (1024 * 1024)} MB in total")
+
+
+def _spool_tar(fileobj, spool_dir):
+    """
+    Copy a TAR's image members to ``spool_dir`` in one sequential pass
+    Compressed TARs can only seek backwards by decompressing again from the
+    start, so members are never read out of archive order
+    """
+    members = []
+    sizes = []
+    with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+        for info in archive:
+            if not (info.isfile() and _is_image_member(info.name)):
+                continue
+            sizes.append((info.name, info.size))
+            _check_sizes(sizes)
+            path = os.path.join(spool_dir, f"member_{len(members):05d}")
+            with archive.extractfile(info) as src, open(path, 'wb') as dest:
+                shutil.copyfileobj(src, dest)
+            members.append((info.name, path))
+    return members
+
+
+def archive_images(fileobj, filename, spool_dir):
+    """
+    Image members of a ZIP / TAR upload as (name, read) in natural filename order
+    ``read()`` loads one member's bytes on demand, so only the images currently
+    being processed are in memory. ZIP members are read straight from the
+    upload (random access is cheap; reads are serialised because they share
+    one seek position). TAR members are spooled to ``spool_dir`` first, in
+    archive order, and read back from there.
+    """
+    if filename.lower().endswith('.zip'):
+        archive = zipfile.ZipFile(fileobj)
+        infos = [info for info in archive.infolist()
+                 if not info.is_dir() and _is_image_member(info.filename)]
+        _check_sizes((info.filename, info.file_size) for info in infos)
+        infos.sort(key=lambda info: natural_key(info.filename))
+        lock = threading.Lock()
+
+        def reader(info):
+            def read():
+                with lock:
+                    return archive.read(info)
+            return read
+        members = [(info.filename, reader(info)) for info in infos]
+    else:
+        def reader(path):
+            def read():
+                with open(path, 'rb') as f:
+                    return f.read()
+            return read
+        spooled = sorted(_spool_tar(fileobj, spool_dir), key=lambda member: natural_key(member[0]))
+        members = [(name, reader(path)) for name, path in spooled]
+    return [(name.rsplit('/', 1)[-1], read) for name, read in members]
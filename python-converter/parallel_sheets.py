@@ -0,0 +1,132 @@
+"""
+Parallel per-sheet rendering
+Renders each selected worksheet of a workbook to its own PDF in a worker
+process, then concatenates the parts into one PDF with a bookmark per sheet,
+so wall-clock time tracks the largest sheet rather than the sum of all sheets.
+Sheets run on the pool shared by the whole web process (worker_pool).
+"""
+
+import os
+import tempfile
+
+from openpyxl import load_workbook
+from pypdf import PdfWriter
+
+from worker_pool import WORKER_PROCESSES, iter_completed
+
+
+class SheetSelectionError(ValueError):
+    """A requested sheet name or position that the workbook does not have"""
+
+
+def parse_sheet_selection(value):
+    """
+    Parse a request's ``sheets`` field ("Summary, 3, Q4") into a selection list
+    Items stay text here: "2023" may be a sheet name, so positions are only
+    decided against the workbook (``resolve_sheet_names``). Empty / "all"
+    means every sheet.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).split(',')
+    selection = []
+    for item in items:
+        if isinstance(item, int) and not isinstance(item, bool):
+            selection.append(item)  # JSON lists may carry positions as numbers
+            continue
+        item = str(item).strip()
+        if item:
+            selection.append(item)
+    if not selection or selection == ['all']:
+        return None
+    return selection
+
+
+def list_sheet_names(excel_path):
+    """Sheet names in workbook order (read-only open, no cells are parsed)"""
+    if str(excel_path).lower().endswith('.xls'):
+        # Legacy binary workbooks are not readable by openpyxl
+        import pandas as pd
+        with pd.ExcelFile(excel_path) as xls:
+            return list(xls.sheet_names)
+    wb = load_workbook(excel_path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def resolve_sheet_names(excel_path, sheets=None):
+    """
+    Resolve a selection of sheet names and/or 1-based positions against the workbook
+    A text item naming a sheet exactly is that sheet, even if it is all digits;
+    other all-digit text is a position. Returns the names in the order
+    requested; raises SheetSelectionError for unknown sheets
+    """
+    names = list_sheet_names(excel_path)
+    if not sheets:
+        return names
+    resolved = []
+    for sheet in sheets:
+        if isinstance(sheet, str) and sheet in names:
+            name = sheet
+        elif isinstance(sheet, int) or str(sheet).strip().isdigit():
+            position = int(sheet)
+            if not 1 <= position <= len(names):
+                raise SheetSelectionError(f"Sheet {sheet} not found and out of range as a position "
+                                 f"(workbook has {len(names)} sheets)")
+            name = names[position - 1]
+        else:
+            raise SheetSelectionError(f"Sheet not found: {sheet}")
+        if name not in resolved:
+            resolved.append(name)
+    return resolved
+
+
+def merge_pdfs_with_bookmarks(parts, output_path):
+    """Concatenate (title, pdf_path) parts into one PDF, one top-level bookmark each"""
+    writer = PdfWriter()
+    for title, part_path in parts:
+        writer.append(part_path, outline_item=title)
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+    return output_path
+
+
+def render_sheets_parallel(render_sheet, excel_path, sheet_names, output_path, max_workers=None):
+    """
+    Render every sheet with ``render_sheet(excel_path, sheet_name, pdf_path)``
+    and merge the results into ``output_path`` with a bookmark per sheet
+
+    ``render_sheet`` must be a module-level function (or a functools.partial of one)
+    so it can be sent to worker processes. Each worker opens the workbook itself,
+    so sheets are parsed as well as drawn in parallel. ``max_workers`` caps how
+    many sheets of this call are in the shared pool at once (1 renders in-process).
+    Returns the list of per-sheet results in sheet order.
+    """
+    if len(sheet_names) == 1:
+        # Single sheet: no pool, no merge, no bookmark needed
+        return [render_sheet(excel_path, sheet_names[0], str(output_path))]
+
+    workers = min(len(sheet_names), max_workers or WORKER_PROCESSES)
+    print(f"Rendering {len(sheet_names)} sheets, {workers} at a time "
+          f"(shared pool of {WORKER_PROCESSES} processes)")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        part_paths = [os.path.join(tmpdir, f"sheet_{i:03d}.pdf") for i in range(len(sheet_names))]
+        if workers == 1:
+            results = [render_sheet(excel_path, name, path)
+                       for name, path in zip(sheet_names, part_paths)]
+        else:
+            results = [None] * len(sheet_names)
+            calls = ((index, render_sheet, (excel_path, name, path))
+                     for index, (name, path) in enumerate(zip(sheet_names, part_paths)))
+            for index, result in iter_completed(calls, workers):
+                results[index] = result
+
+        merge_pdfs_with_bookmarks(zip(sheet_names, part_paths), str(output_path))
+
+    return results
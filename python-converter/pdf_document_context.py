@@ -0,0 +1,157 @@
+"""
+PDF Document Context
+Parses an uploaded PDF once per request and serves page data
+(text dicts, drawings, images, geometry, tables) to every extraction stage
+"""
+
+import fitz  # PyMuPDF
+
+
+class PdfDocumentContext:
+    """
+    Per-request view of a PDF, parsed once with PyMuPDF
+    Page data is loaded lazily and cached per page, so every stage
+    (logo/title detection, table detection, text fallback) shares one parse
+    """
+
+    def __init__(self, pdf_bytes, filename='document.pdf'):
+        self.pdf_bytes = pdf_bytes
+        self.filename = filename
+        self.doc = fitz.open(stream=pdf_bytes, filetype='pdf')
+        self._pages = {}
+        self._cache = {}
+        self._images = {}
+        self._plumber = None
+
+    @classmethod
+    def from_upload(cls, file_storage, filename=None):
+        """Build a context straight from a werkzeug upload without touching disk"""
+        return cls(file_storage.read(), filename or file_storage.filename)
+
+    def __len__(self):
+        return len(self.doc)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def size_mb(self):
+        return len(self.pdf_bytes) / (1024 * 1024)
+
+    def page(self, page_num):
+        """Return the cached fitz page object (0-based)"""
+        if page_num not in self._pages:
+            self._pages[page_num] = self.doc.load_page(page_num)
+        return self._pages[page_num]
+
+    def _cached(self, kind, page_num, loader):
+        key = (kind, page_num)
+        if key not in self._cache:
+            self._cache[key] = loader(self.page(page_num))
+        return self._cache[key]
+
+    def rect(self, page_num):
+        """Page geometry as a fitz.Rect"""
+        return self._cached('rect', page_num, lambda p: p.rect)
+
+    def rotation(self, page_num):
+        return self._cached('rotation', page_num, lambda p: p.rotation)
+
+    def text(self, page_num):
+        return self._cached('text', page_num, lambda p: p.get_text())
+
+    def text_dict(self, page_num):
+        return self._cached('text_dict', page_num, lambda p: p.get_text('dict'))
+
+    def text_lines(self, page_num):
+        """Joined span text of every line in the page's text dict"""
+        def load(_page):
+            lines = []
+            for block in self.text_dict(page_num)['blocks']:
+                if block['type'] != 0:
+                    continue
+                for line in block['lines']:
+                    lines.append(''.join(span['text'] for span in line['spans']))
+            return lines
+        return self._cached('text_lines', page_num, load)
+
+    def drawings(self, page_num):
+        return self._cached('drawings', page_num, lambda p: p.get_drawings())
+
+    def images(self, page_num):
+        return self._cached('images', page_num, lambda p: p.get_images())
+
+    def extract_image(self, xref):
+        """Extract an embedded image once, even if several pages reference it"""
+        if xref not in self._images:
+            self._images[xref] = self.doc.extract_image(xref)
+        return self._images[xref]
+
+    def has_ruling_lines(self, page_num):
+        """True if the page draws vector lines or rectangles (bordered tables)"""
+        def load(page):
+            # Raw path dicts (get_cdrawings) unless the full drawings are already
+            # loaded: a yes / no needs no Point / Rect objects for every path
+            cached = self._cache.get(('drawings', page_num))
+            for drawing in cached if cached is not None else page.get_cdrawings():
+                for item in drawing.get('items', []):
+                    if item[0] in ('l', 're'):
+                        return True
+            return False
+        return self._cached('ruled', page_num, load)
+
+    def ruled_pages(self):
+        """1-based page numbers that can hold bordered (lattice) tables"""
+        return [n + 1 for n in range(len(self)) if self.has_ruling_lines(n)]
+
+    def text_pages(self):
+        """1-based page numbers that carry extractable text"""
+        return [n + 1 for n in range(len(self)) if self.text(n).strip()]
+
+    def tables(self, page_num):
+        """
+        Tables on a page as lists of rows
+        Uses PyMuPDF's table finder on the already parsed page; pdfplumber
+        (opened from the same in-memory bytes) is only used on old PyMuPDF builds
+        """
+        def load(page):
+            if hasattr(page, 'find_tables'):
+                return [table.extract() for table in page.find_tables().tables]
+            plumber = self._plumber_doc()
+            if plumber is None:
+                return []
+            return plumber.pages[page_num].extract_tables()
+        return self._cached('tables', page_num, load)
+
+    def _plumber_doc(self):
+        if self._plumber is None:
+            try:
+                import io
+                import pdfplumber
+            except ImportError:
+                return None
+            self._plumber = pdfplumber.open(io.BytesIO(self.pdf_bytes))
+        return self._plumber
+
+    def write_to(self, path):
+        """Persist the original bytes for tools that only accept a path (Camelot)"""
+        with open(path, 'wb') as f:
+            f.write(self.pdf_bytes)
+        return path
+
+    def close(self):
+        self._pages.clear()
+        self._cache.clear()
+        self._images.clear()
+        if self._plumber is not None:
+            try:
+                self._plumber.close()
+            except Exception:
+                pass
+            self._plumber = None
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
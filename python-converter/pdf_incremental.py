@@ -0,0 +1,107 @@
+"""
+Incremental PDF updates
+Applies a change with PyMuPDF and saves it as an append-only update section
+(``saveIncr``): the original bytes are kept verbatim and only the changed
+objects are written after them, so the cost follows the size of the change
+rather than the size of the document, and existing digital signatures over
+the original bytes stay valid. PDFs held in memory are updated in memory:
+MuPDF writes the original bytes plus the update section into one buffer.
+"""
+
+import os
+import tempfile
+
+import fitz  # PyMuPDF
+
+try:
+    from pymupdf import mupdf  # Low-level bindings (PyMuPDF 1.24+)
+except ImportError:
+    mupdf = None
+
+
+def is_requested(value):
+    """True for the form / JSON values that switch incremental saving on"""
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('true', '1', 'yes', 'on')
+
+
+def _apply(doc, apply):
+    """Run ``apply(doc)``; True if the result can be saved as an update section"""
+    if doc.needs_pass:
+        raise ValueError("This PDF is password-protected: unlock it first")
+    apply(doc)
+    if doc.can_save_incrementally():
+        return True
+    print("  Incremental save not possible (damaged xref): rewriting the document")
+    return False
+
+
+def update_file(path, apply):
+    """
+    Open the PDF at ``path``, run ``apply(doc)`` and append the changes to the
+    same file. Documents PyMuPDF had to repair on open cannot take an update
+    section and are rewritten in full instead.
+    Raises ValueError for password-protected PDFs.
+    """
+    doc = fitz.open(path)
+    try:
+        if _apply(doc, apply):
+            doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, deflate=True)
+            return
+        pdf_bytes = doc.tobytes(garbage=1, deflate=True)
+    finally:
+        doc.close()
+    with open(path, 'wb') as f:
+        f.write(pdf_bytes)
+
+
+def _incremental_bytes(doc):
+    """Original bytes of a document opened from memory plus an update section with its changes"""
+    # Document.save only appends to files; MuPDF itself can write to a buffer
+    options = mupdf.PdfWriteOptions()
+    options.do_incremental = 1
+    options.do_compress = 1
+    options.do_encrypt = fitz.PDF_ENCRYPT_KEEP
+    buffer = mupdf.FzBuffer(0)
+    output = mupdf.FzOutput(buffer)
+    mupdf.pdf_write_document(mupdf.pdf_document_from_fz_document(doc.this), output, options)
+    output.fz_close_output()
+    return buffer.fz_buffer_extract()
+
+
+def update_bytes(pdf_bytes, apply):
+    """``update_file`` for PDFs held in memory; returns the updated bytes"""
+    if mupdf is None:
+        return _update_via_file(pdf_bytes, apply)
+    doc = fitz.open(stream=pdf_bytes, filetype='pdf')
+    try:
+        if _apply(doc, apply):
+            result = _incremental_bytes(doc)
+        else:
+            return doc.tobytes(garbage=1, deflate=True)
+    finally:
+        doc.close()
+    print(f"  Incremental update: {len(result) - len(pdf_bytes)} bytes appended to {len(pdf_bytes)}")
+    return result
+
+
+def _update_via_file(pdf_bytes, apply):
+    """``update_bytes`` through a temp file, for PyMuPDF without the low-level bindings"""
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        update_file(path, apply)
+        with open(path, 'rb') as f:
+            result = f.read()
+    finally:
+        os.remove(path)
+    return result
+
+
+def rotate_pages(doc, angle, indexes=None):
+    """Turn pages (all by default) clockwise by ``angle``; only /Rotate changes"""
+    for i in (range(len(doc)) if indexes is None else indexes):
+        page = doc[i]
+        page.set_rotation((page.rotation + angle) % 360)
@@ -0,0 +1,156 @@
+"""
+PDF operation pipeline
+Runs an ordered list of page operations (unlock, select, rotate, watermark,
+sign, protect) over one parse of the input and one write of the output,
+instead of a full upload / parse / rewrite round trip per operation.
+
+    [{"op": "unlock", "password": "secret"},
+     {"op": "select", "pages": "1-10", "rule": "odd"},
+     {"op": "rotate", "angle": 90, "direction": "right", "pages": "1"},
+     {"op": "watermark", "text": "CONFIDENTIAL", "position": "tile"},
+     {"op": "sign", "placements": [{"page": 0, "x": 50, "y": 700,
+                                    "width": 150, "height": 50, "data": "<base64>"}]},
+     {"op": "protect", "password": "new-secret"}]
+
+Page numbers and selections always refer to the pages as they are at that
+step (after earlier selections); sign coordinates are points from the top-left
+of the page as displayed. Watermark steps take the /api/watermark/add fields;
+the pipeline writes with pypdf, so their ``engine`` can only be "pypdf".
+"""
+
+import io
+
+from pypdf import PdfReader, PdfWriter
+
+from signature_assets import SignatureAssets, apply_signature_placements, decode_image_data
+from watermark_engine import FormStamper, PageSelection, watermark_from_options
+
+OPERATIONS = ('unlock', 'select', 'rotate', 'watermark', 'sign', 'protect')
+MIN_PASSWORD_LENGTH = 6
+
+
+class _Slot:
+    """One page of the pipeline's working page list"""
+
+    __slots__ = ('source', 'page')
+
+    def __init__(self, source):
+        self.source = source  # Index in the input document
+        self.page = None      # Writer page, once materialised
+
+
+def _rotation(op):
+    angle = int(op.get('angle', op.get('rotation', 90)))
+    if angle % 90:
+        raise ValueError("Rotation angle must be a multiple of 90")
+    if op.get('direction', 'right') == 'left':
+        angle = 360 - angle
+    return angle % 360
+
+
+def run_pipeline(pdf_bytes, operations, assets=None):
+    """
+    Apply ``operations`` to a PDF in one pass and return the new bytes
+    ``assets`` maps upload names to bytes for watermark steps that use
+    ``"imageFile": "<field>"`` instead of inline base64 ``"image"``.
+    Raises ValueError for invalid operations or passwords.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("operations must be a non-empty list")
+    assets = assets or {}
+    for op in operations:
+        if not isinstance(op, dict) or op.get('op') not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {op!r} (use {', '.join(OPERATIONS)})")
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    if reader.is_encrypted:
+        passwords = [op.get('password', '') for op in operations if op['op'] == 'unlock']
+        if not passwords:
+            raise ValueError("This PDF is password-protected: add an unlock step with its password")
+        if not reader.decrypt(passwords[0]):
+            raise ValueError("Incorrect password for the unlock step")
+
+    # Plan: resolve every selection against the working page list first, so
+    # only pages that survive to the output are ever copied or stamped
+    slots = [_Slot(i) for i in range(len(reader.pages))]
+    steps = []
+    signatures = SignatureAssets()  # Shared by every sign step
+    protect_password = None
+    for op in operations:
+        kind = op['op']
+        if kind == 'select':
+            selection = PageSelection(op.get('pages'), op.get('rule', op.get('pageRule', 'all')))
+            slots = [slots[i] for i in sorted(selection.indexes(len(slots)))]
+        elif kind == 'rotate':
+            selection = PageSelection(op.get('pages'), op.get('rule', op.get('pageRule', 'all')))
+            targets = [slots[i] for i in sorted(selection.indexes(len(slots)))]
+            steps.append((kind, _rotation(op), targets))
+        elif kind == 'watermark':
+            image_bytes = None
+            if op.get('image'):
+                image_bytes = decode_image_data(op['image'])
+            elif op.get('imageFile'):
+                image_bytes = assets.get(op['imageFile'])
+            watermark, layer, engine, selection = watermark_from_options(op, image_bytes)
+            if engine != 'pypdf':
+                raise ValueError(f"Watermark engine {engine!r} is not available in the pipeline "
+                                 f"(it writes with pypdf)")
+            targets = [slots[i] for i in sorted(selection.indexes(len(slots)))]
+            steps.append((kind, (watermark, layer), targets))
+        elif kind == 'sign':
+            placements_by_slot = {}
+            for placement in op.get('placements', []):
+                try:
+                    page = int(placement.get('page', 0))
+                    box = (float(placement.get('x', 0)), float(placement.get('y', 0)),
+                           float(placement.get('width', 150)), float(placement.get('height', 50)))
+                except (AttributeError, TypeError, ValueError):
+                    raise ValueError(f"Invalid signature placement: {placement!r}")
+                if not 0 <= page < len(slots):
+                    raise ValueError(f"Signature page {page} is out of range")
+                key = signatures.add(placement.get('data') or '')
+                if key is None:
+                    raise ValueError("Signature placement without a readable image")
+                placements_by_slot.setdefault(slots[page], []).append((key,) + box)
+            if not placements_by_slot:
+                raise ValueError("Sign step without placements")
+            steps.append((kind, placements_by_slot, list(placements_by_slot)))
+        elif kind == 'protect':
+            password = str(op.get('password', '')).strip()
+            if len(password) < MIN_PASSWORD_LENGTH:
+                raise ValueError(f"Password must be at least {MIN_PASSWORD_LENGTH} characters long")
+            protect_password = password
+
+    # Single copy of the surviving pages, then every step in order
+    writer = PdfWriter()
+    for slot in slots:
+        slot.page = writer.add_page(reader.pages[slot.source])
+
+    for kind, payload, targets in steps:
+        targets = [slot for slot in targets if slot.page is not None]
+        if not targets:
+            continue
+        if kind == 'rotate':
+            for slot in targets:
+                slot.page.rotate(payload)
+        elif kind == 'watermark':
+            watermark, layer = payload
+            stamper = FormStamper(writer, watermark, layer)
+            stamper.prepare(slot.page for slot in targets)
+            for slot in targets:
+                stamper.stamp(slot.page)
+        elif kind == 'sign':
+            apply_signature_placements(writer, [(slot.page, payload[slot]) for slot in targets],
+                                       signatures)
+
+    if reader.metadata:
+        writer.add_metadata(reader.metadata)
+    if protect_password:
+        writer.encrypt(user_password=protect_password, owner_password=protect_password,
+                       algorithm="AES-256")
+
+    print(f"  Pipeline: {' -> '.join(op['op'] for op in operations)}, "
+          f"{len(slots)} of {len(reader.pages)} pages written")
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
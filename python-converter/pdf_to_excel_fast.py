@@ -1,7 +1,7 @@
 """
 FAST & ACCURATE PDF to Excel Converter
 Optimized for Render.com (512MB RAM limit)
-Uses pdfplumber - faster and more accurate than Camelot
+Tables and text come from one shared PdfDocumentContext parse
 """
 
 import os
@@ -11,13 +11,14 @@ import shutil
 from pathlib import Path
 from flask import request, send_file, jsonify
 from werkzeug.utils import secure_filename
+from pdf_document_context import PdfDocumentContext
 
 # Get configuration from environment
 MAX_PAGES = int(os.environ.get('MAX_PAGES_TO_PROCESS', '10'))
 MAX_FILE_SIZE_MB = int(os.environ.get('MAX_FILE_SIZE_MB', '50'))
 
 def pdf_to_excel_fast():
-    """Fast and accurate PDF to Excel conversion using pdfplumber"""
+    """Fast and accurate PDF to Excel conversion from a single in-memory parse"""
     print("\n" + "="*60)
     print("PDF TO EXCEL - FAST MODE")
     print("="*60)
@@ -40,13 +41,12 @@ def pdf_to_excel_fast():
         
         print(f"✓ File: {filename}")
         
-        # Create temp directory
-        tmpdir = tempfile.mkdtemp()
-        pdf_path = os.path.join(tmpdir, filename)
-        file.save(pdf_path)
+        # Parse the upload once in memory; tables and text are both served
+        # from this context instead of reopening the file with another parser
+        pdf = PdfDocumentContext.from_upload(file, filename)
         
         # Check file size
-        file_size_mb = os.path.getsize(pdf_path) / (1024 * 1024)
+        file_size_mb = pdf.size_mb
         print(f"✓ Size: {file_size_mb:.2f} MB")
         
         if file_size_mb > MAX_FILE_SIZE_MB:
@@ -54,16 +54,7 @@ def pdf_to_excel_fast():
                 'error': f'File too large. Max size: {MAX_FILE_SIZE_MB}MB'
             }), 400
         
-        # Import pdfplumber (faster than PyMuPDF for tables)
-        try:
-            import pdfplumber
-        except ImportError:
-            # Fallback to basic extraction
-            return _extract_with_pymupdf(pdf_path, filename, tmpdir)
-        
-        # Open PDF with pdfplumber
-        pdf = pdfplumber.open(pdf_path)
-        total_pages = len(pdf.pages)
+        total_pages = len(pdf)
         pages_to_process = min(MAX_PAGES, total_pages)
         
         print(f"✓ Pages: {total_pages} (processing {pages_to_process})")
@@ -90,8 +81,6 @@ def pdf_to_excel_fast():
         
         # Process each page
         for page_num in range(pages_to_process):
-            page = pdf.pages[page_num]
-            
             # Page header
             ws.cell(row=current_row, column=1, value=f"Page {page_num + 1}")
             ws.cell(row=current_row, column=1).font = Font(bold=True, size=12)
@@ -99,7 +88,7 @@ def pdf_to_excel_fast():
             current_row += 1
             
             # Extract tables first (most important)
-            tables = page.extract_tables()
+            tables = pdf.tables(page_num)
             
             if tables:
                 print(f"  Page {page_num + 1}: {len(tables)} tables found")
@@ -136,7 +125,7 @@ def pdf_to_excel_fast():
             
             else:
                 # No tables found, extract text
-                text = page.extract_text()
+                text = pdf.text(page_num)
                 
                 if text:
                     print(f"  Page {page_num + 1}: Text extracted")
@@ -154,7 +143,6 @@ def pdf_to_excel_fast():
             current_row += 1  # Spacing between pages
             
             # Memory cleanup
-            page = None
             gc.collect()
         
         # Auto-adjust column widths
@@ -178,6 +166,7 @@ def pdf_to_excel_fast():
         gc.collect()
         
         # Save Excel
+        tmpdir = tempfile.mkdtemp()
         excel_name = Path(filename).stem + '.xlsx'
         excel_path = os.path.join(tmpdir, excel_name)
         wb.save(excel_path)
@@ -218,62 +207,3 @@ def pdf_to_excel_fast():
         # Force memory cleanup
         gc.collect()
         gc.collect()
-
-
-def _extract_with_pymupdf(pdf_path, filename, tmpdir):
-    """Fallback extraction using PyMuPDF if pdfplumber not available"""
-    print("Using PyMuPDF fallback...")
-    
-    import fitz
-    from openpyxl import Workbook
-    from openpyxl.styles import Font
-    
-    doc = fitz.open(pdf_path)
-    total_pages = len(doc)
-    pages_to_process = min(MAX_PAGES, total_pages)
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Extracted Data'
-    
-    current_row = 1
-    
-    # Header
-    ws.cell(row=current_row, column=1, value=f"Extracted from: {filename}")
-    ws.cell(row=current_row, column=1).font = Font(bold=True, size=14)
-    current_row += 2
-    
-    # Extract text from each page
-    for page_num in range(pages_to_process):
-        page = doc[page_num]
-        text = page.get_text()
-        
-        if text.strip():
-            ws.cell(row=current_row, column=1, value=f"=== Page {page_num + 1} ===")
-            ws.cell(row=current_row, column=1).font = Font(bold=True)
-            current_row += 1
-            
-            lines = text.strip().split('\n')
-            for line in lines[:200]:
-                if line.strip():
-                    ws.cell(row=current_row, column=1, value=line.strip())
-                    current_row += 1
-            
-            current_row += 1
-        
-        gc.collect()
-    
-    doc.close()
-    
-    # Save
-    excel_name = Path(filename).stem + '.xlsx'
-    excel_path = os.path.join(tmpdir, excel_name)
-    wb.save(excel_path)
-    wb.close()
-    
-    return send_file(
-        excel_path,
-        as_attachment=True,
-        download_name=excel_name,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
@@ -0,0 +1,192 @@
+"""
+Signature assets
+Per-request table of the distinct signature / stamp images: each one is
+decoded once, embedded once as an image XObject and drawn by reference from
+every placement, however many pages it is placed on. Nothing touches disk.
+"""
+
+import base64
+import hashlib
+import io
+import math
+
+import fitz  # PyMuPDF
+from PIL import Image
+from pypdf import PdfReader
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from watermark_engine import PageStamper, display_size, page_geometry
+
+
+def decode_image_data(data):
+    """Bytes of a base64 image, with or without a data: URL prefix"""
+    if 'base64,' in data:
+        data = data.split('base64,', 1)[1]
+    return base64.b64decode(data)
+
+
+class SignatureAssets:
+    """Content hash -> decoded image, filled from placement data as it arrives"""
+
+    def __init__(self):
+        self._images = {}  # sha256 of the image bytes -> PIL image
+        self._data = {}    # sha256 -> the image bytes, for PyMuPDF insertion
+        self._keys = {}    # placement data as sent -> sha256, so repeats skip base64 too
+        self._overlays = {}  # page layouts -> rendered overlay, for batches of alike documents
+
+    def add(self, data):
+        """
+        Key of a base64 (or raw bytes) image, decoding it only the first time
+        Returns None if the data is not a readable image
+        """
+        lookup = data if isinstance(data, str) else None
+        if lookup is not None and lookup in self._keys:
+            return self._keys[lookup]
+        try:
+            image_bytes = decode_image_data(data) if isinstance(data, str) else bytes(data)
+            key = hashlib.sha256(image_bytes).hexdigest()
+            if key not in self._images:
+                image = Image.open(io.BytesIO(image_bytes))
+                image.load()
+                self._images[key] = image
+                self._data[key] = image_bytes
+        except Exception as e:
+            print(f"  - ERROR decoding signature image: {e}")
+            key = None
+        if lookup is not None:
+            self._keys[lookup] = key
+        return key
+
+    def form_name(self, key):
+        return f"SigAsset{key[:16]}"
+
+    def define_forms(self, can, keys):
+        """One unit-square form per image; placements scale it into place"""
+        for key in keys:
+            name = self.form_name(key)
+            if not can.hasForm(name):
+                can.beginForm(name, 0, 0, 1, 1)
+                can.drawImage(ImageReader(self._images[key]), 0, 0, width=1, height=1, mask='auto')
+                can.endForm()
+
+    def overlay_pdf(self, pages):
+        """``render_signature_overlay`` for these assets, cached per page layout"""
+        layout = tuple((tuple(size), tuple(items)) for size, items in pages)
+        pdf = self._overlays.get(layout)
+        if pdf is None:
+            if len(self._overlays) >= 16:  # Batches of odd-sized documents: keep the newest
+                self._overlays.pop(next(iter(self._overlays)))
+            pdf = self._overlays[layout] = render_signature_overlay(layout, self)
+        return pdf
+
+    def image_bytes(self, key):
+        return self._data[key]
+
+    def __len__(self):
+        return len(self._images)
+
+
+def _placement_box(placement, defaults):
+    """(x, y, width, height) of a placement as finite floats; ValueError otherwise"""
+    try:
+        box = tuple(float(placement.get(name, default)) for name, default in defaults)
+    except (TypeError, ValueError):
+        box = (math.nan,)
+    if not all(math.isfinite(value) for value in box):
+        raise ValueError(f"{', '.join(name for name, _ in defaults)} must be numbers")
+    return box
+
+
+def group_placements(placements, images, assets, default_position=0):
+    """
+    Validate signature placements and group them by 0-based page
+    Each placement is an object with an integer ``page`` and numeric x, y,
+    width, height in points (x / y default to ``default_position``); its image
+    is ``data`` (base64) or the uploaded part named by ``dataFile``. Returns {page: [(asset key, x, y, width,
+    height)]}; placements without a readable image are skipped. Raises
+    ValueError naming the first malformed placement.
+    """
+    if not isinstance(placements, list):
+        raise ValueError("placements must be a list")
+    by_page = {}
+    for number, placement in enumerate(placements, 1):
+        if not isinstance(placement, dict):
+            raise ValueError(f"Placement {number} must be an object")
+        page = placement.get('page')
+        if isinstance(page, bool) or not isinstance(page, int) or page < 0:
+            raise ValueError(f"Placement {number}: 'page' must be a non-negative integer")
+        try:
+            box = _placement_box(placement, (('x', default_position), ('y', default_position),
+                                             ('width', 150), ('height', 50)))
+        except ValueError as e:
+            raise ValueError(f"Placement {number}: {e}")
+        key = assets.add(placement.get('data') or images.get(placement.get('dataFile')) or '')
+        if key is None:
+            continue
+        by_page.setdefault(page, []).append((key,) + box)
+    return by_page
+
+
+def render_signature_overlay(pages, assets):
+    """
+    PDF bytes with one overlay page per ((width, height), placements) in ``pages``
+    Placements are (asset key, x, y, width, height) with y measured from the top
+    """
+    packet = io.BytesIO()
+    can = canvas.Canvas(packet)
+    # Every asset is defined once, before the first page, and shared by all pages
+    assets.define_forms(can, dict.fromkeys(key for _, items in pages for key, *_ in items))
+    for (page_w, page_h), items in pages:
+        can.setPageSize((page_w, page_h))
+        for key, x, y, width, height in items:
+            can.saveState()
+            can.translate(x, page_h - y - height)  # Top-left origin in the API
+            can.scale(width, height)
+            can.doForm(assets.form_name(key))
+            can.restoreState()
+        can.showPage()
+    can.save()
+    return packet.getvalue()
+
+
+def apply_signature_placements(writer, targets, assets, upright=True):
+    """
+    Draw placements onto writer pages through one overlay document
+    ``targets`` is [(writer_page, [(key, x, y, width, height), ...])]. With
+    ``upright`` the coordinates are in the page as displayed; otherwise in the
+    unrotated mediabox, as the classic sign endpoints use.
+    """
+    geometries = []
+    for page, _ in targets:
+        geometry = page_geometry(page)
+        geometries.append(geometry if upright else geometry[:4] + (0,))
+    overlay = PdfReader(io.BytesIO(assets.overlay_pdf(
+        [(display_size(geometry), items) for geometry, (_, items) in zip(geometries, targets)])))
+
+    stamper = PageStamper(writer, prefix='Sig')
+    for (page, _), geometry, overlay_page in zip(targets, geometries, overlay.pages):
+        stamper.attach(page, stamper.form_from_overlay(overlay_page, geometry))
+
+
+def insert_signature_images(doc, placements_by_page, assets):
+    """
+    PyMuPDF counterpart of ``apply_signature_placements(..., upright=False)``
+    for incremental saves: ``placements_by_page`` maps page indexes of ``doc``
+    to placements (indexes outside the document are skipped, as on the
+    overlay path); each image is embedded on first use and reused by xref.
+    """
+    xrefs = {}
+    for page_index, items in placements_by_page.items():
+        if page_index not in range(len(doc)):
+            continue
+        page = doc[page_index]
+        box = page.mediabox
+        for key, x, y, width, height in items:
+            # Same unrotated, top-left based mediabox coordinates as the overlay path
+            bottom = box.y0 + box.height - y - height
+            rect = fitz.Rect(box.x0 + x, bottom, box.x0 + x + width, bottom + height)
+            xrefs[key] = page.insert_image(
+                rect * page.transformation_matrix,
+                stream=None if key in xrefs else assets.image_bytes(key),
+                xref=xrefs.get(key, 0), keep_proportion=False)
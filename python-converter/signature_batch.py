@@ -0,0 +1,123 @@
+"""
+Batch signing
+Signs many PDFs with one placement template on the shared worker pool
+(batch_runner). The signature images are decoded once in the request and
+reach each worker once with the template; workers reuse the rendered overlay for every
+document with the same page layout, so a batch of same-sized letters embeds
+and renders each signature once per worker.
+
+Template (placements in fractions of the page as displayed, from the top-left):
+
+    {"pages": "", "pageRule": "last",
+     "placements": [{"asset": "signature", "x": 0.6, "y": 0.82,
+                     "width": 0.25, "height": 0.06}]}
+
+``asset`` names an uploaded image (its form field) or ``data`` carries the
+image inline as base64.
+"""
+
+import io
+import os
+
+from pypdf import PdfReader, PdfWriter
+
+from batch_runner import iter_batch
+from signature_assets import apply_signature_placements
+from watermark_engine import PageSelection, display_size, page_geometry
+
+class SignatureTemplate:
+    """Page selection plus relative placements, resolved per page size"""
+
+    def __init__(self, placements, pages=None):
+        self.placements = placements  # [(asset key, x, y, width, height)] as page fractions
+        self.pages = pages or PageSelection(rule='last')
+
+    def items_for(self, width, height):
+        """Placements in points for a page of this displayed size"""
+        return [(key, round(x * width, 2), round(y * height, 2),
+                 round(w * width, 2), round(h * height, 2))
+                for key, x, y, w, h in self.placements]
+
+
+def template_from_options(options, images, assets):
+    """
+    SignatureTemplate from a template object; ``images`` maps asset ids to
+    uploaded image bytes, which are added to ``assets``
+    Raises ValueError for bad input
+    """
+    if not isinstance(options, dict):
+        raise ValueError("template must be a JSON object")
+    placements = []
+    for placement in options.get('placements') or []:
+        if not isinstance(placement, dict):
+            raise ValueError("Template placements must be objects")
+        if placement.get('data'):
+            key = assets.add(placement['data'])
+        elif placement.get('asset') in images:
+            key = assets.add(images[placement['asset']])
+        else:
+            raise ValueError(f"Unknown signature asset: {placement.get('asset')!r}")
+        if key is None:
+            raise ValueError("Signature placement without a readable image")
+        try:
+            x, y = float(placement.get('x', 0)), float(placement.get('y', 0))
+            width, height = float(placement.get('width', 0.25)), float(placement.get('height', 0.06))
+        except (TypeError, ValueError):
+            raise ValueError("Template coordinates must be numbers")
+        if not (0 <= x < 1 and 0 <= y < 1 and 0 < width <= 1 and 0 < height <= 1):
+            raise ValueError("Template coordinates are fractions of the page (0 to 1)")
+        placements.append((key, x, y, width, height))
+    if not placements:
+        raise ValueError("Template without placements")
+    pages = PageSelection(options.get('pages'), options.get('pageRule', options.get('rule', 'last')))
+    return SignatureTemplate(placements, pages)
+
+
+def sign_with_template(pdf_bytes, template, assets):
+    """Sign the template's pages of one PDF and return the new bytes"""
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    if reader.is_encrypted:
+        raise ValueError("PDF is password-protected")
+    selected = template.pages.indexes(len(reader.pages))
+
+    writer = PdfWriter()
+    targets = []
+    for i, page in enumerate(reader.pages):
+        new_page = writer.add_page(page)
+        if i in selected:
+            targets.append((new_page, template.items_for(*display_size(page_geometry(new_page)))))
+    apply_signature_placements(writer, targets, assets)
+
+    if reader.metadata:
+        writer.add_metadata(reader.metadata)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def _sign_file(job, task):
+    """Sign one PDF; returns (arcname, output path or None, error message or None)"""
+    arcname, input_path, output_path = task
+    template, assets = job
+    with open(input_path, 'rb') as f:
+        pdf_bytes = f.read()
+    try:
+        result = sign_with_template(pdf_bytes, template, assets)
+    except Exception as e:
+        return arcname, None, str(e)
+    with open(output_path, 'wb') as f:
+        f.write(result)
+    return arcname, output_path, None
+
+
+def iter_signed(inputs, output_dir, template, assets, max_workers=None):
+    """
+    Sign every (arcname, input_path) in ``inputs`` into ``output_dir``
+    Yields (arcname, output_path, error) as each document finishes; failed
+    documents have output_path None and the error message.
+    """
+    tasks = [(arcname, input_path, os.path.join(output_dir, f"{index:05d}_{arcname}"))
+             for index, (arcname, input_path) in enumerate(inputs)]
+    if not tasks:
+        raise ValueError("No PDF files to sign")
+    return iter_batch(_sign_file, (template, assets), tasks, max_workers, label='Signing')
@@ -0,0 +1,177 @@
+"""
+Signature fonts
+Finds handwriting-style TrueType fonts once (bundled ``fonts/`` directory,
+``SIGNATURE_FONT_DIR`` and the usual system font folders), keeps their bytes
+in memory and caches one FreeTypeFont per (style, size), so rendering a
+signature preview never touches the file system. Signatures come back as
+tightly cropped PNGs or as one-page vector PDFs sized to the text, which
+the stampers can place as a form.
+"""
+
+import io
+import os
+from collections import OrderedDict
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+# Style -> font file stems (lower case, no extension) in order of preference
+SIGNATURE_STYLES = {
+    'script': ('dancingscript-regular', 'dancingscript', 'greatvibes-regular', 'allura-regular',
+               'alexbrush-regular', 'segoesc', 'brushsci', 'lhandw'),
+    'casual': ('caveat-regular', 'kalam-regular', 'homemadeapple-regular', 'satisfy-regular',
+               'pacifico-regular', 'comicneue-regular', 'comic'),
+    'print': ('dejavusans-oblique', 'liberationsans-italic', 'ariali', 'dejavusans',
+              'liberationsans-regular', 'arial'),
+}
+DEFAULT_STYLE = 'script'
+VECTOR_FALLBACK_FONT = 'Helvetica-Oblique'
+PADDING = 4            # Pixels / points of margin around the ink
+CACHE_SIZE = 256       # Rendered signatures kept per output format
+
+
+def font_directories():
+    """Directories searched for signature fonts, most specific first"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    candidates = [
+        os.environ.get('SIGNATURE_FONT_DIR'),
+        os.path.join(here, 'fonts'),
+        '/usr/share/fonts',
+        '/usr/local/share/fonts',
+        os.path.expanduser('~/.fonts'),
+        os.path.expanduser('~/.local/share/fonts'),
+        '/Library/Fonts',
+        '/System/Library/Fonts',
+        os.path.join(os.environ.get('WINDIR', r'C:\Windows'), 'Fonts'),
+    ]
+    return [path for path in candidates if path and os.path.isdir(path)]
+
+
+class SignatureFonts:
+    """Font files resolved per style at start-up, with font and render caches"""
+
+    def __init__(self, directories=None):
+        found = {}
+        for directory in (font_directories() if directories is None else directories):
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    stem, ext = os.path.splitext(name)
+                    if ext.lower() == '.ttf':
+                        found.setdefault(stem.lower(), os.path.join(root, name))
+
+        self.paths = {}   # style -> font file
+        self._data = {}   # font file -> bytes, read once
+        for style, stems in SIGNATURE_STYLES.items():
+            path = next((found[stem] for stem in stems if stem in found), None)
+            if path is None:
+                continue
+            try:
+                if path not in self._data:
+                    with open(path, 'rb') as f:
+                        self._data[path] = f.read()
+                ImageFont.truetype(io.BytesIO(self._data[path]), 12)
+            except Exception as e:
+                print(f"Signature font {path} unusable: {e}")
+                continue
+            self.paths[style] = path
+
+        self._fonts = {}            # (style, size) -> FreeTypeFont
+        self._vector_names = {}     # style -> registered ReportLab font name
+        self._png = OrderedDict()   # (text, style, size, color) -> PNG bytes
+        self._pdf = OrderedDict()   # (text, style, size, color) -> PDF bytes
+        resolved = ', '.join(f"{style}={os.path.basename(path)}" for style, path in self.paths.items())
+        print(f"Signature fonts: {resolved or 'none found, using the bitmap default'}")
+
+    @property
+    def styles(self):
+        return list(SIGNATURE_STYLES)
+
+    def resolve_style(self, style):
+        """The requested style if it has a font, else the first style that does"""
+        style = (style or DEFAULT_STYLE).lower()
+        if style not in SIGNATURE_STYLES:
+            raise ValueError(f"Unknown signature style: {style} (use {', '.join(SIGNATURE_STYLES)})")
+        if style in self.paths:
+            return style
+        return next(iter(self.paths), style)
+
+    def font(self, style, size):
+        """Cached FreeTypeFont for a style and pixel size"""
+        style = self.resolve_style(style)
+        key = (style, size)
+        font = self._fonts.get(key)
+        if font is None:
+            path = self.paths.get(style)
+            if path is None:
+                font = ImageFont.load_default(size)
+            else:
+                font = ImageFont.truetype(io.BytesIO(self._data[path]), size)
+            self._fonts[key] = font
+        return font
+
+    @staticmethod
+    def _remember(cache, key, value):
+        cache[key] = value
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+        return value
+
+    def render_png(self, text, style=None, size=40, color='#000000'):
+        """Transparent PNG of ``text`` cropped to its ink plus a small margin"""
+        key = (text, self.resolve_style(style), size, color)
+        png = self._png.get(key)
+        if png is not None:
+            self._png.move_to_end(key)
+            return png
+
+        font = self.font(style, size)
+        left, top, right, bottom = font.getbbox(text)
+        width = max(right - left, 1) + 2 * PADDING
+        height = max(bottom - top, 1) + 2 * PADDING
+        img = Image.new('RGBA', (width, height), (255, 255, 255, 0))
+        draw = ImageDraw.Draw(img)
+        draw.text((PADDING - left, PADDING - top), text, fill=ImageColor.getrgb(color), font=font)
+
+        out = io.BytesIO()
+        img.save(out, format='PNG', optimize=False)
+        return self._remember(self._png, key, out.getvalue())
+
+    def _vector_font(self, style):
+        """ReportLab font name for a style, registering its TTF on first use"""
+        style = self.resolve_style(style)
+        name = self._vector_names.get(style)
+        if name is None:
+            name = VECTOR_FALLBACK_FONT
+            path = self.paths.get(style)
+            if path is not None:
+                try:
+                    name = f"Signature-{style}"
+                    pdfmetrics.registerFont(TTFont(name, io.BytesIO(self._data[path])))
+                except Exception as e:
+                    print(f"Signature font {path} cannot be embedded: {e}")
+                    name = VECTOR_FALLBACK_FONT
+            self._vector_names[style] = name
+        return name
+
+    def render_pdf(self, text, style=None, size=40, color='#000000'):
+        """One-page PDF with ``text`` as vector glyphs, the page sized to the text"""
+        key = (text, self.resolve_style(style), size, color)
+        pdf = self._pdf.get(key)
+        if pdf is not None:
+            self._pdf.move_to_end(key)
+            return pdf
+
+        font_name = self._vector_font(style)
+        ascent, descent = pdfmetrics.getAscentDescent(font_name, size)
+        width = pdfmetrics.stringWidth(text, font_name, size) + 2 * PADDING
+        height = ascent - descent + 2 * PADDING
+        out = io.BytesIO()
+        can = canvas.Canvas(out, pagesize=(width, height), initialFontName=font_name,
+                            initialFontSize=size)
+        can.setFillColorRGB(*(c / 255.0 for c in ImageColor.getrgb(color)[:3]))
+        can.drawString(PADDING, PADDING - descent, text)
+        can.showPage()
+        can.save()
+        return self._remember(self._pdf, key, out.getvalue())
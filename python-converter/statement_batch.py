@@ -0,0 +1,127 @@
+"""
+Batch bank statement generation
+Splits one master workbook / CSV into per-account groups and renders one
+statement PDF per account on the shared worker pool (batch_runner). Every
+worker receives the shared branding (font, logo) once and its resource caches
+keep styles, font and scaled logo for all the accounts it renders.
+"""
+
+import os
+import re
+
+import pandas as pd
+
+from batch_runner import iter_batch, unique_name
+from excel_to_pdf_table import render_statement_pdf
+
+DEFAULT_FILENAME = "{account}_statement.pdf"
+
+
+class BatchTemplate:
+    """
+    Per-batch statement template (usually sent as JSON)
+
+    {
+        "account_info": {"account_number": "{account}",
+                         "account_holder_name": "{Customer Name}",
+                         "transaction_date_from": "01-03-2025"},
+        "columns": ["Date", "Remarks", "Debit", "Credit", "Balance"],
+        "filename": "{account}_march.pdf"
+    }
+
+    ``{Column}`` placeholders take the value from the account's first row;
+    ``{account}`` is the grouping value. Without ``columns`` every column except
+    the grouping column is printed.
+    """
+
+    def __init__(self, account_info=None, columns=None, filename=DEFAULT_FILENAME):
+        self.account_info = dict(account_info or {'account_number': '{account}'})
+        self.columns = list(columns) if columns else None
+        self.filename = filename or DEFAULT_FILENAME
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        if not isinstance(data, dict):
+            raise ValueError("Template must be a JSON object")
+        return cls(data.get('account_info'), data.get('columns'), data.get('filename'))
+
+    @staticmethod
+    def _fill(pattern, values):
+        try:
+            return str(pattern).format_map(values)
+        except (KeyError, ValueError, IndexError, AttributeError):
+            return str(pattern)
+
+    def fields(self, account, group):
+        values = {str(k): ('' if pd.isna(v) else v) for k, v in group.iloc[0].items()}
+        values['account'] = account
+        return values
+
+    def account_info_for(self, account, group):
+        values = self.fields(account, group)
+        info = {key: self._fill(pattern, values) for key, pattern in self.account_info.items()}
+        return {key: value for key, value in info.items() if value}
+
+    def filename_for(self, account, group):
+        name = self._fill(self.filename, self.fields(account, group))
+        name = re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('._') or 'statement'
+        return name if name.lower().endswith('.pdf') else name + '.pdf'
+
+    def table_for(self, group, group_by):
+        if self.columns:
+            missing = [col for col in self.columns if col not in group.columns]
+            if missing:
+                raise ValueError(f"Template columns not found: {', '.join(missing)}")
+            return group[self.columns]
+        return group.drop(columns=[group_by])
+
+
+def load_statement_table(input_path, sheet=None):
+    """
+    Read the master transactions table from a CSV or one worksheet
+    ``sheet`` is a sheet name or a 1-based position; an exact name wins, so a
+    sheet called "2023" is never mistaken for position 2023
+    """
+    if str(input_path).lower().endswith('.csv'):
+        from csv_ingest import read_csv
+        return read_csv(input_path)
+    if sheet is None:
+        return pd.read_excel(input_path, sheet_name=0)
+    from parallel_sheets import resolve_sheet_names
+    return pd.read_excel(input_path, sheet_name=resolve_sheet_names(input_path, [sheet])[0])
+
+
+def _render_account(branding, task):
+    """Render one account; returns (file name, pdf_path or None, error message or None)"""
+    account, table, pdf_path, account_info = task
+    logo, font = branding
+    try:
+        render_statement_pdf(table, pdf_path, account_info, logo, font)
+    except Exception as e:
+        return os.path.basename(pdf_path), None, f"account {account}: {e}"
+    return os.path.basename(pdf_path), pdf_path, None
+
+
+def iter_account_statements(df, group_by, output_dir, template=None, logo=None, font=None,
+                            max_workers=None):
+    """
+    Render one statement per ``group_by`` value into ``output_dir``
+    Yields (file name, pdf_path, error) as each one is written; accounts that
+    fail have pdf_path None and the error message.
+    """
+    if group_by not in df.columns:
+        raise ValueError(f"Grouping column not found: {group_by}")
+    template = template or BatchTemplate()
+
+    tasks = []
+    used_names = set()
+    for account, group in df.groupby(group_by, sort=False, dropna=True):
+        filename = unique_name(template.filename_for(account, group), used_names)
+        tasks.append((account, template.table_for(group, group_by).reset_index(drop=True),
+                      os.path.join(output_dir, filename), template.account_info_for(account, group)))
+    if not tasks:
+        raise ValueError("No accounts found to render")
+
+    return iter_batch(_render_account, (logo, font), tasks, max_workers, label='Rendering statements:')
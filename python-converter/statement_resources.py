@@ -0,0 +1,285 @@
+"""
+Statement rendering resources
+Process-wide cache of what every bank statement needs before its first row:
+paragraph and table styles, registered TTF fonts and decoded, downscaled logos.
+Fonts and logos are keyed by content hash and held in an LRU, so repeat
+statements for the same bank branding skip all of that setup. ReportLab's
+font registry never forgets a font, so uploaded fonts take turns on a small
+fixed set of font names instead of adding a new one per upload; a render
+holds its font for the whole build, and only fonts no render is using are
+ever replaced.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+from PIL import Image
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import TableStyle
+
+CACHE_SIZE = 32
+FONT_SLOTS = 8  # Uploaded fonts registered with ReportLab at any one time
+LOGO_SIZE = (50 * mm, 18 * mm)  # Drawn size on the statement
+LOGO_DPI = 300                   # Logos are downscaled to this resolution once
+NUMERIC_KEYWORDS = ('debit', 'credit', 'balance', 'amount', 'sr', 'no')
+
+StatementStyles = namedtuple('StatementStyles', 'title date detail filter customer_box filter_box')
+
+
+class LRUCache:
+    """Small thread-safe LRU map; ``get(key, factory)`` builds missing entries once"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+        value = factory()
+        with self._lock:
+            self.misses += 1
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+_logos = LRUCache()
+_table_styles = LRUCache()
+_styles = LRUCache(maxsize=8)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_source(source):
+    """Raw bytes of an uploaded asset given as bytes or a file path (None if missing)"""
+    if source is None:
+        return None
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source) or None
+    if os.path.exists(source):
+        with open(source, 'rb') as f:
+            return f.read()
+    return None
+
+
+def _scale_logo(data):
+    """Decode once and downscale to the drawn size at LOGO_DPI, keeping transparency"""
+    img = Image.open(io.BytesIO(data))
+    img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    target = (round(LOGO_SIZE[0] / 72 * LOGO_DPI), round(LOGO_SIZE[1] / 72 * LOGO_DPI))
+    if img.width > target[0] or img.height > target[1]:
+        img = img.resize((min(img.width, target[0]), min(img.height, target[1])), Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format='PNG')
+    return out.getvalue()
+
+
+def load_logo(source):
+    """
+    Logo as small pre-scaled PNG bytes, or None
+    ``source`` is a path or the uploaded bytes; identical images share one entry
+    """
+    data = _read_source(source)
+    if data is None:
+        return None
+    return _logos.get(content_hash(data), lambda: _scale_logo(data))
+
+
+class FontSlots:
+    """
+    Content hash -> registered font name, over a fixed pool of names
+    ``acquire`` leases a font for one render and ``release`` returns it.
+    A new font takes over the least recently used name that no render holds
+    (dropping the old font from the registry); when every name is leased it
+    waits for a render to finish, so a font is never replaced under a build
+    that is still drawing with it.
+    """
+
+    def __init__(self, size=FONT_SLOTS):
+        self.names = [f"StatementFont-{i}" for i in range(size)]
+        self._slots = OrderedDict()  # digest -> font name, least recently used first
+        self._leases = {}            # font name -> renders using it
+        self._changed = threading.Condition()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unregister(font_name):
+        # pdfmetrics has no public way to drop a font, and registering a TTF
+        # under a name that is already taken silently keeps the old one
+        pdfmetrics._fonts.pop(font_name, None)
+        pdfmetrics._dynFaceNames.pop(font_name, None)
+
+    def _free_name(self):
+        """A name that can take a new font, or None while every name is leased"""
+        in_use = set(self._slots.values())
+        for name in self.names:
+            if name not in in_use:
+                return name
+        for digest, name in self._slots.items():  # Least recently used first
+            if not self._leases.get(name):
+                del self._slots[digest]
+                return name
+        return None
+
+    def acquire(self, digest, data):
+        with self._changed:
+            if digest in self._slots:
+                self.hits += 1
+            else:
+                self.misses += 1
+                font_name = self._free_name()
+                while font_name is None:
+                    self._changed.wait()
+                    if digest in self._slots:  # Registered by another render meanwhile
+                        break
+                    font_name = self._free_name()
+                if digest not in self._slots:
+                    self._unregister(font_name)
+                    pdfmetrics.registerFont(TTFont(font_name, io.BytesIO(data)))
+                    self._slots[digest] = font_name
+            self._slots.move_to_end(digest)
+            font_name = self._slots[digest]
+            self._leases[font_name] = self._leases.get(font_name, 0) + 1
+            return font_name
+
+    def release(self, font_name):
+        with self._changed:
+            self._leases[font_name] -= 1
+            if not self._leases[font_name]:
+                del self._leases[font_name]
+                self._changed.notify_all()
+
+    def __len__(self):
+        return len(self._slots)
+
+
+_fonts = FontSlots()
+
+
+@contextmanager
+def statement_font(source):
+    """
+    Register a TTF font (path or bytes) for one render and yield its font name
+    Yields None without a usable font. The name stays bound to this font until
+    the block exits, so build the document inside it.
+    """
+    data = _read_source(source)
+    if data is None:
+        yield None
+        return
+    font_name = _fonts.acquire(content_hash(data), data)
+    try:
+        yield font_name
+    finally:
+        _fonts.release(font_name)
+
+
+def statement_styles():
+    """Paragraph and header table styles shared by every statement"""
+    def build():
+        return StatementStyles(
+            title=ParagraphStyle("Title", alignment=TA_CENTER, fontSize=18, spaceAfter=10),
+            date=ParagraphStyle("DateStyle", alignment=TA_RIGHT, fontSize=10),
+            detail=ParagraphStyle("DetailStyle", fontSize=9, leading=12),
+            filter=ParagraphStyle("FilterStyle", fontSize=9, leading=14),
+            customer_box=TableStyle([
+                ('BOX', (0, 0), (-1, -1), 1.5, colors.black),
+                ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                ('LEFTPADDING', (0, 0), (-1, -1), 6),
+                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+                ('TOPPADDING', (0, 0), (-1, -1), 6),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+                ('SPAN', (3, 0), (3, 2)),  # Span address field across rows
+            ]),
+            filter_box=TableStyle([
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ]),
+        )
+    return _styles.get('statement', build)
+
+
+def transaction_table_style(columns, font_name='Helvetica', bold_font_name='Helvetica-Bold'):
+    """
+    Bank of India transaction table style for these column headers
+    Cached per (numeric column positions, fonts), so statements with the same
+    layout share one TableStyle
+    """
+    numeric_cols = tuple(
+        col_idx for col_idx, col_name in enumerate(columns)
+        if any(keyword in str(col_name).lower() for keyword in NUMERIC_KEYWORDS)
+    )
+
+    def build():
+        table_style = TableStyle([
+            # Header row styling - white background with black border
+            ('BACKGROUND', (0, 0), (-1, 0), colors.white),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('FONTNAME', (0, 0), (-1, 0), bold_font_name),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+
+            # Data rows styling
+            ('FONTNAME', (0, 1), (-1, -1), font_name),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+
+            # All rows white background (no alternating colors in Bank of India format)
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+
+            # Grid and borders - black lines
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('BOX', (0, 0), (-1, -1), 1.5, colors.black),
+
+            # Padding
+            ('LEFTPADDING', (0, 0), (-1, -1), 4),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+
+            # Vertical alignment
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+        # Special alignment for numeric columns (Debit, Credit, Balance)
+        for col_idx in numeric_cols:
+            table_style.add('ALIGN', (col_idx, 1), (col_idx, -1), 'RIGHT')
+        return table_style
+    return _table_styles.get((numeric_cols, font_name, bold_font_name), build)
+
+
+def cache_info():
+    """Entry counts and hit rates, for logging / health output"""
+    return {
+        name: {'entries': len(cache), 'hits': cache.hits, 'misses': cache.misses}
+        for name, cache in (('logos', _logos), ('fonts', _fonts),
+                            ('table_styles', _table_styles), ('styles', _styles))
+    }
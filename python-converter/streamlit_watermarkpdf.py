@@ -52,35 +52,39 @@ def add_watermark(pdf_bytes, text, position, transparency, rotation, is_mosaic,
 
     for i in range(total):
         page = reader.pages[i]
+
+        # Pages outside the range are copied through without an overlay
+        if not from_page <= i + 1 <= to_page:
+            writer.add_page(page)
+            continue
+
         packet = io.BytesIO()
         can = canvas.Canvas(packet, pagesize=(float(page.mediabox.width), float(page.mediabox.height)))
         w, h = float(page.mediabox.width), float(page.mediabox.height)
 
-        # Only add watermark to specified page range
-        if from_page <= i + 1 <= to_page:
-            opacity = (100 - transparency) / 100.0
-            
-            if is_mosaic:
-                # Mosaic pattern - repeat watermark across page
-                for x in range(-int(w), int(w*2), 200):
-                    for y in range(-int(h), int(h*2), 200):
-                        can.saveState()
-                        can.setFillAlpha(opacity)
-                        can.translate(w/2 + x + dx, h/2 + y + dy)
-                        can.rotate(rotation)
-                        can.setFont("Helvetica", 36)
-                        can.drawCentredString(0, 0, text)
-                        can.restoreState()
-            else:
-                # Single watermark at specified position
-                can.saveState()
-                can.setFillAlpha(opacity)
-                can.translate(w/2 + dx, h/2 + dy)
-                can.rotate(rotation)
-                can.setFont("Helvetica-Bold", 48)
-                can.drawCentredString(0, 0, text)
-                can.restoreState()
-        
+        opacity = (100 - transparency) / 100.0
+
+        if is_mosaic:
+            # Mosaic pattern - repeat watermark across page
+            for x in range(-int(w), int(w*2), 200):
+                for y in range(-int(h), int(h*2), 200):
+                    can.saveState()
+                    can.setFillAlpha(opacity)
+                    can.translate(w/2 + x + dx, h/2 + y + dy)
+                    can.rotate(rotation)
+                    can.setFont("Helvetica", 36)
+                    can.drawCentredString(0, 0, text)
+                    can.restoreState()
+        else:
+            # Single watermark at specified position
+            can.saveState()
+            can.setFillAlpha(opacity)
+            can.translate(w/2 + dx, h/2 + dy)
+            can.rotate(rotation)
+            can.setFont("Helvetica-Bold", 48)
+            can.drawCentredString(0, 0, text)
+            can.restoreState()
+
         can.showPage()
         can.save()
         packet.seek(0)
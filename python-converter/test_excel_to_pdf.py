@@ -66,5 +66,899 @@ def test_excel_to_pdf_conversion():
     print("   3. Example: logo_path='bank_logo.png'")
     print("\n")
 
+def test_csv_non_utf8_byte_after_sample_window(tmp_path):
+    """
+    A cp1252 byte past the sniffed head must decode as text, not end up as
+    raw bytes (pyarrow) or replacement characters (C engine)
+    """
+    import csv_ingest
+    
+    csv_path = tmp_path / "late_cp1252.csv"
+    head = b"name,amount\n" + b"x,1\n" * (csv_ingest.SAMPLE_SIZE // 4 + 1)
+    csv_path.write_bytes(head + b"caf\xe9,2\n")
+    assert csv_ingest.detect_csv_format(str(csv_path)).encoding == 'utf-8'
+    
+    for has_pyarrow in {csv_ingest.HAS_PYARROW, False}:
+        csv_ingest.HAS_PYARROW, saved = has_pyarrow, csv_ingest.HAS_PYARROW
+        try:
+            df = csv_ingest.read_csv(str(csv_path))
+        finally:
+            csv_ingest.HAS_PYARROW = saved
+        assert df["name"].iloc[0] == "x"
+        assert df["name"].iloc[-1] == "café"
+
+def test_csv_direct_render_paginates_and_decodes(tmp_path):
+    """
+    The direct CSV renderer repeats the header on every page and decodes a
+    late cp1252 byte the same way read_csv does
+    """
+    import fitz
+    import csv_ingest
+    from excel_to_pdf_advanced import convert_csv_to_pdf
+    
+    csv_path = tmp_path / "rows.csv"
+    body = b"".join(b"row%d,%d\n" % (i, i) for i in range(6000))
+    assert len(body) > csv_ingest.SAMPLE_SIZE
+    csv_path.write_bytes(b"name,amount\n" + body + b"caf\xe9,1\n")
+    
+    pdf_path = convert_csv_to_pdf(str(csv_path), str(tmp_path))
+    with fitz.open(pdf_path) as doc:
+        pages = [page.get_text() for page in doc]
+    assert len(pages) > 1
+    assert all("name" in text and "amount" in text for text in pages)
+    assert "row0" in pages[0] and "row5999" in pages[-1]
+    assert "café" in pages[-1] and "\ufffd" not in pages[-1]
+
+def _write_workbook(path, sheets):
+    from openpyxl import Workbook
+    
+    wb = Workbook()
+    wb.remove(wb.active)
+    for title in sheets:
+        ws = wb.create_sheet(title)
+        ws.append(["Date", "Remarks", "Balance"])
+        ws.append(["01-03-2025", f"{title} row", 100])
+    wb.save(path)
+    return str(path)
+
+def test_sheet_selection_and_bookmarks(tmp_path):
+    """
+    Exact names win over positions, positions are 1-based, the requested
+    order is kept and every selected sheet gets one bookmark
+    """
+    import fitz
+    import pytest
+    from excel_to_pdf_advanced import convert_excel_to_pdf_advanced
+    from parallel_sheets import SheetSelectionError, parse_sheet_selection, resolve_sheet_names
+    
+    excel_path = _write_workbook(tmp_path / "book.xlsx", ["Summary", "2", "Q4"])
+    assert parse_sheet_selection(" all ") is None
+    assert resolve_sheet_names(excel_path, parse_sheet_selection("Q4, 2, 1")) == ["Q4", "2", "Summary"]
+    assert resolve_sheet_names(excel_path, [3, "Q4"]) == ["Q4"]
+    for bad in (["Missing"], ["4"], [0]):
+        with pytest.raises(SheetSelectionError):
+            resolve_sheet_names(excel_path, bad)
+    
+    pdf_path = convert_excel_to_pdf_advanced(excel_path, str(tmp_path), ["Q4", "Summary"], max_workers=1)
+    with fitz.open(pdf_path) as doc:
+        assert [title for _, title, _ in doc.get_toc()] == ["Q4", "Summary"]
+        assert "Q4 row" in doc[0].get_text()
+
+def test_custom_endpoint_unknown_sheet_is_400(tmp_path):
+    import app
+    
+    excel_path = _write_workbook(tmp_path / "book.xlsx", ["Summary"])
+    with open(excel_path, "rb") as f:
+        data = {"file": (f, "book.xlsx"), "sheets": "Nope"}
+        response = app.app.test_client().post("/api/convert/excel-to-pdf-custom", data=data,
+                                              content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert "Nope" in response.get_json()["error"]
+
+def test_backend_routing_by_latency(tmp_path):
+    """
+    Unmeasured backends run once each, then the fastest healthy one wins;
+    unavailable backends are never tried and failing ones fall through
+    """
+    from converter_backends import BackendRegistry
+    
+    input_path = tmp_path / "book.xlsx"
+    input_path.write_bytes(b"x" * 1024)
+    calls, delays = [], {"slow": 0.05, "fast": 0.0}
+    
+    def backend(name):
+        def convert(path, output_dir):
+            calls.append(name)
+            if name == "broken":
+                raise RuntimeError("boom")
+            import time
+            time.sleep(delays[name])
+            out = tmp_path / f"{name}.pdf"
+            out.write_bytes(b"%PDF")
+            return str(out)
+        return convert
+    
+    registry = BackendRegistry("test")
+    registry.register("missing", backend("missing"), probe=lambda: False)
+    registry.register("slow", backend("slow"), extensions={"xlsx"})
+    registry.register("fast", backend("fast"), extensions={"xlsx"})
+    registry.probe_in_background().join()
+    assert registry.snapshot()["missing"]["available"] is False
+    
+    used = [registry.convert(str(input_path), str(tmp_path))[1] for _ in range(4)]
+    assert used == ["slow", "fast", "fast", "fast"]
+    
+    registry.register("broken", backend("broken"))
+    registry.probe()
+    calls.clear()
+    for _ in range(3):
+        assert registry.convert(str(input_path), str(tmp_path))[1] == "fast"
+    assert calls.count("broken") == 1  # Tried once while unmeasured, then ranked last
+    assert [b.name for b in registry.candidates(str(input_path))][-1] == "broken"
+
+def _pdf_bytes(pages=2, text="Page"):
+    import fitz
+    
+    with fitz.open() as doc:
+        for i in range(pages):
+            doc.new_page(width=300, height=400).insert_text((50, 50), f"{text} {i + 1}")
+        return doc.tobytes()
+
+def _png_bytes(color="red", size=(40, 20)):
+    import io
+    from PIL import Image
+    
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_apply_signatures_validates_placements():
+    """
+    Malformed placements are a 400 before anything is rendered; valid ones
+    land on their page, including image parts named by dataFile
+    """
+    import io
+    import json
+    import fitz
+    import app
+    
+    client = app.app.test_client()
+    
+    def post(placements):
+        data = {"file": (io.BytesIO(_pdf_bytes()), "doc.pdf"),
+                "sig": (io.BytesIO(_png_bytes()), "sig.png"),
+                "placements": json.dumps(placements)}
+        return client.post("/api/sign/apply-signatures", data=data, content_type="multipart/form-data")
+    
+    for bad in ({"page": 0}, [{"x": 10}], [{"page": "1", "dataFile": "sig"}], [{"page": -1}],
+                [{"page": 1.5}], [{"page": 0, "x": "left", "dataFile": "sig"}], ["sig"]):
+        response = post(bad)
+        assert response.status_code == 400, bad
+        assert response.get_json()["success"] is False
+    
+    response = post([{"page": 1, "x": 10, "y": 10, "width": 80, "height": 40, "dataFile": "sig"}])
+    assert response.status_code == 200
+    with fitz.open(stream=response.data, filetype="pdf") as doc:
+        assert [len(page.get_images()) for page in doc] == [0, 1]
+
+def test_save_edited_pdf_accepts_binary_and_base64():
+    """The PDF comes back unchanged from a multipart part or base64 JSON"""
+    import base64
+    import io
+    import app
+    
+    pdf = _pdf_bytes(1)
+    client = app.app.test_client()
+    response = client.post("/api/save-edited-pdf", content_type="multipart/form-data",
+                           data={"file": (io.BytesIO(pdf), "my edit.pdf")})
+    assert response.status_code == 200 and response.data == pdf
+    assert "my_edit.pdf" in response.headers["Content-Disposition"]
+    response = client.post("/api/save-edited-pdf", json={"pdf_data": base64.b64encode(pdf).decode(),
+                                                         "filename": "../out.pdf"})
+    assert response.status_code == 200 and response.data == pdf
+    assert "out.pdf" in response.headers["Content-Disposition"]
+    assert "/" not in response.headers["Content-Disposition"]
+    assert client.post("/api/save-edited-pdf", json={}).status_code == 400
+
+def _zip_entries(data):
+    import io
+    import zipfile
+    
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+def test_batch_sign_zip_contents_and_errors():
+    """
+    Every good document is signed on the template's pages, duplicate names
+    get a suffix and a broken upload is reported in errors.txt
+    """
+    import io
+    import json
+    import fitz
+    import app
+    
+    template = {"pageRule": "last",
+                "placements": [{"asset": "signature", "x": 0.5, "y": 0.8, "width": 0.3, "height": 0.1}]}
+    data = {"files": [(io.BytesIO(_pdf_bytes(3)), "letter.pdf"), (io.BytesIO(_pdf_bytes(1)), "letter.pdf"),
+                      (io.BytesIO(b"not a pdf"), "broken.pdf")],
+            "signature": (io.BytesIO(_png_bytes()), "sig.png"),
+            "template": json.dumps(template)}
+    client = app.app.test_client()
+    response = client.post("/api/sign/batch", data=data, content_type="multipart/form-data")
+    assert response.status_code == 200
+    entries = _zip_entries(response.get_data())
+    assert set(entries) == {"letter_signed.pdf", "letter_signed_2.pdf", "errors.txt"}
+    assert "broken_signed.pdf" in entries["errors.txt"].decode()
+    with fitz.open(stream=entries["letter_signed.pdf"], filetype="pdf") as doc:
+        assert [len(page.get_images()) for page in doc] == [0, 0, 1]
+    
+    bad = {"files": [(io.BytesIO(_pdf_bytes(1)), "a.pdf")],
+           "template": json.dumps({"placements": [{"asset": "signature", "x": None}]}),
+           "signature": (io.BytesIO(_png_bytes()), "sig.png")}
+    response = client.post("/api/sign/batch", data=bad, content_type="multipart/form-data")
+    assert response.status_code == 400
+
+def test_pipeline_runs_steps_in_one_pass():
+    """
+    Selection, rotation, watermark and signature steps apply to the pages as
+    they are at each step; malformed operations and engines are a 400
+    """
+    import base64
+    import io
+    import json
+    import fitz
+    import app
+    
+    client = app.app.test_client()
+    
+    def post(operations):
+        data = {"file": (io.BytesIO(_pdf_bytes(4)), "doc.pdf"), "operations": json.dumps(operations)}
+        return client.post("/api/pdf/pipeline", data=data, content_type="multipart/form-data")
+    
+    signature = base64.b64encode(_png_bytes()).decode()
+    response = post([{"op": "select", "pages": "2-4"},
+                     {"op": "rotate", "angle": 90, "pages": "1"},
+                     {"op": "watermark", "text": "PIPELINE", "pages": "2"},
+                     {"op": "sign", "placements": [{"page": 2, "x": 20, "y": 20, "data": signature}]}])
+    assert response.status_code == 200
+    with fitz.open(stream=response.data, filetype="pdf") as doc:
+        assert [page.rotation for page in doc] == [90, 0, 0]
+        assert ["Page 2" in doc[0].get_text(), "PIPELINE" in doc[1].get_text()] == [True, True]
+        assert "PIPELINE" not in doc[2].get_text()
+        assert [len(page.get_images()) for page in doc] == [0, 0, 1]
+    
+    for bad in ({"op": "rotate"}, 5, [], [{"op": "watermark", "engine": "pymupdf"}],
+                [{"op": "sign", "placements": [{"page": None, "data": signature}]}]):
+        assert post(bad).status_code == 400, bad
+
+def test_incremental_updates_keep_original_bytes():
+    """
+    Incremental rotate / watermark results start with the untouched original
+    bytes, in memory and through the temp-file fallback alike
+    """
+    import io
+    import fitz
+    import app
+    import pdf_incremental
+    
+    original = _pdf_bytes(2)
+    for bindings in {pdf_incremental.mupdf, None}:
+        pdf_incremental.mupdf, saved = bindings, pdf_incremental.mupdf
+        try:
+            updated = pdf_incremental.update_bytes(
+                original, lambda doc: pdf_incremental.rotate_pages(doc, 90, [1]))
+        finally:
+            pdf_incremental.mupdf = saved
+        assert updated.startswith(original) and len(updated) > len(original)
+        with fitz.open(stream=updated, filetype="pdf") as doc:
+            assert [page.rotation for page in doc] == [0, 90]
+    
+    client = app.app.test_client()
+    
+    def watermark(**fields):
+        data = {"file": (io.BytesIO(original), "doc.pdf"), "text": "DRAFT", "incremental": "true", **fields}
+        return client.post("/api/watermark/add", data=data, content_type="multipart/form-data")
+    
+    response = watermark()
+    assert response.status_code == 200 and response.data.startswith(original)
+    with fitz.open(stream=response.data, filetype="pdf") as doc:
+        assert all("DRAFT" in page.get_text() for page in doc)
+    assert watermark(engine=" PyMuPDF").status_code == 200
+    assert watermark(engine="pypdf").status_code == 400
+
+def test_watermark_pages_layer_and_rotation():
+    """
+    Both engines stamp only the selected pages, honour the layer (an opaque
+    image is hidden under a filled page) and rotate text stamps
+    """
+    import fitz
+    import pytest
+    from watermark_engine import (ENGINES, ImageWatermark, PageSelection, TextWatermark,
+                                  engine_name, stamp_pdf)
+    
+    with fitz.open() as doc:
+        for _ in range(5):
+            page = doc.new_page(width=300, height=400)
+            page.draw_rect(page.rect, fill=(0, 0, 0))
+        filled = doc.tobytes()
+    image = ImageWatermark(_png_bytes("red", (100, 100)), 1.0, 0, "center")
+    text = TextWatermark("DRAFT", 40, "#ff0000", 0.5, 45, "center")
+    assert engine_name(" PyMuPDF ") == "pymupdf" and engine_name(None) == "pypdf"
+    with pytest.raises(ValueError):
+        engine_name("ghostscript")
+    
+    for engine in ENGINES:
+        for layer, expected in (("over", (255, 0, 0)), ("below", (0, 0, 0))):
+            stamped = stamp_pdf(filled, image, layer, engine, PageSelection("2-", "even"))
+            with fitz.open(stream=stamped, filetype="pdf") as doc:
+                centres = [page.get_pixmap(dpi=36).pixel(75, 100) for page in doc]
+            assert centres == [(0, 0, 0), expected, (0, 0, 0), expected, (0, 0, 0)], (engine, layer)
+        
+        stamped = stamp_pdf(_pdf_bytes(3), text, "over", engine, PageSelection(rule="last"))
+        with fitz.open(stream=stamped, filetype="pdf") as doc:
+            assert ["DRAFT" in page.get_text() for page in doc] == [False, False, True]
+            lines = [line for block in doc[2].get_text("dict")["blocks"] for line in block.get("lines", [])
+                     if "DRAFT" in "".join(span["text"] for span in line["spans"])]
+            assert [tuple(round(v, 3) for v in line["dir"]) for line in lines] == [(0.707, -0.707)]
+
+def test_document_context_page_classification():
+    """
+    Ruled pages are those drawing lines or rectangles; text pages those with
+    text; each page is parsed once and shared between the stages
+    """
+    import fitz
+    from pdf_document_context import PdfDocumentContext
+    
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "Plain text page")
+        ruled = doc.new_page()
+        for row in range(4):
+            for col in range(3):
+                cell = fitz.Rect(72 + col * 100, 100 + row * 20, 172 + col * 100, 120 + row * 20)
+                ruled.draw_rect(cell, color=(0, 0, 0))
+                ruled.insert_text((cell.x0 + 4, cell.y1 - 6), f"r{row}c{col}")
+        doc.new_page()
+        pdf_bytes = doc.tobytes()
+    
+    with PdfDocumentContext(pdf_bytes, "doc.pdf") as context:
+        assert len(context) == 3
+        assert context.ruled_pages() == [2]
+        assert context.text_pages() == [1, 2]
+        assert context.page(1) is context.page(1)
+        assert len(context.drawings(1)) == 12 and context.has_ruling_lines(1)
+        tables = context.tables(1)
+        assert tables and tables[0][0] == ["r0c0", "r0c1", "r0c2"]
+
+def test_streaming_sheet_render_paginates_with_styles_and_images(tmp_path):
+    """
+    A long worksheet streams onto several pages; merged cells keep their
+    fill across the merge and anchored images are drawn on their page
+    """
+    import io
+    import fitz
+    from openpyxl import Workbook
+    from openpyxl.drawing.image import Image as XLImage
+    from openpyxl.styles import PatternFill
+    from excel_to_pdf_advanced import render_sheet_to_pdf
+    
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append(["Header spanning", None, None])
+    ws.merge_cells("A1:C1")
+    ws["A1"].fill = PatternFill("solid", fgColor="FF00FF00")
+    for i in range(400):
+        ws.append([f"row{i}", i, i * 2])
+    ws.add_image(XLImage(io.BytesIO(_png_bytes("blue", (60, 30)))), "E2")
+    excel_path = tmp_path / "long.xlsx"
+    wb.save(excel_path)
+    
+    pdf_path = tmp_path / "long.pdf"
+    pages, images = render_sheet_to_pdf(str(excel_path), "Data", str(pdf_path))
+    with fitz.open(pdf_path) as doc:
+        assert len(doc) == pages > 1 and images == 1
+        assert [len(page.get_images()) for page in doc][:2] == [1, 0]
+        assert "row0" in doc[0].get_text() and "row399" in doc[-1].get_text()
+        header = doc[0].search_for("Header spanning")[0]
+        pixmap = doc[0].get_pixmap(dpi=72)
+        assert pixmap.pixel(int(header.x1) + 10, int((header.y0 + header.y1) / 2)) == (0, 255, 0)
+
+def test_statement_rows_split_across_pages(tmp_path):
+    """
+    A long transaction table is laid out page by page: every row appears
+    once, in order, and each page repeats the column header
+    """
+    import re
+    import fitz
+    import pandas as pd
+    from excel_to_pdf_table import render_statement_pdf
+    
+    count = 1500
+    df = pd.DataFrame({"Date": ["01-03-2025"] * count,
+                       "Remarks": [f"txn{i:05d}" for i in range(count)],
+                       "Debit": range(count), "Credit": [0] * count, "Balance": range(count)})
+    pdf_path = str(tmp_path / "statement.pdf")
+    render_statement_pdf(df, pdf_path, {"account_number": "826820110000461"})
+    with fitz.open(pdf_path) as doc:
+        pages = [page.get_text() for page in doc]
+    assert len(pages) > 10
+    assert [int(n) for text in pages for n in re.findall(r"txn(\d{5})", text)] == list(range(count))
+    assert all("Remarks" in text and "Balance" in text for text in pages)
+    assert "826820110000461" in pages[0]
+    
+    render_statement_pdf(df.head(0), pdf_path)
+    with fitz.open(pdf_path) as doc:
+        assert len(doc) == 1
+
+def test_statement_font_slots_never_replace_a_leased_font():
+    """
+    Same font bytes share one registered name; with every name leased a new
+    font waits for a render to finish instead of replacing a font in use
+    """
+    import io
+    import os
+    import threading
+    import reportlab
+    from PIL import Image
+    from reportlab.pdfbase import pdfmetrics
+    from statement_resources import FontSlots, content_hash, load_logo
+    
+    font_dir = os.path.join(os.path.dirname(reportlab.__file__), "fonts")
+    fonts = []
+    for name in ("Vera.ttf", "VeraBd.ttf"):
+        with open(os.path.join(font_dir, name), "rb") as f:
+            data = f.read()
+        fonts.append((content_hash(data), data))
+    
+    slots = FontSlots(size=1)
+    first = slots.acquire(*fonts[0])
+    assert slots.acquire(*fonts[0]) == first and slots.hits == 1
+    
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(slots.acquire(*fonts[1])))
+    waiter.start()
+    slots.release(first)
+    waiter.join(0.5)
+    assert waiter.is_alive() and not acquired  # One lease is still held
+    assert pdfmetrics.getFont(first).face.name == b"BitstreamVeraSans-Roman"
+    slots.release(first)
+    waiter.join(5)
+    assert acquired == [first]
+    assert pdfmetrics.getFont(first).face.name == b"BitstreamVeraSans-Bold"
+    slots.release(first)
+    
+    logo = _png_bytes("red", (4000, 1000))
+    assert load_logo(logo) is load_logo(bytes(logo))
+    with Image.open(io.BytesIO(load_logo(logo))) as scaled:
+        assert scaled.width < 1000  # Downscaled to the drawn size at LOGO_DPI
+
+def test_statement_batch_zip_and_directory(tmp_path, monkeypatch):
+    """
+    One statement per account, named by the template (clashing names get a
+    suffix), as a ZIP or written into the output root
+    """
+    import io
+    import json
+    import fitz
+    import app
+    from batch_runner import unique_name
+    
+    used = {"a.pdf", "a_2.pdf"}
+    assert unique_name("a.pdf", used) == "a_3.pdf" and "a_3.pdf" in used
+    
+    csv_bytes = (b"Account,Branch,Date,Remarks,Debit\n"
+                 b"111,North,01-03-2025,rent,10\n222,North,02-03-2025,fuel,20\n"
+                 b"111,North,03-03-2025,food,30\n333,South,04-03-2025,tax,40\n")
+    template = {"filename": "{Branch}.pdf", "columns": ["Date", "Remarks", "Debit"],
+                "account_info": {"account_number": "{account}"}}
+    client = app.app.test_client()
+    
+    def post(**fields):
+        data = {"file": (io.BytesIO(csv_bytes), "master.csv"), "group_by": "Account",
+                "template": json.dumps(template), **fields}
+        return client.post("/api/convert/excel-to-bank-statement/batch", data=data,
+                           content_type="multipart/form-data")
+    
+    response = post()
+    assert response.status_code == 200
+    entries = _zip_entries(response.get_data())
+    assert sorted(entries) == ["North.pdf", "North_2.pdf", "South.pdf"]
+    texts = {}
+    for name, data in entries.items():
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            texts[name] = doc[0].get_text()
+    account_111 = next(text for text in texts.values() if "111" in text)
+    assert "rent" in account_111 and "food" in account_111 and "fuel" not in account_111
+    
+    assert post(group_by="Missing").status_code == 400
+    assert post(output="directory").status_code == 400  # No STATEMENT_OUTPUT_ROOT
+    monkeypatch.setattr(app, "STATEMENT_OUTPUT_ROOT", str(tmp_path))
+    assert post(output="directory", output_dir="../escape").status_code == 400
+    result = post(output="directory", output_dir="march").get_json()
+    assert result["count"] == 3 and result["errors"] == []
+    assert sorted(os.listdir(tmp_path / "march")) == ["North.pdf", "North_2.pdf", "South.pdf"]
+
+def test_batch_zip_lists_failures_in_errors_txt(tmp_path):
+    """Failed files go to errors.txt; the job directory is removed after streaming"""
+    import app
+    
+    job_dir = tmp_path / "job"
+    job_dir.mkdir()
+    good = job_dir / "good.pdf"
+    good.write_bytes(_pdf_bytes(1))
+    results = (result for result in [("good.pdf", str(good), None), ("bad.pdf", None, "not a PDF")])
+    with app.app.test_request_context():
+        response = app.batch_zip_response(results, str(job_dir), "out.zip")
+        entries = _zip_entries(b"".join(response.response))
+    assert set(entries) == {"good.pdf", "errors.txt"}
+    assert entries["errors.txt"] == b"bad.pdf: not a PDF\n"
+    assert not job_dir.exists()
+
+def _jpeg_bytes(color="red", size=(64, 48), **save_options):
+    import io
+    from PIL import Image
+    
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG", **save_options)
+    return buffer.getvalue()
+
+def test_jpeg_pages_embed_the_original_bytes(tmp_path):
+    """JPEGs go into the PDF byte for byte; PNGs are stored losslessly"""
+    import fitz
+    from images_to_pdf import ImagePdfWriter, load_image, page_layout
+    
+    jpeg, png = _jpeg_bytes(), _png_bytes("blue", (30, 20))
+    assert load_image(jpeg).filter == "/DCTDecode" and load_image(jpeg).data == jpeg
+    assert load_image(png).filter == "/FlateDecode"
+    
+    pdf_path = tmp_path / "images.pdf"
+    with open(pdf_path, "wb") as f, ImagePdfWriter(f) as writer:
+        for data in (jpeg, png):
+            image = load_image(data)
+            writer.add_page(image, *page_layout(image.width, image.height, "fit", "landscape"))
+    with fitz.open(pdf_path) as doc:
+        assert [tuple(page.rect)[2:] for page in doc] == [(64, 48), (30, 20)]
+        extracted = doc.extract_image(doc[0].get_images()[0][0])
+        assert extracted["ext"] == "jpeg" and extracted["image"] == jpeg
+
+def test_normalize_images_keeps_order_and_downsamples():
+    """
+    Results come back in input order whatever finishes first; oversized
+    images are reduced to the target DPI and EXIF rotation turns the page
+    """
+    from PIL import Image
+    from images_to_pdf import ImageOptions, display_size, normalize_images
+    
+    sizes = [(40 + i, 30) for i in range(12)]
+    sources = [_jpeg_bytes(size=size) for size in sizes]
+    sources[3] = (lambda data: lambda: data)(sources[3])  # Archive members arrive as callables
+    results = list(normalize_images(sources, max_workers=3))
+    assert [(image.width, image.height) for image, _, _ in results] == sizes
+    
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotated 90 CW
+    rotated = _jpeg_bytes(size=(4000, 3000), exif=exif.tobytes())
+    big = _png_bytes(size=(6000, 6000))
+    options = ImageOptions(page_size="A4", target_dpi=72, quality=80)
+    (turned, page, _), (reduced, _, placement) = normalize_images([rotated, big], options)
+    assert page == (595, 842) and display_size(turned)[0] < display_size(turned)[1]
+    assert reduced.filter == "/DCTDecode" and max(reduced.width, reduced.height) <= round(placement[2]) + 1
+
+def test_archive_pages_in_natural_order(monkeypatch):
+    """
+    ZIP and TAR uploads become pages in natural filename order (page2 before
+    page10), skipping non-images and macOS metadata; the size cap is a 400
+    """
+    import base64
+    import io
+    import tarfile
+    import zipfile
+    import fitz
+    import app
+    import images_to_pdf
+    
+    members = {f"scans/page{n}.jpg": _jpeg_bytes(size=(100 + n, 50)) for n in (10, 2, 1, 3)}
+    members["scans/notes.txt"] = b"not an image"
+    members["__MACOSX/scans/._page1.jpg"] = b"resource fork"
+    
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode="w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    
+    client = app.app.test_client()
+    
+    def post(data, filename):
+        form = {"archive": (io.BytesIO(data), filename), "mergeAll": "true", "orientation": "landscape"}
+        return client.post("/api/convert/jpg-to-pdf", data=form, content_type="multipart/form-data")
+    
+    for data, filename in ((zip_buffer.getvalue(), "scans.zip"), (tar_buffer.getvalue(), "scans.tar.gz")):
+        response = post(data, filename)
+        assert response.status_code == 200, filename
+        pdf_bytes = base64.b64decode(response.get_json()["pdfs"][0]["data"])
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            assert [page.rect.width for page in doc] == [101, 102, 103, 110], filename
+    
+    monkeypatch.setattr(images_to_pdf, "MAX_ARCHIVE_TOTAL", 1000)
+    for data, filename in ((zip_buffer.getvalue(), "scans.zip"), (tar_buffer.getvalue(), "scans.tar.gz")):
+        assert post(data, filename).status_code == 400, filename
+
+def test_watermark_overlay_shared_per_page_geometry():
+    """
+    Each distinct page geometry gets one rendered overlay, embedded once and
+    referenced by every page of that geometry, on both engines
+    """
+    import fitz
+    from watermark_engine import ENGINES, TextWatermark, stamp_pdf
+    
+    with fitz.open() as doc:
+        for i in range(6):
+            doc.new_page(width=300 if i % 2 else 400, height=400)
+        pdf_bytes = doc.tobytes()
+    watermark = TextWatermark("DRAFT", 40, "#ff0000", 0.5, 45, "tile")
+    for engine in ENGINES:
+        stamped = stamp_pdf(pdf_bytes, watermark, "over", engine)
+        with fitz.open(stream=stamped, filetype="pdf") as doc:
+            xobjects = [{xref for xref, *_ in page.get_xobjects()} for page in doc]
+        wide = set.intersection(*xobjects[0::2])
+        narrow = set.intersection(*xobjects[1::2])
+        assert wide - narrow and narrow - wide, engine
+
+def test_image_watermark_embedded_once():
+    """A tiled image watermark is encoded once and every page references that one image"""
+    import fitz
+    from watermark_engine import ENGINES, ImageWatermark, stamp_pdf
+    
+    pdf_bytes = _pdf_bytes(8)
+    watermark = ImageWatermark(_png_bytes("red", (300, 300)), 0.5, 30, "tile")
+    for engine in ENGINES:
+        stamped = stamp_pdf(pdf_bytes, watermark, "over", engine)
+        with fitz.open(stream=stamped, filetype="pdf") as doc:
+            images = {xref for page in doc for xref, *_ in page.get_images(full=True)}
+            image_objects = [xref for xref in range(1, doc.xref_length())
+                             if doc.xref_get_key(xref, "Subtype")[1] == "/Image"]
+        assert len(images) == 1, engine
+        assert len(image_objects) <= 2, engine  # The image and at most its soft mask
+
+def test_tile_layout_draws_only_visible_tiles():
+    """
+    Tiles stay on the classic lattice but only those whose rotated box
+    reaches the page are drawn
+    """
+    import math
+    from watermark_engine import TextWatermark
+    
+    watermark = TextWatermark("CONFIDENTIAL", 40, "#000000", 0.5, 45, "tile")
+    extent = (150, 20)  # Half width / height of the stamp
+    theta = math.radians(45)
+    corners = [(sx * extent[0] * math.cos(theta) - sy * extent[1] * math.sin(theta),
+                sx * extent[0] * math.sin(theta) + sy * extent[1] * math.cos(theta))
+               for sx in (-1, 1) for sy in (-1, 1)]
+    reach_x = max(abs(x) for x, _ in corners)
+    reach_y = max(abs(y) for _, y in corners)
+    for w, h in ((595, 842), (842, 595), (200, 3000)):
+        spacing_x, spacing_y = watermark.spacing
+        xs = [w / 2 - int(w) + k * spacing_x for k in range(-60, 60)]
+        ys = [h / 2 - int(h) + k * spacing_y for k in range(-60, 60)]
+        visible = [(x, y, 45) for x in xs if -reach_x < x < w + reach_x
+                   for y in ys if -reach_y < y < h + reach_y]
+        anchors = watermark.tile_anchors(w, h, extent)
+        assert sorted(anchors) == sorted(visible)
+        assert len(anchors) < len(range(-w, 2 * w, spacing_x)) * len(range(-h, 2 * h, spacing_y))
+
+def test_page_selection_ranges_and_rules():
+    """Ranges and rules combine; bad input and empty selections are ValueErrors"""
+    import pytest
+    from watermark_engine import EmptyPageSelection, PageSelection
+
+    assert PageSelection().indexes(4) == {0, 1, 2, 3}
+    assert PageSelection("1-3, 8, 10-").indexes(12) == {0, 1, 2, 7, 9, 10, 11}
+    assert PageSelection("-2").indexes(5) == {0, 1}
+    assert PageSelection("1-3, 8, 10-", "odd").indexes(12) == {0, 2, 10}
+    assert PageSelection(None, "even").indexes(5) == {1, 3}
+    assert PageSelection(None, "first").indexes(5) == {0}
+    assert PageSelection(None, " Last ").indexes(5) == {4}
+    assert PageSelection("2-", "last").matches(5, 5)
+    assert not PageSelection("1-2", "last").matches(5, 5)
+
+    for bad in ("0", "3-1", "a-b", "1-x"):
+        with pytest.raises(ValueError):
+            PageSelection(bad)
+    with pytest.raises(ValueError):
+        PageSelection(None, "middle")
+    with pytest.raises(EmptyPageSelection):
+        PageSelection("8-").indexes(5)
+    with pytest.raises(EmptyPageSelection):
+        PageSelection(None, "even").indexes(1)
+
+def test_batch_watermark_zip_contents_and_errors():
+    """
+    Good documents are stamped on the selected pages under unique names, a
+    broken upload goes to errors.txt and bad options fail the whole request
+    """
+    import io
+    import fitz
+    import app
+    
+    data = {"files": [(io.BytesIO(_pdf_bytes(3)), "report.pdf"), (io.BytesIO(_pdf_bytes(2)), "report.pdf"),
+                      (io.BytesIO(b"not a pdf"), "broken.pdf")],
+            "text": "BATCHMARK", "pages": "2-"}
+    client = app.app.test_client()
+    response = client.post("/api/watermark/batch", data=data, content_type="multipart/form-data")
+    assert response.status_code == 200
+    entries = _zip_entries(response.get_data())
+    assert set(entries) == {"report_watermarked.pdf", "report_watermarked_2.pdf", "errors.txt"}
+    assert "broken_watermarked.pdf" in entries["errors.txt"].decode()
+    with fitz.open(stream=entries["report_watermarked.pdf"], filetype="pdf") as doc:
+        assert ["BATCHMARK" in page.get_text() for page in doc] == [False, True, True]
+    with fitz.open(stream=entries["report_watermarked_2.pdf"], filetype="pdf") as doc:
+        assert ["BATCHMARK" in page.get_text() for page in doc] == [False, True]
+    
+    for bad in ({"pageRule": "middle"}, {"engine": "ghostscript"}, {"pages": "3-1"}):
+        bad["files"] = [(io.BytesIO(_pdf_bytes(1)), "a.pdf")]
+        response = client.post("/api/watermark/batch", data=bad, content_type="multipart/form-data")
+        assert response.status_code == 400
+    response = client.post("/api/watermark/batch", data={"text": "X"}, content_type="multipart/form-data")
+    assert response.status_code == 400
+
+def test_signature_assets_decode_each_image_once():
+    """
+    Repeated signature data maps to one asset, and a document signed in many
+    places embeds that image once
+    """
+    import base64
+    import io
+    import json
+    import fitz
+    import app
+    from signature_assets import SignatureAssets
+    
+    red, blue = _png_bytes("red"), _png_bytes("blue")
+    encoded = "data:image/png;base64," + base64.b64encode(red).decode()
+    assets = SignatureAssets()
+    key = assets.add(encoded)
+    assert key is not None
+    assert assets.add(encoded) == key
+    assert assets.add(red) == key  # Raw bytes of the same image
+    assert assets.add(blue) not in (None, key)
+    assert assets.add("not base64 at all") is None
+    assert assets.add(b"not an image") is None
+    assert len(assets) == 2
+    
+    placements = [{"page": page, "x": x, "y": 20, "width": 60, "height": 30, "data": encoded}
+                  for page in range(3) for x in (20, 120, 220)]
+    data = {"file": (io.BytesIO(_pdf_bytes(3)), "doc.pdf"), "placements": json.dumps(placements)}
+    response = app.app.test_client().post("/api/sign/apply-signatures", data=data,
+                                          content_type="multipart/form-data")
+    assert response.status_code == 200
+    with fitz.open(stream=response.data, filetype="pdf") as doc:
+        xrefs = {image[0] for page in doc for image in page.get_images(full=True)}
+        assert all(page.get_images() for page in doc)
+    assert len(xrefs) == 1
+
+def test_signature_fonts_render_and_cache(tmp_path):
+    """
+    Styles fall back to a font that exists, renders are cached per
+    (text, style, size, color) and the endpoint rejects unknown formats
+    """
+    import base64
+    import io
+    import shutil
+    import fitz
+    import pytest
+    import reportlab
+    from PIL import Image
+    import app
+    from signature_fonts import SignatureFonts
+    
+    vera = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+    shutil.copy(vera, tmp_path / "DejaVuSans.ttf")
+    fonts = SignatureFonts([str(tmp_path)])
+    assert list(fonts.paths) == ["print"]
+    assert fonts.resolve_style("script") == "print"
+    with pytest.raises(ValueError):
+        fonts.resolve_style("gothic")
+    
+    png = fonts.render_png("Jane Doe", "script", 40, "#0000ff")
+    assert fonts.render_png("Jane Doe", "print", 40, "#0000ff") is png
+    assert fonts.render_png("Jane Doe", "print", 41, "#0000ff") is not png
+    with Image.open(io.BytesIO(png)) as image:
+        assert image.mode == "RGBA"
+        assert image.getchannel("A").getbbox() is not None  # Ink was drawn
+        assert image.width < 400 and image.height < 80      # Cropped to the text
+    
+    pdf = fonts.render_pdf("Jane Doe", "print", 30)
+    assert fonts.render_pdf("Jane Doe", None, 30) is pdf
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        assert len(doc) == 1
+        assert "Jane Doe" in doc[0].get_text()
+        assert doc[0].rect.width < 300
+    assert SignatureFonts([]).render_png("Jane")  # Bitmap default font
+    
+    client = app.app.test_client()
+    response = client.post("/api/sign/create-text-signature", json={"text": "Jane", "format": "pdf"})
+    assert response.status_code == 200
+    assert base64.b64decode(response.get_json()["signature"]).startswith(b"%PDF")
+    for bad in ({"format": "gif"}, {"style": "gothic"}):
+        response = client.post("/api/sign/create-text-signature", json=dict(text="Jane", **bad))
+        assert response.status_code == 400
+
+def test_document_store_ids_and_expiry(tmp_path, monkeypatch):
+    """
+    Each upload gets its own id over shared bytes; ids need their upload
+    token, expire after the ttl and are served by the document endpoints
+    """
+    import hashlib
+    import io
+    import time
+    import fitz
+    import pytest
+    import app
+    from document_store import DocumentNotFound, DocumentStore
+    
+    store = DocumentStore(str(tmp_path), ttl=3600)
+    pdf = _pdf_bytes(2)
+    sha = hashlib.sha256(pdf).hexdigest()
+    first, second = store.put(pdf, "a.pdf"), store.put(pdf, "b.pdf")
+    assert first != second
+    assert first.startswith(sha + "-") and second.startswith(sha + "-")
+    assert store.get(first) == store.get(second) == pdf
+    assert store.path(first) == store.path(second)
+    assert (store.filename(first), store.filename(second)) == ("a.pdf", "b.pdf")
+    
+    for bad in (sha, f"{sha}-{'0' * 32}", "../../etc/passwd", first.upper(), first + "0", None):
+        with pytest.raises(DocumentNotFound):
+            store.get(bad)
+        assert store.filename(bad) is None
+    
+    past = time.time() - 7200
+    record = os.path.join(os.path.dirname(store.path(first)), first + ".json")
+    os.utime(record, (past, past))
+    with pytest.raises(DocumentNotFound):
+        store.get(first)
+    assert store.get(second) == pdf  # The shared bytes stay for the live upload
+    for path in (store.path(second), os.path.join(os.path.dirname(record), second + ".json")):
+        os.utime(path, (past, past))
+    assert store.sweep() == 2  # The PDF and the second upload record
+    assert not any(files for _, _, files in os.walk(tmp_path / sha[:2]))
+    with pytest.raises(DocumentNotFound):
+        store.get(second)
+    short_lived = DocumentStore(str(tmp_path / "short"), ttl=0)
+    expired_id = short_lived.put(pdf)
+    time.sleep(0.01)
+    with pytest.raises(DocumentNotFound):
+        short_lived.get(expired_id)
+    
+    monkeypatch.setattr(app, "DOCUMENT_STORE", DocumentStore(str(tmp_path / "app")))
+    client = app.app.test_client()
+    response = client.post("/api/documents", data={"file": (io.BytesIO(pdf), "report.pdf")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["page_count"] == 2
+    document_id = body["document_id"]
+    response = client.get(f"/api/documents/{document_id}")
+    assert response.status_code == 200 and response.data == pdf
+    assert "report.pdf" in response.headers["Content-Disposition"]
+    response = client.get(f"/api/documents/{document_id}/pages/2")
+    assert response.status_code == 200 and response.mimetype == "image/png"
+    assert client.get(f"/api/documents/{document_id}/pages/3").status_code == 404
+    assert client.get(f"/api/documents/{sha}").status_code == 404
+    assert client.get(f"/api/documents/{sha}-{'0' * 32}/pages/1").status_code == 404
+    
+    response = client.post("/api/watermark/add", data={"document_id": document_id, "text": "STORED"},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    stamped_id = response.get_json()["document_id"]
+    assert stamped_id != document_id
+    with fitz.open(stream=client.get(f"/api/documents/{stamped_id}").data, filetype="pdf") as doc:
+        assert all("STORED" in page.get_text() for page in doc)
+
 if __name__ == "__main__":
     test_excel_to_pdf_conversion()
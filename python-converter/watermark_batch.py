@@ -0,0 +1,44 @@
+"""
+Batch watermarking
+Applies one prepared watermark to many PDFs on the shared worker pool
+(batch_runner). The watermark (font choice, processed image, rendered
+overlays) is built once in the request and reaches each worker once; workers
+keep it for every document of the batch they stamp.
+"""
+
+import os
+
+from batch_runner import iter_batch
+from watermark_engine import EmptyPageSelection, stamp_pdf
+
+
+def _stamp_file(job, task):
+    """Stamp one PDF; returns (arcname, output path or None, error message or None)"""
+    arcname, input_path, output_path = task
+    watermark, layer, engine, pages = job
+    with open(input_path, 'rb') as f:
+        pdf_bytes = f.read()
+    try:
+        result = stamp_pdf(pdf_bytes, watermark, layer, engine, pages)
+    except EmptyPageSelection:
+        result = pdf_bytes  # Short documents without a selected page pass through
+    except Exception as e:
+        return arcname, None, str(e)
+    with open(output_path, 'wb') as f:
+        f.write(result)
+    return arcname, output_path, None
+
+
+def iter_watermarked(inputs, output_dir, watermark, layer='over', engine=None, pages=None,
+                     max_workers=None):
+    """
+    Watermark every (arcname, input_path) in ``inputs`` into ``output_dir``
+    Yields (arcname, output_path, error) as each document finishes; failed
+    documents have output_path None and the error message.
+    """
+    tasks = [(arcname, input_path, os.path.join(output_dir, f"{index:05d}_{arcname}"))
+             for index, (arcname, input_path) in enumerate(inputs)]
+    if not tasks:
+        raise ValueError("No PDF files to watermark")
+    return iter_batch(_stamp_file, (watermark, layer, engine, pages), tasks, max_workers,
+                      label='Watermarking')
@@ -0,0 +1,65 @@
+"""
+Shared worker pool
+One process pool per web process, used by per-sheet rendering and by every
+batch endpoint. Its size is WORKER_PROCESSES (default: CPU count), so
+concurrent requests queue for the same bounded set of processes instead of
+each starting a pool of their own.
+"""
+
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES') or os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def shared_pool():
+    """The process-wide pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES)
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop a broken pool (a worker died) so the next request starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_completed(calls, window):
+    """
+    Run ``(key, fn, args)`` calls on the shared pool; yield (key, result) as each finishes
+    At most ``window`` calls of this caller are queued at once, so one large
+    request cannot fill the pool ahead of everyone else. Calls that have not
+    started when the caller stops iterating (client went away, error) are
+    cancelled.
+    """
+    pool = shared_pool()
+    calls = iter(calls)
+    running = {}
+    try:
+        while True:
+            for key, fn, args in calls:
+                running[pool.submit(fn, *args)] = key
+                if len(running) >= window:
+                    break
+            if not running:
+                return
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield running.pop(future), future.result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        for future in running:
+            future.cancel()
@@ -0,0 +1,60 @@
+"""
+Streaming ZIP responses
+Builds a ZIP archive on the fly and yields it in chunks, so batch endpoints
+can start sending results while later files are still being produced
+"""
+
+import io
+import time
+import zipfile
+
+COPY_CHUNK = 1024 * 1024
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Unseekable sink for ZipFile; the generator drains it after every entry"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(entries, compression=zipfile.ZIP_STORED):
+    """
+    Yield the bytes of a ZIP containing ``entries`` as (arcname, path_or_bytes)
+    Entries may come from a generator; each one is sent as soon as it is written.
+    PDFs and JPEGs are already compressed, so entries are stored by default.
+    """
+    buf = _ChunkBuffer()
+    with zipfile.ZipFile(buf, 'w', compression) as zf:
+        for arcname, source in entries:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            info.compress_type = compression
+            with zf.open(info, 'w') as dest:
+                if isinstance(source, (bytes, bytearray)):
+                    dest.write(source)
+                else:
+                    with open(source, 'rb') as src:
+                        while True:
+                            chunk = src.read(COPY_CHUNK)
+                            if not chunk:
+                                break
+                            dest.write(chunk)
+                            data = buf.drain()
+                            if data:
+                                yield data
+            data = buf.drain()
+            if data:
+                yield data
+    yield buf.drain()